@@ -0,0 +1,259 @@
+# ---------------------------------------------------------------------------
+# Author: Kishan Amratia
+# Date: 19-Oct-2026
+# Module Name: pybis2spice-benchmark.py
+"""
+A benchmark suite that runs the full conversion pipeline (ibis parsing, DataModel extraction, k-parameter solving,
+compression and netlist creation) on every bundled ibis file for every corner.
+
+Reports throughput (models/s and table samples/s), peak memory and output bytes for each file. The results are
+written to a json file which can be stored as a baseline and compared against in later runs.
+
+Synthetic ibis files (see pybis2spice/generator.py) can be added to measure the pipeline at larger sizes.
+
+Usage (from the repository root, with the pybis2spice package on the python path):
+    python benchmark/pybis2spice-benchmark.py -o benchmark/baseline.json
+    python benchmark/pybis2spice-benchmark.py -o results.json --compare benchmark/baseline.json
+    python benchmark/pybis2spice-benchmark.py --synthetic 10 100 1000 --synthetic-param waveform_points
+"""
+# ---------------------------------------------------------------------------
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+from pybis2spice import instrument
+from pybis2spice import generator
+from pybis2spice import batch
+from pybis2spice import version
+
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CORNERS = ["Typical", "WeakSlow", "FastStrong"]
+
+# Metrics compared against the baseline. True if a larger value is better
+_COMPARE_METRICS = {"models_per_sec": True,
+                    "samples_per_sec": True,
+                    "peak_memory_bytes": False,
+                    "output_bytes": False}
+
+
+def find_ibis_files():
+    """
+    returns the list of bundled ibis files within the test/ibis and examples folders
+    """
+    files = sorted(glob.glob(os.path.join(_REPO_DIR, "test", "ibis", "*.ibs")))
+    files += sorted(glob.glob(os.path.join(_REPO_DIR, "examples", "**", "*.ibs"), recursive=True))
+    return files
+
+
+def run_pipeline(ibis_filepath, output_dir, subcircuit_types):
+    """
+    Runs every stage of the conversion pipeline on all the models of an ibis file, for all corners
+
+        Returns:
+            dictionary of counts: models, samples, conversions, failures, output_bytes
+    """
+    counts = {"models": 0, "samples": 0, "conversions": 0, "failures": 0, "output_bytes": 0}
+
+    ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+    if not ibis.component_names:
+        return counts
+
+    for model_name in pybis2spice.list_models(ibis):
+        component_name = pybis2spice.find_component_for_model(ibis, model_name)
+        try:
+            ibis_data = pybis2spice.DataModel(ibis, model_name, component_name)
+        except pybis2spice.ModelLoadError:
+            continue
+
+        io_types = batch.get_io_types(ibis_data.model_type)
+        if not io_types:
+            continue
+        counts["models"] += 1
+
+        for table in [ibis_data.iv_pullup, ibis_data.iv_pulldown, ibis_data.iv_pwr_clamp, ibis_data.iv_gnd_clamp]:
+            if table is not None:
+                counts["samples"] += np.shape(table)[0]
+        for waveform in ibis_data.vt_rising + ibis_data.vt_falling:
+            counts["samples"] += np.shape(waveform.data)[0]
+
+        for io_type in io_types:
+            for corner in _CORNERS:
+                for subcircuit_type in (subcircuit_types if io_type == "Output" else ["Generic"]):
+                    output_filepath = os.path.join(output_dir, f"model-{io_type}-{corner}-{subcircuit_type}.sub")
+                    ret = subcircuit.generate_spice_model(io_type=io_type,
+                                                          subcircuit_type=subcircuit_type,
+                                                          ibis_data=ibis_data,
+                                                          corner=corner,
+                                                          output_filepath=output_filepath)
+                    counts["conversions"] += 1
+                    if ret == 0:
+                        counts["output_bytes"] += os.path.getsize(output_filepath)
+                    else:
+                        counts["failures"] += 1
+
+    return counts
+
+
+def benchmark_file(ibis_filepath, subcircuit_types, repeat=1, measure_memory=True):
+    """
+    Benchmarks a single ibis file. The fastest of the repeated runs is reported.
+    Peak memory is measured in a separate run as tracemalloc slows down the pipeline.
+
+        Returns:
+            dictionary of the benchmark results for the file
+    """
+    best_time = None
+    best_profiler = None
+    counts = None
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for _ in range(repeat):
+            with instrument.Profiler() as profiler:
+                start = time.perf_counter()
+                counts = run_pipeline(ibis_filepath, output_dir, subcircuit_types)
+                elapsed = time.perf_counter() - start
+
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+                best_profiler = profiler
+
+        peak_memory = None
+        if measure_memory:
+            tracemalloc.start()
+            run_pipeline(ibis_filepath, output_dir, subcircuit_types)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    result = dict(counts)
+    result["file_size_bytes"] = os.path.getsize(ibis_filepath)
+    result["total_time"] = best_time
+    result["models_per_sec"] = counts["models"] / best_time if best_time > 0 else None
+    result["samples_per_sec"] = counts["samples"] / best_time if best_time > 0 else None
+    result["peak_memory_bytes"] = peak_memory
+    result["stages"] = best_profiler.summary()
+
+    return result
+
+
+def compare_results(results, baseline, tolerance):
+    """
+    Compares the results against a baseline run.
+
+        Parameters:
+            results - benchmark results dictionary
+            baseline - benchmark results dictionary from a stored run
+            tolerance - allowed fractional change before a metric is reported as a regression i.e. 0.2 for 20%
+
+        Returns:
+            list of regression description strings
+    """
+    regressions = []
+    for file_name, result in results["files"].items():
+        base_result = baseline["files"].get(file_name)
+        if base_result is None:
+            continue
+
+        for metric, larger_is_better in _COMPARE_METRICS.items():
+            value = result.get(metric)
+            base_value = base_result.get(metric)
+            if not value or not base_value:
+                continue
+
+            ratio = value / base_value
+            regressed = ratio < (1 - tolerance) if larger_is_better else ratio > (1 + tolerance)
+            status = "REGRESSION" if regressed else "ok"
+            print(f"{file_name:40s} {metric:20s} {base_value:14.6g} -> {value:14.6g} ({ratio:6.2f}x) {status}")
+            if regressed:
+                regressions.append(f"{file_name}: {metric} {base_value:.6g} -> {value:.6g}")
+
+    return regressions
+
+
+def run_benchmark(ibis_files, subcircuit_types, repeat=1, measure_memory=True):
+    """
+    Benchmarks all the given ibis files and returns the results dictionary, including the totals for all files
+    """
+    results = {"pybis2spice_version": version.get_version(),
+               "python_version": platform.python_version(),
+               "numpy_version": np.__version__,
+               "platform": platform.platform(),
+               "files": {}}
+
+    totals = {"models": 0, "samples": 0, "conversions": 0, "failures": 0, "output_bytes": 0, "total_time": 0.0}
+    for ibis_filepath in ibis_files:
+        file_name = os.path.basename(ibis_filepath)
+        result = benchmark_file(ibis_filepath, subcircuit_types, repeat=repeat, measure_memory=measure_memory)
+        results["files"][file_name] = result
+
+        for key in totals:
+            totals[key] += result[key]
+
+        print(f"{file_name:40s} models={result['models']:3d} time={result['total_time']:8.3f}s "
+              f"models/s={result['models_per_sec'] or 0:8.2f} samples/s={result['samples_per_sec'] or 0:10.0f} "
+              f"peak={(result['peak_memory_bytes'] or 0) / 1e6:8.2f}MB out={result['output_bytes']}B "
+              f"failures={result['failures']}")
+
+    totals["models_per_sec"] = totals["models"] / totals["total_time"] if totals["total_time"] > 0 else None
+    totals["samples_per_sec"] = totals["samples"] / totals["total_time"] if totals["total_time"] > 0 else None
+    results["totals"] = totals
+
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="pybis2spice benchmark suite")
+    parser.add_argument("files", nargs="*", help="ibis files to benchmark (defaults to all the bundled ibis files)")
+    parser.add_argument("-o", "--output", help="json file to write the results to")
+    parser.add_argument("--compare", help="baseline json file to compare the results against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="fractional change allowed before a metric is reported as a regression (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=1, help="number of timed runs per file, fastest is reported")
+    parser.add_argument("--subcircuit", nargs="+", choices=["LTSpice", "Generic"], default=["LTSpice", "Generic"],
+                        help="subcircuit types to create for output models")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement run")
+    parser.add_argument("--synthetic", nargs="+", type=float, default=[],
+                        help="also benchmark synthetic ibis files scaled by each of the given factors")
+    parser.add_argument("--synthetic-param", choices=sorted(generator.DEFAULT_SIZES),
+                        help="scale only this size of the synthetic files (default: iv_points and waveform_points)")
+    parser.add_argument("--synthetic-only", action="store_true", help="skip the bundled ibis files")
+
+    args = parser.parse_args()
+
+    files = args.files if args.files else find_ibis_files()
+    if args.synthetic_only:
+        files = []
+
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        for scale in args.synthetic:
+            param_name = args.synthetic_param if args.synthetic_param else "tables"
+            synthetic_filepath = os.path.join(synthetic_dir, f"synthetic_{param_name}_x{scale:g}.ibs")
+            generator.generate_scaled_ibis_file(synthetic_filepath, scale, args.synthetic_param)
+            files.append(synthetic_filepath)
+
+        benchmark_results = run_benchmark(files, args.subcircuit, repeat=args.repeat,
+                                          measure_memory=not args.no_memory)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(benchmark_results, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline_results = json.load(file)
+        regression_list = compare_results(benchmark_results, baseline_results, args.tolerance)
+        if regression_list:
+            print(f"\n{len(regression_list)} regression(s) found:")
+            for regression in regression_list:
+                print(f"  {regression}")
+            sys.exit(1)
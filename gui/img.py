@@ -7,6 +7,7 @@ Images are encoded as Base64 string
 Use gif images to do the conversion
 """
 # ---------------------------------------------------------------------------
+import tkinter as tk
 
 icon = '''
 R0lGODlhAAEAAfcAAAAAAAAAMwAAZgAAmQAAzAAA/wArAAArMwArZgArmQArzAAr/wBVAABVMwBV
@@ -607,3 +608,33 @@ def get_pullup_iv_circuit():
 
 def get_vt_fixture():
     return vt_fixture
+
+
+# Decoded tk.PhotoImage objects shared by all windows and tabs. The cache also holds the references that stop
+# tkinter from garbage collecting images which are still displayed on a canvas
+_photo_images = {}
+
+_IMAGE_DATA = {"icon": get_icon,
+               "pwr_clamp": get_pwr_clamp,  # 71 x 120 px
+               "gnd_clamp": get_gnd_clamp,  # 71 x 120 px
+               "pullup_device": get_pullup_device,  # 68 x 120 px
+               "pulldown_device": get_pulldown_device,  # 68 x 120 px
+               "net_segment": get_net_segment,  # 54 x 12 px
+               "input": get_input,  # 297 x 128 px
+               "output": get_output,  # 297 x 128 px
+               "io": get_io,  # 284 x 130 px
+               "pulldown_iv": get_pulldown_iv_circuit,
+               "pullup_iv": get_pullup_iv_circuit,
+               "vt_fixture": get_vt_fixture}
+
+
+def get_photo_image(name):
+    """
+    returns the tk.PhotoImage of the named image i.e. "pwr_clamp". Each image is only decoded the first time it is
+    used and is then reused. The Tk main window must be created before the first call
+    """
+    photo_image = _photo_images.get(name)
+    if photo_image is None:
+        photo_image = tk.PhotoImage(data=_IMAGE_DATA[name]())
+        _photo_images[name] = photo_image
+    return photo_image
@@ -4,63 +4,249 @@
 # Module Name: pybis2spice-cli.py
 """
 A command-line interface tool for helping users to convert IBIS models into SPICE models
-OBSOLETE - No longer planned to be developed. Kept here for reference.
+
+Usage (with the pybis2spice package on the python path):
+    python gui/pybis2spice-cli.py test/ibis/hct1g08.ibs 74HCT1G08_GW HCT1G08_OUTN_50 model.sub -c Typical
+    python gui/pybis2spice-cli.py test/ibis/hct1g08.ibs 74HCT1G08_GW HCT1G08_OUTN_50 out_dir -c All
+    python gui/pybis2spice-cli.py test/ibis/hct1g08.ibs 74HCT1G08_GW HCT1G08_OUTN_50 model.sub --memory-profile
+    python gui/pybis2spice-cli.py --batch out_dir --report report.ndjson test/ibis/*.ibs
+    python gui/pybis2spice-cli.py --batch out_dir --validate --report report.ndjson test/ibis/hct1g08.ibs
+    python gui/pybis2spice-cli.py --batch out_dir --plots plot_dir test/ibis/hct1g08.ibs
 """
 # ---------------------------------------------------------------------------
 
 # Import the library
-import pybis2spice
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+from pybis2spice import version
+from pybis2spice import instrument
+from pybis2spice import batch
 import os
+import sys
 import argparse
-import version
-
-
-def validate_inputs():
-    pass
-
-
-if __name__ == '__main__':
 
-    parser = argparse.ArgumentParser()
+_CORNERS = batch.CORNERS
+_SUBCIRCUIT_TYPES = {1: "LTSpice", 2: "Generic"}
+
+
+def validate_inputs(args):
+    """
+    Checks the command line arguments before any parsing is done. Returns an error message or None if they are valid
+    """
+    if not os.path.isfile(args.input):
+        return f"ibis file not found: {args.input}"
+
+    if args.corner == "All":
+        if not os.path.isdir(args.out):
+            return f"output directory not found: {args.out}"
+    else:
+        output_dir = os.path.dirname(os.path.abspath(args.out))
+        if not os.path.isdir(output_dir):
+            return f"output directory not found: {output_dir}"
+
+    return None
+
+
+def convert(args, report):
+    """
+    Loads the ibis model and creates the subcircuit file(s). A record is written to the report for each file
+
+        Returns:
+            0 if all the subcircuit files were created successfully, otherwise 1
+    """
+    input_hash = pybis2spice.hash_file(args.input)
+    ibis = pybis2spice.get_ibis_model_ecdtools(args.input)
+    if ibis is None:
+        print(f"Error: unable to parse the ibis file {args.input}")
+        return 1
+
+    if args.cmp not in pybis2spice.list_components(ibis):
+        print(f"Error: component {args.cmp} not found in the ibis file")
+        return 1
+
+    if args.mod not in pybis2spice.list_models(ibis):
+        print(f"Error: model {args.mod} not found in the ibis file")
+        return 1
+
+    try:
+        ibis_data = pybis2spice.DataModel(ibis, args.mod, args.cmp)
+    except pybis2spice.ModelLoadError as error:
+        print(f"Error: {error}")
+        return 1
+
+    subcircuit_type = _SUBCIRCUIT_TYPES[args.s]
+    if args.io_type == "Input":
+        subcircuit_type = "Generic"
+
+    if args.corner == "All":
+        output_filepaths = {corner: os.path.join(args.out, f'{ibis_data.model_name}-{args.io_type}-{corner}.sub')
+                            for corner in _CORNERS}
+    else:
+        output_filepaths = {args.corner: args.out}
+
+    status = 0
+    for corner, output_filepath in output_filepaths.items():
+        record = batch.convert_item(ibis_data, input_hash, args.io_type, subcircuit_type, corner, output_filepath,
+                                    max_points=args.max_points, edge_tolerance=get_edge_tolerance(args),
+                                    fit_tolerance=args.fit_iv)
+        report.write(record)
+        for warning in record["warnings"]:
+            print(f"Warning: {warning}")
+
+        if record["status"] == "ok":
+            print(f"SPICE subcircuit model created at: {output_filepath}")
+            if subcircuit_type == "LTSpice":
+                symbol_file = subcircuit.create_ltspice_symbol(ibis_data, corner, output_filepath, args.io_type)
+                print(f"LTSpice Symbol created at: {symbol_file}")
+        else:
+            print(f"Error: unable to create the {corner} subcircuit model")
+            status = 1
+
+    return status
+
+
+def convert_batch(args, report):
+    """
+    Converts every model of all the input ibis files into the batch output directory
+    """
+    subcircuit_type = _SUBCIRCUIT_TYPES[args.s]
+    corners = _CORNERS if args.corner == "All" else [args.corner]
+    summary = batch.run_batch(args.inputs, args.batch, report, corners=corners, subcircuit_type=subcircuit_type,
+                              validate=args.validate, max_points=args.max_points,
+                              edge_tolerance=get_edge_tolerance(args), fit_tolerance=args.fit_iv)
+    print(f"{summary['conversions']} subcircuit models created in {summary['total_time']:.2f}s, "
+          f"{summary['failures']} failures, {summary['warnings']} warnings")
+    if args.validate:
+        print(f"{summary['validations']} output models validated against the ibis waveforms")
+
+    if args.plots:
+        from pybis2spice import plot_export
+        for input_filepath in args.inputs:
+            plot_dir = os.path.join(args.plots, os.path.splitext(os.path.basename(input_filepath))[0])
+            plot_export.export_plots(input_filepath, plot_dir, formats=args.plot_formats)
+            print(f"Review plots written to {os.path.join(plot_dir, 'index.html')}")
+    return 1 if summary["failures"] else 0
+
+
+def get_edge_tolerance(args):
+    """
+    returns the k-parameter switching window tolerance, None if trimming is disabled
+    """
+    return None if args.no_trim else args.edge_tolerance
+
+
+class _NullReport(object):
+    """
+    Stands in for a batch.ReportWriter when no report file is requested
+    """
+
+    def write(self, record):
+        pass
+
+    def close(self):
+        pass
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="converts an ibis model into a spice subcircuit model")
     parser.add_argument("input", help="ibis file path")
     parser.add_argument("cmp", help="ibis component name")
     parser.add_argument("mod", help="ibis model name")
-    parser.add_argument("out", help="output subcircuit file path")
-
+    parser.add_argument("out", help="output subcircuit file path, or output directory if the corner is All")
+    parser.add_argument("-t", "--io-type", choices=["Output", "Input"], default="Output",
+                        help="create an output or input subcircuit model (default Output)")
+    add_common_arguments(parser)
+    return parser
+
+
+def create_batch_parser():
+    parser = argparse.ArgumentParser(description="converts every model of the ibis files into spice subcircuit models")
+    parser.add_argument("inputs", nargs="+", help="ibis file paths")
+    parser.add_argument("--batch", required=True, metavar="OUT_DIR",
+                        help="output directory, a sub-directory is created for each ibis file")
+    parser.add_argument("--validate", action="store_true",
+                        help="simulate each output model with the ibis waveform fixtures and report the error "
+                             "(written to the report file)")
+    parser.add_argument("--plots", metavar="PLOT_DIR",
+                        help="also export the review plots of every model with an html index to the directory")
+    parser.add_argument("--plot-formats", nargs="+", choices=["png", "svg"], default=["png"],
+                        help="image formats of the review plots (default png)")
+    add_common_arguments(parser)
+    return parser
+
+
+def add_common_arguments(parser):
     parser.add_argument("-v", action="version",
                         version=f'pybis2spice version {version.__version__} (released {version.__date__})')
-    parser.add_argument("-s", nargs=1,
+    parser.add_argument("-s", type=int,
                         help="subcircuit option. 1 is for a LTSpice subcircuit model, 2 is a generic subcircuit model",
                         choices=[1, 2], default=1)
-
-    args = parser.parse_args()
-    print(f"input file:         {args.input}")
-    print(f"component name:     {args.cmp}")
-    print(f"model name:         {args.mod}")
-    print(f"output file:        {args.out}")
-    print(f"subcircuit option:  {args.s}")
-
-
-# Validate the inputs
-# Check that input file name is acceptable
-# Check that output file directory exists and file is not being overridden
-# Check that component exists in the input file
-# Check that model exists in the input ibis file
-
-# Run the IBIS model converter program
-
-#directory = os.path.dirname(os.getcwd())
-
-#file_path = os.path.join(directory, 'test/ibis/stm32g031_041_ufqfpn32.ibs')
-#model_name = 'io6_ft_3v3_highspeed'
-#component_name = 'stm32g031_041_ufqfpn32'
-
-# Loads the IBIS model with the user input parameters
-#ibis_data = pybis2spice.DataModel(file_path, model_name, component_name)
-
-# printing the output allows the user to scan and check that the right data has been loaded
-#print(ibis_data)
-
+    parser.add_argument("-c", "--corner", choices=_CORNERS + ["All"], default="Typical",
+                        help="model corner (default Typical)")
+    parser.add_argument("--max-points", type=int, metavar="N",
+                        help="solve the k-parameters of output models on an adaptive time grid of N samples that is "
+                             "dense at the switching edges (default: the ibis waveform samples)")
+    parser.add_argument("--edge-tolerance", type=float, default=subcircuit.EDGE_TOLERANCE, metavar="FRACTION",
+                        help="trim the k-parameters of output models to the switching window where they are further "
+                             "than this fraction of their swing from the settled values (default "
+                             f"{subcircuit.EDGE_TOLERANCE})")
+    parser.add_argument("--no-trim", action="store_true",
+                        help="keep the full ibis waveform window of the k-parameters")
+    parser.add_argument("--fit-iv", nargs="?", type=float, const=subcircuit.FIT_TOLERANCE, metavar="TOLERANCE",
+                        help="replace the IV tables of the devices and clamps with smooth closed-form curves that are "
+                             "within TOLERANCE of the table current (default TOLERANCE "
+                             f"{subcircuit.FIT_TOLERANCE}). Tables that cannot be fitted are kept")
+    parser.add_argument("--report", metavar="NDJSON",
+                        help="write a JSON lines record for each conversion to the file as the run progresses")
+    parser.add_argument("--memory-profile", nargs="?", const="", metavar="JSON",
+                        help="trace the memory of each conversion stage and print the peak allocations. "
+                             "The full profile is written to the JSON file if given")
 
 
+if __name__ == '__main__':
 
+    batch_mode = "--batch" in sys.argv[1:]
+    if batch_mode:
+        args = create_batch_parser().parse_args()
+        print(f"input files:        {len(args.inputs)}")
+        print(f"output directory:   {args.batch}")
+        error_message = None
+        for input_filepath in args.inputs:
+            if not os.path.isfile(input_filepath):
+                error_message = f"ibis file not found: {input_filepath}"
+        run = convert_batch
+    else:
+        args = create_parser().parse_args()
+        print(f"input file:         {args.input}")
+        print(f"component name:     {args.cmp}")
+        print(f"model name:         {args.mod}")
+        print(f"output:             {args.out}")
+        print(f"io type:            {args.io_type}")
+        error_message = validate_inputs(args)
+        run = convert
+    print(f"subcircuit option:  {args.s}")
+    print(f"corner:             {args.corner}")
+
+    if error_message is not None:
+        print(f"Error: {error_message}")
+        sys.exit(1)
+
+    report_writer = batch.ReportWriter(args.report) if args.report else _NullReport()
+    try:
+        if args.memory_profile is None:
+            exit_status = run(args, report_writer)
+        else:
+            with instrument.Profiler(trace_memory=True) as profiler:
+                exit_status = run(args, report_writer)
+
+            print("\nMemory profile:")
+            print(profiler.memory_report())
+            if args.memory_profile:
+                profiler.dump_json(args.memory_profile)
+                print(f"Memory profile written to {args.memory_profile}")
+    finally:
+        report_writer.close()
+
+    if args.report:
+        print(f"Run report written to {args.report}")
+    sys.exit(exit_status)
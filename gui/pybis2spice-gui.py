@@ -6,10 +6,7 @@
 A tkinter GUI for helping users to convert IBIS models into SPICE models
 """
 # ---------------------------------------------------------------------------
-import matplotlib.pyplot as plt
-
 from pybis2spice import pybis2spice
-from pybis2spice import plot
 from pybis2spice import version
 from pybis2spice import subcircuit
 import tkinter as tk
@@ -17,8 +14,6 @@ from tkinter import ttk
 from tkinter import messagebox
 from tkinter import filedialog
 from tktooltip import ToolTip
-from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg, NavigationToolbar2Tk)
-import numpy as np
 import time
 import logging
 import webbrowser
@@ -27,9 +22,20 @@ import img
 import re
 import os
 import platform
+import threading
+import queue
+import concurrent.futures
+import bisect
 
 logging.basicConfig(level=logging.INFO)
-ibis_model = None  # The ecdtools ibis_model object
+active_task = None  # The BackgroundTask currently running in a worker thread
+_executor = None  # Reused background executor for the subcircuit generation (see get_executor)
+
+# Functions posted by the worker threads to be run on the Tk main thread. Tk widgets must only be used from the
+# main thread, so the worker threads never touch the GUI directly
+_gui_queue = queue.Queue()
+_POLL_INTERVAL_MS = 50
+_LIST_CHUNK_SIZE = 500  # Number of names inserted into a listbox per event loop iteration
 
 # ---------------------------------------------------------------------------
 # Helper Functions
@@ -118,6 +124,321 @@ def validate_type(ibis_data, io_type):
     return ret_val
 
 
+# ---------------------------------------------------------------------------
+# Background Tasks
+# ---------------------------------------------------------------------------
+class BackgroundTask(object):
+    """
+    Tracks a job running in a worker thread so that it can be cancelled from the GUI.
+    A worker cannot be interrupted part way through an ecdtools call or the solve of a corner, so workers check
+    for cancellation between steps and the results of a cancelled task are discarded when they arrive
+    """
+
+    def __init__(self, description):
+        self.description = description
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+
+def post_to_gui(func, *args):
+    # Can be called from any thread. The function is run on the Tk main thread by poll_gui_queue
+    _gui_queue.put((func, args))
+
+
+def poll_gui_queue():
+    while True:
+        try:
+            func, args = _gui_queue.get_nowait()
+        except queue.Empty:
+            break
+        func(*args)
+    main_window.after(_POLL_INTERVAL_MS, poll_gui_queue)
+
+
+def set_action_buttons_state(state):
+    for button in [btn1, btn2, btn4]:
+        button.config(state=state)
+
+
+def start_task(description, steps=None):
+    # Shows the progress indicator and disables the buttons that would start another task
+    # If the number of steps is given, the progress bar shows the steps completed, otherwise it is indeterminate
+    global active_task
+    active_task = BackgroundTask(description)
+
+    status_label.config(text=description)
+    if steps is None:
+        progress_bar.config(mode="indeterminate")
+        progress_bar.start(10)
+    else:
+        progress_bar.config(mode="determinate", maximum=steps, value=0)
+    status_label.place(x=status_xpos, y=113)
+    progress_bar.place(x=status_xpos + 190, y=113)
+    btn_cancel.place(x=status_xpos + 380, y=110)
+    set_action_buttons_state(tk.DISABLED)
+    main_window.config(cursor="watch")
+    logging.info(f"{description} - started")
+
+    return active_task
+
+
+def update_task_progress(task, steps_done, text):
+    if task is not active_task:
+        return
+    progress_bar.config(value=steps_done)
+    status_label.config(text=text)
+
+
+def finish_task(task):
+    global active_task
+    if task is not active_task:
+        return
+    active_task = None
+
+    progress_bar.stop()
+    progress_bar.config(value=0)
+    status_label.place_forget()
+    progress_bar.place_forget()
+    btn_cancel.place_forget()
+    set_action_buttons_state(tk.NORMAL)
+    main_window.config(cursor="")
+
+
+def cancel_task_callback():
+    task = active_task
+    if task is not None:
+        task.cancel()
+        logging.info(f"{task.description} - cancelled")
+        finish_task(task)
+
+
+def parse_ibis_file_worker(task, ibis_filepath):
+    # Runs in a worker thread
+    ibis = None
+    model_types = {}
+    error_message = None
+    try:
+        ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+        model_types = get_model_types(ibis)
+    except Exception as error:
+        error_message = str(error)
+
+    post_to_gui(parse_ibis_file_done, task, ibis_filepath, ibis, model_types, error_message)
+
+
+def get_model_types(ibis):
+    # Lightweight scan of the model types for the model list badges, no DataModel is created
+    return {model.name: model.model_type for model in ibis.models}
+
+
+def parse_ibis_file_done(task, ibis_filepath, ibis, model_types, error_message):
+    if task.cancelled:
+        logging.info(f"Discarding the parsed ibis file {ibis_filepath}")
+        return
+    finish_task(task)
+
+    if error_message is not None:
+        messagebox.showerror(title="Failed to parse IBIS file", message=f"{ibis_filepath}\n\n{error_message}")
+        logging.error(f"Failed to parse ibis file {ibis_filepath}: {error_message}")
+        return
+
+    prefetcher.set_ibis(ibis)
+    logging.info(f"Parsed ibis file {ibis_filepath}")
+
+    # The lists are filled in chunks, the first item is selected once the first chunk is in.
+    # Selecting the first items starts the DataModel prefetch (see selection_changed_callback)
+    component_view.set_names(pybis2spice.list_components(ibis))
+    model_view.set_names(pybis2spice.list_models(ibis), badges=model_types)
+
+
+# ---------------------------------------------------------------------------
+# Speculative DataModel Prefetch
+# ---------------------------------------------------------------------------
+class DataModelPrefetcher(object):
+    """
+    Holds the parsed ibis file and builds the DataModel of the selected component and model in a background
+    thread as soon as the selection changes, so that the Check Model and Create buttons respond instantly.
+    Only the latest selection is kept. Stale builds that have not started are cancelled, and a build that has
+    already started is discarded when it finishes
+    """
+
+    def __init__(self):
+        self.ibis = None  # The ecdtools ibis object of the loaded file
+        self._executor = None
+        self._generation = 0
+        self._key = None
+        self._future = None
+
+    def set_ibis(self, ibis):
+        # Called on the main thread when a new file is loaded (None while a file is being parsed)
+        self.reset()
+        self.ibis = ibis
+
+    def request(self, component_name, model_name):
+        # Called on the main thread whenever the selection changes
+        if self.ibis is None or component_name == "" or model_name == "":
+            return
+        key = (component_name, model_name)
+        if key == self._key:
+            return
+
+        self.reset()
+        self._key = key
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._future = self._executor.submit(self._build, self._generation, self.ibis, component_name, model_name)
+
+    def _build(self, generation, ibis, component_name, model_name):
+        # Runs in the prefetch thread
+        if generation != self._generation:
+            return None  # The selection changed before the build started
+        logging.info(f"Prefetching DataModel - {component_name} - {model_name}")
+        return pybis2spice.DataModel(ibis, model_name, component_name)
+
+    def get(self, component_name, model_name):
+        """
+        returns the DataModel of the component and model. The prefetched DataModel is used if it matches,
+        waiting for the build to finish if it is still running, otherwise the DataModel is built now.
+        Raises pybis2spice.ModelLoadError if no file is loaded or the model cannot be loaded
+        """
+        if self.ibis is None:
+            raise pybis2spice.ModelLoadError("No IBIS file loaded")
+        if (component_name, model_name) == self._key and not self._future.cancelled():
+            ibis_data = self._future.result()
+            if ibis_data is not None:
+                return ibis_data
+        return pybis2spice.DataModel(self.ibis, model_name, component_name)
+
+    def reset(self):
+        # Cancels any outstanding build and forgets the prefetched DataModel
+        self._generation += 1
+        if self._future is not None:
+            self._future.cancel()
+        self._future = None
+        self._key = None
+
+    def shutdown(self):
+        self.reset()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def selection_changed_callback(event=None):
+    prefetcher.request(component_view.get_selected(), model_view.get_selected())
+
+
+# ---------------------------------------------------------------------------
+# Searchable Lists
+# ---------------------------------------------------------------------------
+class NameIndex(object):
+    """
+    Case-insensitive search index over a list of names.
+    Prefix matches are found with a binary search over the sorted names, followed by the other substring matches
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self._lower_names = [name.lower() for name in names]
+        self._sorted = sorted((lower_name, index) for index, lower_name in enumerate(self._lower_names))
+        self._sorted_names = [lower_name for lower_name, _ in self._sorted]
+
+    def search(self, query):
+        """
+        returns the list of names matching the query. Prefix matches are returned first, in sorted order
+        """
+        query = query.strip().lower()
+        if query == "":
+            return self.names
+
+        start = bisect.bisect_left(self._sorted_names, query)
+        prefix_indexes = []
+        for lower_name, index in self._sorted[start:]:
+            if not lower_name.startswith(query):
+                break
+            prefix_indexes.append(index)
+
+        prefix_set = set(prefix_indexes)
+        substring_indexes = [index for index, lower_name in enumerate(self._lower_names)
+                             if index not in prefix_set and query in lower_name]
+
+        return [self.names[index] for index in prefix_indexes + substring_indexes]
+
+
+class FilteredListbox(object):
+    """
+    Adds incremental filtering to a tk.Listbox. The filter is applied as the user types into the entry.
+    Long lists are inserted in chunks through main_window.after so the window stays responsive.
+
+        Parameters:
+            listbox - the tk.Listbox
+            filter_entry - the tk.Entry the user types the filter text into
+    """
+
+    def __init__(self, listbox, filter_entry):
+        self.listbox = listbox
+        self.filter_var = tk.StringVar()
+        filter_entry.config(textvariable=self.filter_var)
+        self.filter_var.trace_add("write", lambda *args: self.apply_filter())
+
+        self.index = NameIndex([])
+        self.badges = {}
+        self.shown_names = []  # The names in the listbox, in order
+        self._generation = 0  # Incremented to stop any chunked insertion that is still in progress
+
+    def set_names(self, names, badges=None):
+        self.index = NameIndex(names)
+        self.badges = badges if badges is not None else {}
+        self.apply_filter()
+
+    def clear(self):
+        self.set_names([])
+
+    def apply_filter(self):
+        self._generation += 1
+        self.listbox.delete(0, tk.END)
+        self.shown_names = self.index.search(self.filter_var.get())
+        self._insert_chunk(self._generation, 0)
+
+    def _insert_chunk(self, generation, start):
+        if generation != self._generation:
+            return  # The filter has changed since the insertion started
+
+        chunk = self.shown_names[start:start + _LIST_CHUNK_SIZE]
+        self.listbox.insert(tk.END, *[self.format_name(name) for name in chunk])
+
+        if start == 0 and chunk:
+            # Set default selection to first item
+            self.listbox.select_set(0)
+            self.listbox.activate(0)
+            self.listbox.event_generate("<<ListboxSelect>>")
+
+        if start + _LIST_CHUNK_SIZE < len(self.shown_names):
+            main_window.after(1, self._insert_chunk, generation, start + _LIST_CHUNK_SIZE)
+
+    def format_name(self, name):
+        badge = self.badges.get(name)
+        if badge is None:
+            return name
+        return f"{name}  [{badge}]"
+
+    def get_selected(self):
+        # returns the name of the selected item, or "" if the list is empty. The selection is read rather than the
+        # active item, as a mouse click fires <<ListboxSelect>> before the clicked item is made active
+        if not self.shown_names:
+            return ""
+        selection = self.listbox.curselection()
+        index = selection[0] if selection else self.listbox.index(tk.ACTIVE)
+        if index >= len(self.shown_names):
+            return ""
+        return self.shown_names[index]
+
+
 # ---------------------------------------------------------------------------
 # Callback Functions from Buttons or other actions
 # ---------------------------------------------------------------------------
@@ -173,22 +494,25 @@ def help_message_callback():
 
 def create_subcircuit_file_callback():
     ibis_file_path = entry.get()
-    component_name = list_component.get(tk.ACTIVE)
-    model_name = list_model.get(tk.ACTIVE)
+    component_name = component_view.get_selected()
+    model_name = model_view.get_selected()
     io_type = radio_var3.get()
     subcircuit_type = radio_var1.get()  # LTSpice or Generic
     corner = radio_var2.get()
 
     main_window.config(cursor="wait")
-    global ibis_model
-    ibis_data = pybis2spice.DataModel(ibis_model, model_name, component_name)
+    try:
+        ibis_data = prefetcher.get(component_name, model_name)
+    except pybis2spice.ModelLoadError as error:
+        logging.error(error)
+        ibis_data = None
     main_window.update()
     time.sleep(0.01)
     main_window.config(cursor="")
 
     logging.info("Creating subcircuit file button pressed")
 
-    if not(hasattr(ibis_data, 'model')):  # Check that model has been selected
+    if ibis_data is None:  # Check that model has been selected
         logging.error("No model Selected. Please select a valid IBIS file and model")
         messagebox.showwarning(title="No model Selected", message="Please select a valid IBIS file and model")
     else:
@@ -230,77 +554,86 @@ def create_subcircuit_file(ibis_data, subcircuit_type, corner, io_type):
     if file:
         if corner == "All":
             logging.info(f"Chosen Directory: {file}")
-
+            output_location = file
             corners = ["WeakSlow", "Typical", "FastStrong"]
-            filepaths = []
-            generate_model_status = 0
-            for _corner in corners:
-                filename = f'{ibis_data.model_name}-{io_type}-{_corner}.sub'
-                filepath = os.path.join(file, filename)
-                filepaths.append(filepath)
-                logging.info(f"Creating subcircuit for {_corner} corner at {filepath}")
-                ret_val = subcircuit.generate_spice_model(io_type=io_type,
-                                                          subcircuit_type=subcircuit_type,
-                                                          ibis_data=ibis_data,
-                                                          corner=_corner,
-                                                          output_filepath=filepath)
-                generate_model_status += ret_val
-
-            if generate_model_status == 0:
-                message_success = f"SPICE subcircuit models successfully created at:\n{file}"
-
-                # Create symbol
-                if subcircuit_type == "LTSpice":
-                    symbol_file1 = subcircuit.create_ltspice_symbol(ibis_data, "WeakSlow", filepaths[0], io_type)
-                    symbol_file2 = subcircuit.create_ltspice_symbol(ibis_data, "Typical", filepaths[1], io_type)
-                    symbol_file3 = subcircuit.create_ltspice_symbol(ibis_data, "FastStrong", filepaths[2], io_type)
-
-                    logging.info(f"LTSpice Symbol created at: {symbol_file1}")
-                    logging.info(f"LTSpice Symbol created at: {symbol_file2}")
-                    logging.info(f"LTSpice Symbol created at: {symbol_file3}")
-                    message_success += f"\n\nLTSpice symbols also created successfully at:\n{file}\n"
-
-                warnings = get_warnings_from_file(filepaths)
-                if warnings != "":
-                    message_success += f"\n\nWARNINGS within the SPICE subcircuit file: \n"
-                    message_success += f"{warnings}"
-
-                messagebox.showinfo(title="Success", message=message_success)
-                logging.info(message_success)
-            else:
-                message_error = f"SPICE subcircuit model generation failed."
-                messagebox.showerror(title="Failed to create model", message=message_error)
-                logging.error(message_error)
-
-        else:  # If a specific corner was chosen
+            filepaths = [os.path.join(file, f'{ibis_data.model_name}-{io_type}-{_corner}.sub') for _corner in corners]
+        else:
             logging.info(f"Chosen File: {file.name}")
-            # Create the subcircuit file
-            generate_model_status = subcircuit.generate_spice_model(io_type=io_type,
-                                                                    subcircuit_type=subcircuit_type,
-                                                                    ibis_data=ibis_data,
-                                                                    corner=corner,
-                                                                    output_filepath=file.name)
-            if generate_model_status == 0:
-                message_success = f"SPICE subcircuit model successfully created at:\n{file.name}"
-
-                # Create symbol
-                if subcircuit_type == "LTSpice":
-                    symbol_file = subcircuit.create_ltspice_symbol(ibis_data, corner, file.name, io_type)
-                    logging.info(f"LTSpice Symbol created at: {symbol_file}")
-                    message_success += f"\n\nLTSpice symbol also created successfully at:\n{symbol_file}\n"
-
-                warnings = get_warnings_from_file([file.name])
-                if warnings != "":
-                    message_success += f"\n\nWARNINGS within the SPICE subcircuit file: \n"
-                    message_success += f"{warnings}"
-
-                messagebox.showinfo(title="Success", message=message_success)
-                logging.info(message_success)
-
-            else:
-                message_error = f"SPICE subcircuit model generation failed."
-                messagebox.showerror(title="Failed to create model", message=message_error)
-                logging.error(message_error)
+            file.close()
+            output_location = file.name
+            corners = [corner]
+            filepaths = [file.name]
+
+        # The k-parameter solve and file writes run in the background executor so the window stays responsive
+        task = start_task(f"Creating {ibis_data.model_name}", steps=len(corners))
+        get_executor().submit(create_subcircuit_file_worker, task, ibis_data, subcircuit_type, io_type,
+                              corners, filepaths, output_location)
+
+
+def get_executor():
+    # The executor is created on first use and reused for every subcircuit generation to avoid the startup cost
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="pybis2spice")
+    return _executor
+
+
+def create_subcircuit_file_worker(task, ibis_data, subcircuit_type, io_type, corners, filepaths, output_location):
+    # Runs in the executor thread. The cancel request is checked between corners
+    generate_model_status = 0
+    symbol_files = []
+    try:
+        for n, (_corner, filepath) in enumerate(zip(corners, filepaths)):
+            if task.cancelled:
+                return
+            post_to_gui(update_task_progress, task, n, f"Creating {_corner} corner")
+            logging.info(f"Creating subcircuit for {_corner} corner at {filepath}")
+            generate_model_status += subcircuit.generate_spice_model(io_type=io_type,
+                                                                     subcircuit_type=subcircuit_type,
+                                                                     ibis_data=ibis_data,
+                                                                     corner=_corner,
+                                                                     output_filepath=filepath)
+
+        if generate_model_status == 0 and subcircuit_type == "LTSpice" and not task.cancelled:
+            for _corner, filepath in zip(corners, filepaths):
+                symbol_files.append(subcircuit.create_ltspice_symbol(ibis_data, _corner, filepath, io_type))
+    except Exception as error:
+        logging.error(f"SPICE subcircuit model generation failed: {error}")
+        generate_model_status = 1
+
+    warnings = get_warnings_from_file(filepaths) if generate_model_status == 0 else ""
+    post_to_gui(create_subcircuit_file_done, task, generate_model_status, output_location, symbol_files, warnings)
+
+
+def create_subcircuit_file_done(task, generate_model_status, output_location, symbol_files, warnings):
+    if task.cancelled:
+        return
+    finish_task(task)
+
+    if generate_model_status == 0:
+        if len(symbol_files) > 1:
+            message_success = f"SPICE subcircuit models successfully created at:\n{output_location}"
+        else:
+            message_success = f"SPICE subcircuit model successfully created at:\n{output_location}"
+
+        # Symbols
+        for symbol_file in symbol_files:
+            logging.info(f"LTSpice Symbol created at: {symbol_file}")
+        if len(symbol_files) > 1:
+            message_success += f"\n\nLTSpice symbols also created successfully at:\n{output_location}\n"
+        elif symbol_files:
+            message_success += f"\n\nLTSpice symbol also created successfully at:\n{symbol_files[0]}\n"
+
+        if warnings != "":
+            message_success += f"\n\nWARNINGS within the SPICE subcircuit file: \n"
+            message_success += f"{warnings}"
+
+        messagebox.showinfo(title="Success", message=message_success)
+        logging.info(message_success)
+    else:
+        message_error = f"SPICE subcircuit model generation failed."
+        messagebox.showerror(title="Failed to create model", message=message_error)
+        logging.error(message_error)
 
 
 def browse_ibis_file_callback():
@@ -313,56 +646,47 @@ def browse_ibis_file_callback():
 
     if file:
         ibis_filepath = file.name
+        file.close()
 
         entry.config(state='normal')
         entry.delete(0, tk.END)
         entry.insert(0, ibis_filepath)
         entry.config(state='disabled')
 
-        main_window.config(cursor="")
-        time.sleep(0.1)
+        component_view.clear()
+        model_view.clear()
 
-        list_component.delete(0, tk.END)
-        list_model.delete(0, tk.END)
-
-        global ibis_model
-        ibis_model = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+        prefetcher.set_ibis(None)
         logging.info(f"Parsing ibis file from {ibis_filepath}")
 
-        component_names = pybis2spice.list_components(ibis_model)
-        for index, component in enumerate(component_names, start=1):
-            list_component.insert(index, component)
-
-        model_names = pybis2spice.list_models(ibis_model)
-        for index, model in enumerate(model_names, start=1):
-            list_model.insert(index, model)
-
-        # Set default selection to first item
-        list_component.select_set(0)
-        list_model.select_set(0)
-        list_component.event_generate("<<ListboxSelect>>")
-        list_model.event_generate("<<ListboxSelect>>")
-
-        main_window.update()
-        main_window.config(cursor="")
+        # Parsing large ibis files takes seconds, so it is done in a worker thread to keep the window responsive.
+        # The listboxes are filled in by parse_ibis_file_done when the result arrives
+        task = start_task(f"Parsing {os.path.basename(ibis_filepath)}")
+        thread = threading.Thread(target=parse_ibis_file_worker, args=(task, ibis_filepath), daemon=True)
+        thread.start()
 
 
 def check_model_callback():
+    # matplotlib is slow to import, so it is only imported when the first check model window is opened
+    import matplotlib.pyplot as plt
     plt.close("all")  # close any previous matplotlib figures to avoid consuming excess memory
-    component_name = list_component.get(tk.ACTIVE)
-    model_name = list_model.get(tk.ACTIVE)
+    component_name = component_view.get_selected()
+    model_name = model_view.get_selected()
     logging.info(f"Check Model button pressed - {component_name} - {model_name}")
 
     main_window.config(cursor="wait")
 
-    global ibis_model
-    ibis_data = pybis2spice.DataModel(ibis_model, model_name, component_name)
+    try:
+        ibis_data = prefetcher.get(component_name, model_name)
+    except pybis2spice.ModelLoadError as error:
+        logging.error(error)
+        ibis_data = None
 
     main_window.update()
     time.sleep(0.1)
     main_window.config(cursor="")
 
-    if hasattr(ibis_data, 'model'):
+    if ibis_data is not None:
         check_model_window(ibis_data)
     else:
         messagebox.showinfo(title="No model Selected", message="Please select a valid IBIS file and model")
@@ -374,6 +698,9 @@ def check_model_callback():
 # ---------------------------------------------------------------------------
 
 def check_model_window(ibis_data):
+    import matplotlib.pyplot as plt
+    from pybis2spice import plot
+
     data_window = tk.Toplevel(main_window)
     data_window.geometry(f"+{main_window.winfo_rootx() + 50}+{main_window.winfo_rooty() + 50}")
     data_window.title(f"Check IBIS Model - {ibis_data.model_name}")
@@ -416,96 +743,128 @@ def check_model_window(ibis_data):
     else:
         marker = ""
 
+    # The plot tabs are added as empty placeholders. Each figure is only created and drawn the first time its tab
+    # is selected, as the user usually only looks at one or two of the tabs
+    plot_tabs = {}  # tab widget name: (tab title, function returning the figure, tab text)
+
     # Pullup Tab
     if ibis_data.iv_pullup is not None:
-        fig1 = plot.plot_iv_data_single(ibis_data.iv_pullup, "Pullup device IV data", marker=marker)
         device_lbl = "\n1. Device configured to switch on pullup transistor.\n" \
                      "2. Current through pin is measured while voltage across device is swept from (-VCC) to (2 x VCC)"
-        add_check_window_plot_tab(ibis_data, tab_parent, fig1, "Pullup", tab_text=device_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Pullup")
+        plot_tabs[str(tab)] = ("Pullup", lambda: plot.plot_iv_data_single(ibis_data.iv_pullup,
+                                                                          "Pullup device IV data",
+                                                                          marker=marker), device_lbl)
 
     # Pulldown Tab
     if ibis_data.iv_pulldown is not None:
-        fig2 = plot.plot_iv_data_single(ibis_data.iv_pulldown, "Pulldown device IV data", marker=marker)
         device_lbl = "\n1. Device configured to switch on pulldown transistor.\n" \
                      "2. Current through pin is measured while voltage across device is swept from (-VCC) to (2 x VCC)"
-        add_check_window_plot_tab(ibis_data, tab_parent, fig2, "Pulldown", tab_text=device_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Pulldown")
+        plot_tabs[str(tab)] = ("Pulldown", lambda: plot.plot_iv_data_single(ibis_data.iv_pulldown,
+                                                                            "Pulldown device IV data",
+                                                                            marker=marker), device_lbl)
 
     # Power Clamp Tab
     if ibis_data.iv_pwr_clamp is not None:
-        fig3 = plot.plot_iv_data_single(ibis_data.iv_pwr_clamp, "Power clamp IV data", marker=marker)
         clamp_lbl = "\n1. Device transistors are switched off.\n" \
                     "2. Current through pin is measured while voltage across clamp is swept from (VCC) to (2 x VCC)"
-        add_check_window_plot_tab(ibis_data, tab_parent, fig3, "Power Clamp", tab_text=clamp_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Power Clamp")
+        plot_tabs[str(tab)] = ("Power Clamp", lambda: plot.plot_iv_data_single(ibis_data.iv_pwr_clamp,
+                                                                               "Power clamp IV data",
+                                                                               marker=marker), clamp_lbl)
 
     # Ground Clamp Tab
     if ibis_data.iv_gnd_clamp is not None:
-        fig4 = plot.plot_iv_data_single(ibis_data.iv_gnd_clamp, "Ground clamp IV data", marker=marker)
         clamp_lbl = "\n1. Device transistors are switched off.\n" \
                     "2. Current through pin is measured while voltage across clamp is swept from (-VCC) to (VCC)"
-        add_check_window_plot_tab(ibis_data, tab_parent, fig4, "Ground Clamp", tab_text=clamp_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Ground Clamp")
+        plot_tabs[str(tab)] = ("Ground Clamp", lambda: plot.plot_iv_data_single(ibis_data.iv_gnd_clamp,
+                                                                                "Ground clamp IV data",
+                                                                                marker=marker), clamp_lbl)
 
     # Rising Waveform Tab
     if ibis_data.vt_rising:
-        fig5 = plot.plot_vt_rising_waveform_data(ibis_data, marker=marker)
-        plt.subplots_adjust(top=0.86, wspace=0.3)
         rising_waveform_lbl = "\n1. Device transistors configured to switch output from low to high.\n" \
                               "2. Voltage at the pin is measured with respect to time."
-        add_check_window_plot_tab(ibis_data, tab_parent, fig5, "Rising Waveforms", tab_text=rising_waveform_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Rising Waveforms")
+        plot_tabs[str(tab)] = ("Rising Waveforms",
+                               lambda: adjust_waveform_figure(plot.plot_vt_rising_waveform_data(ibis_data,
+                                                                                                marker=marker)),
+                               rising_waveform_lbl)
 
     # Falling Waveform Tab
     if ibis_data.vt_falling:
-        fig6 = plot.plot_vt_falling_waveform_data(ibis_data, marker=marker)
-        plt.subplots_adjust(top=0.86, wspace=0.3)
         falling_waveform_lbl = "\n1. Device transistors configured to switch output from high to low.\n" \
                                "2. Voltage at the pin is measured with respect to time."
-        add_check_window_plot_tab(ibis_data, tab_parent, fig6, "Falling Waveforms", tab_text=falling_waveform_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Falling Waveforms")
+        plot_tabs[str(tab)] = ("Falling Waveforms",
+                               lambda: adjust_waveform_figure(plot.plot_vt_falling_waveform_data(ibis_data,
+                                                                                                 marker=marker)),
+                               falling_waveform_lbl)
 
     # Pullup Transistor Resistance-Voltage Curve
     if ibis_data.iv_pullup is not None:
-        array_size = np.shape(ibis_data.iv_pullup[:, 0])[0]  # Get length of the table data
-        rv_array = np.zeros([array_size, 4])  # Create empty array
-        rv_array[:, 0] = ibis_data.iv_pullup[:, 0]
-
-        # Divide Voltage by current to get resistance
-        rv_array[:, 1] = np.absolute(ibis_data.iv_pullup[:, 0] / ibis_data.iv_pullup[:, 1])   # Typical
-        rv_array[:, 2] = np.absolute(ibis_data.iv_pullup[:, 0] / ibis_data.iv_pullup[:, 2])  # min
-        rv_array[:, 3] = np.absolute(ibis_data.iv_pullup[:, 0] / ibis_data.iv_pullup[:, 3])  # max
-
-        # Remove values outside the 0 - VCC range
-        vcc = pybis2spice.get_reference(ibis_data.pullup_ref, ibis_data.v_range, 3)
-        rv_array = rv_array[(np.logical_and(rv_array[:, 0] >= 0, rv_array[:, 0] <= vcc))]
-
-        fig7 = plot.plot_rv_data_single(rv_array, "Pullup device Resistance-Voltage data", marker=marker)
         device_lbl = "\n1. Device configured to switch on pullup transistor.\n" \
                      "2. Resistance of device is measured while voltage across device is swept from 0 to VCC"
-        add_check_window_plot_tab(ibis_data, tab_parent, fig7, "Pullup Resistance", tab_text=device_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Pullup Resistance")
+        plot_tabs[str(tab)] = ("Pullup Resistance",
+                               lambda: plot.plot_rv_data_single(plot.calculate_rv_data(ibis_data,
+                                                                                       ibis_data.iv_pullup),
+                                                                "Pullup device Resistance-Voltage data",
+                                                                marker=marker), device_lbl)
 
     # Pulldown Transistor Resistance-Voltage Curve
     if ibis_data.iv_pulldown is not None:
-        array_size = np.shape(ibis_data.iv_pulldown[:, 0])[0]  # Get length of the table data
-        rv_array = np.zeros([array_size, 4])  # Create empty array
-        rv_array[:, 0] = ibis_data.iv_pulldown[:, 0]
-
-        # Divide Voltage by current to get resistance
-        rv_array[:, 1] = np.absolute(ibis_data.iv_pulldown[:, 0] / ibis_data.iv_pulldown[:, 1])  # Typical
-        rv_array[:, 2] = np.absolute(ibis_data.iv_pulldown[:, 0] / ibis_data.iv_pulldown[:, 2])  # min
-        rv_array[:, 3] = np.absolute(ibis_data.iv_pulldown[:, 0] / ibis_data.iv_pulldown[:, 3])  # max
-
-        # Remove values outside the 0 - VCC range
-        vcc = pybis2spice.get_reference(ibis_data.pullup_ref, ibis_data.v_range, 3)
-        rv_array = rv_array[(np.logical_and(rv_array[:, 0] >= 0, rv_array[:, 0] <= vcc))]
-
-        fig8 = plot.plot_rv_data_single(rv_array, "Pulldown device Resistance-Voltage data", marker=marker)
         device_lbl = "\n1. Device configured to switch on pulldown transistor.\n" \
                      "2. Resistance of device is measured while voltage across device is swept from 0 to VCC"
-        add_check_window_plot_tab(ibis_data, tab_parent, fig8, "Pulldown Resistance", tab_text=device_lbl)
+        tab = add_check_window_plot_tab(tab_parent, "Pulldown Resistance")
+        plot_tabs[str(tab)] = ("Pulldown Resistance",
+                               lambda: plot.plot_rv_data_single(plot.calculate_rv_data(ibis_data,
+                                                                                       ibis_data.iv_pulldown),
+                                                                "Pulldown device Resistance-Voltage data",
+                                                                marker=marker), device_lbl)
+
+    figures = []
+
+    def tab_changed_callback(event):
+        tab_name = tab_parent.select()
+        if tab_name not in plot_tabs:
+            return  # Summary tab or a tab that has already been rendered
+        tab_title, create_figure, tab_text = plot_tabs.pop(tab_name)
+
+        data_window.config(cursor="watch")
+        fig = create_figure()
+        figures.append(fig)
+        render_check_window_plot_tab(ibis_data, data_window.nametowidget(tab_name), fig, tab_title, tab_text)
+        data_window.config(cursor="")
+
+    def close_window_callback():
+        # Free the figures of the rendered tabs, the unrendered tabs never created theirs
+        for fig in figures:
+            plt.close(fig)
+        data_window.destroy()
+
+    tab_parent.bind("<<NotebookTabChanged>>", tab_changed_callback)
+    data_window.protocol("WM_DELETE_WINDOW", close_window_callback)
 
     tab_parent.pack(expand=1, fill=tk.BOTH)
 
 
-def add_check_window_plot_tab(ibis_data, tab_parent_obj, fig, tab_title, tab_text=""):
+def adjust_waveform_figure(fig):
+    fig.subplots_adjust(top=0.86, wspace=0.3)
+    return fig
+
+
+def add_check_window_plot_tab(tab_parent_obj, tab_title):
+    # Adds an empty placeholder tab. The contents are added by render_check_window_plot_tab
     tab = ttk.Frame(tab_parent_obj)
     tab_parent_obj.add(tab, text=tab_title)
+    return tab
+
+
+def render_check_window_plot_tab(ibis_data, tab, fig, tab_title, tab_text=""):
+    from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg, NavigationToolbar2Tk)
 
     if tab_text != "":
         tab_lbl = tk.Label(tab, text=tab_text)
@@ -524,14 +883,15 @@ def add_check_window_plot_tab(ibis_data, tab_parent_obj, fig, tab_title, tab_tex
 
 
 def create_circuit_setup_image(ibis_data, tab_title, canvas, tab):
-    tab.pullup_iv_setup = pullup_iv_setup = tk.PhotoImage(data=img.get_pullup_iv_circuit())
-    tab.pulldown_iv_setup = pulldown_iv_setup = tk.PhotoImage(data=img.get_pulldown_iv_circuit())
-    tab.vt_fixture = vt_fixture = tk.PhotoImage(data=img.get_vt_fixture())
-    tab.pwr_clamp = pwr_clamp = tk.PhotoImage(data=img.get_pwr_clamp())  # 71 x 120 px
-    tab.gnd_clamp = gnd_clamp = tk.PhotoImage(data=img.get_gnd_clamp())  # 71 x 120 px
-    tab.pullup_device = pullup_device = tk.PhotoImage(data=img.get_pullup_device())  # 68 x 120 px
-    tab.pulldown_device = pulldown_device = tk.PhotoImage(data=img.get_pulldown_device())  # 68 x 120 px
-    tab.net_segment = net_segment = tk.PhotoImage(data=img.get_net_segment())  # 54 x 12 px
+    # The images are decoded once and shared by all the tabs and windows (see img.get_photo_image)
+    pullup_iv_setup = img.get_photo_image("pullup_iv")
+    pulldown_iv_setup = img.get_photo_image("pulldown_iv")
+    vt_fixture = img.get_photo_image("vt_fixture")
+    pwr_clamp = img.get_photo_image("pwr_clamp")
+    gnd_clamp = img.get_photo_image("gnd_clamp")
+    pullup_device = img.get_photo_image("pullup_device")
+    pulldown_device = img.get_photo_image("pulldown_device")
+    net_segment = img.get_photo_image("net_segment")
 
     x_offset = 100
     device_xpos = x_offset
@@ -595,14 +955,14 @@ def create_circuit_setup_image(ibis_data, tab_title, canvas, tab):
 def create_circuit_image(ibis_data, canvas, tab):
     model_type = ibis_data.model_type.lower()
 
-    tab.pwr_clamp = pwr_clamp = tk.PhotoImage(data=img.get_pwr_clamp())  # 71 x 120 px
-    tab.gnd_clamp = gnd_clamp = tk.PhotoImage(data=img.get_gnd_clamp())  # 71 x 120 px
-    tab.pullup_device = pullup_device = tk.PhotoImage(data=img.get_pullup_device())  # 68 x 120 px
-    tab.pulldown_device = pulldown_device = tk.PhotoImage(data=img.get_pulldown_device())  # 68 x 120 px
-    tab.net_segment = net_segment = tk.PhotoImage(data=img.get_net_segment())  # 54 x 12 px
-    tab.input_img = input_img = tk.PhotoImage(data=img.get_input())  # 297 x 128 px
-    tab.output = output = tk.PhotoImage(data=img.get_output())  # 297 x 128 px
-    tab.io = io = tk.PhotoImage(data=img.get_io())  # 284 x 130 px
+    pwr_clamp = img.get_photo_image("pwr_clamp")
+    gnd_clamp = img.get_photo_image("gnd_clamp")
+    pullup_device = img.get_photo_image("pullup_device")
+    pulldown_device = img.get_photo_image("pulldown_device")
+    net_segment = img.get_photo_image("net_segment")
+    input_img = img.get_photo_image("input")
+    output = img.get_photo_image("output")
+    io = img.get_photo_image("io")
 
     if model_type == "input":
         x_offset = 100
@@ -737,7 +1097,7 @@ if __name__ == '__main__':
     # Set up the Icon
     # Using a base 64 image within a python file so that the exe build does not depend on an external icon file
     # _icon_data = base64.b64decode(img.get_icon())
-    _icon_img = tk.PhotoImage(data=img.get_icon())
+    _icon_img = img.get_photo_image("icon")
     main_window.iconphoto(False, _icon_img)
 
     # ---------------------------------------------------------------------------
@@ -769,12 +1129,27 @@ if __name__ == '__main__':
     label2 = tk.Label(master=frame2, text="IBIS Model Select")
     label2.place(x=_width / 2, y=10)
 
+    entry_component_filter = tk.Entry(master=frame2, width=20)
+    entry_component_filter.place(x=175, y=10)
+    ToolTip(entry_component_filter, msg="filter the components by name", delay=0.2)
+
+    entry_model_filter = tk.Entry(master=frame2, width=20)
+    entry_model_filter.place(x=_width / 2 + 165, y=10)
+    ToolTip(entry_model_filter, msg="filter the models by name", delay=0.2)
+
     list_component = tk.Listbox(master=frame2, exportselection=0, width=45, height=10)
     list_component.place(x=10, y=35)
 
     list_model = tk.Listbox(master=frame2, exportselection=0, width=45, height=10)
     list_model.place(x=_width / 2, y=35)
 
+    component_view = FilteredListbox(list_component, entry_component_filter)
+    model_view = FilteredListbox(list_model, entry_model_filter)
+
+    prefetcher = DataModelPrefetcher()
+    list_component.bind("<<ListboxSelect>>", selection_changed_callback)
+    list_model.bind("<<ListboxSelect>>", selection_changed_callback)
+
     btn2 = tk.Button(master=frame2, text="Check Model", command=check_model_callback)
     btn2_ypos = 205
     if check_platform() == "Mac":
@@ -855,4 +1230,15 @@ if __name__ == '__main__':
     btn4 = tk.Button(master=frame3, text="Create SPICE Subcircuit", command=create_subcircuit_file_callback)
     btn4.place(x=btn4_xpos, y=110)
 
+    # Progress of the background tasks. Only placed while a task is running (see start_task and finish_task)
+    status_xpos = btn4_xpos + 180
+    status_label = tk.Label(master=frame3, text="", width=24, anchor=tk.W)
+    progress_bar = ttk.Progressbar(master=frame3, orient=tk.HORIZONTAL, length=180, mode="indeterminate")
+    btn_cancel = tk.Button(master=frame3, text="Cancel", command=cancel_task_callback)
+
+    main_window.after(_POLL_INTERVAL_MS, poll_gui_queue)
     main_window.mainloop()
+
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    prefetcher.shutdown()
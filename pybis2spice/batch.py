@@ -0,0 +1,379 @@
+# ----------------------------------------------------------------------------
+# Author: Kishan Amratia
+# Module Name: batch.py
+#
+# Module Description:
+# Batch conversion of ibis files into spice subcircuit models with a machine-readable run report.
+# The report is written as JSON lines (NDJSON), one record per line, while the run progresses so that large
+# runs can be aggregated without holding all the records in memory.
+#
+# Record types:
+#   "file": one per ibis file - input hash, parse time and the number of components and models
+#   "model": one per model - DataModel extraction time and table sizes
+#   "conversion": one per subcircuit file - corner, stage timings, k-parameter point counts before and after
+#                 compression, output bytes and warnings
+#   "validation": one per output model when validation is enabled - the error between the simulated fixture
+#                 waveforms of the generated model and the ibis V-T waveforms for each corner
+#   "summary": one at the end of the run with the totals
+#
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+from pybis2spice import instrument
+from pybis2spice import simulate
+
+CORNERS = ["WeakSlow", "Typical", "FastStrong"]
+_INPUT_MODEL_TYPES = ["input", "i/o", "i/o_open_drain"]
+
+
+class ReportWriter(object):
+    """
+    Streams report records to a JSON lines file. Each record is flushed as soon as it is written.
+
+        Usage:
+            with batch.ReportWriter("report.ndjson") as report:
+                batch.run_batch(ibis_filepaths, output_dir, report)
+
+        Parameters:
+            output: file path, or an already open text file object (which is not closed by the writer)
+    """
+
+    def __init__(self, output):
+        if isinstance(output, (str, os.PathLike)):
+            self.file = open(output, 'w')
+            self._close_file = True
+        else:
+            self.file = output
+            self._close_file = False
+        self.count = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        if self._close_file:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def get_io_types(model_type):
+    """
+    returns the list of io types ("Input", "Output") that can be created for the model type
+    """
+    io_types = []
+    if model_type is not None:
+        if model_type.lower() in _INPUT_MODEL_TYPES:
+            io_types.append("Input")
+        if model_type.lower() in subcircuit.OUTPUT_MODEL_TYPES:
+            io_types.append("Output")
+    return io_types
+
+
+def get_table_sizes(ibis_data):
+    """
+    returns a dictionary of the number of rows in each iv and vt table of the DataModel (None if it doesn't exist)
+    """
+    sizes = {}
+    for name in ["iv_pullup", "iv_pulldown", "iv_pwr_clamp", "iv_gnd_clamp"]:
+        table = getattr(ibis_data, name, None)
+        sizes[name] = None if table is None else int(np.shape(table)[0])
+    sizes["vt_rising"] = [int(np.shape(waveform.data)[0]) for waveform in getattr(ibis_data, "vt_rising", [])]
+    sizes["vt_falling"] = [int(np.shape(waveform.data)[0]) for waveform in getattr(ibis_data, "vt_falling", [])]
+    return sizes
+
+
+def get_stage_times(profiler):
+    """
+    returns a dictionary of the total wall time in seconds of each stage recorded by the profiler
+    """
+    return {name: total["wall_time"] for name, total in profiler.summary().items()}
+
+
+def get_k_points(profiler):
+    """
+    returns the k-parameter point counts before and after compression for each solved waveform:
+        [{"waveform_type": "Rising", "source": "waveforms", "before": n, "after": m}, ...]
+    Each solve stage is paired with the compress stage of the same corner and waveform_type. Edges synthesised
+    from the [Ramp] are not compressed, so their counts before and after are the solved size
+    """
+    compress_records = [record for record in profiler.records if record.name == "compress"]
+
+    k_points = []
+    for solve_record in profiler.records:
+        if solve_record.name != "solve_k_params":
+            continue
+        key = (solve_record.labels.get("corner"), solve_record.labels.get("waveform_type"))
+        compress_record = next((record for record in compress_records
+                                if (record.labels.get("corner"), record.labels.get("waveform_type")) == key), None)
+        if compress_record is None:
+            before = after = solve_record.sizes["k_param"][0]
+        else:
+            compress_records.remove(compress_record)
+            before = compress_record.sizes["k_param"][0]
+            after = compress_record.sizes["k_comp"][0]
+        k_points.append({"waveform_type": solve_record.labels.get("waveform_type"),
+                         "source": solve_record.labels.get("source", "waveforms"),
+                         "before": before,
+                         "after": after})
+    return k_points
+
+
+def get_iv_fits(profiler):
+    """
+    returns the segment count and error of each closed-form IV curve fitted in the conversion, in the order of the
+    sources: [{"table": n, "segments": m, "max_error": e}, ...]
+    """
+    return [{"table": record.sizes["table"],
+             "segments": record.sizes["segments"],
+             "max_error": record.labels["max_error"]} for record in profiler.records if record.name == "fit_iv"]
+
+
+def format_warnings(caught_warnings):
+    """
+    returns the list of unique warning messages in the order they were raised
+    """
+    messages = []
+    for warning in caught_warnings:
+        message = f"{warning.category.__name__}: {warning.message}"
+        if message not in messages:
+            messages.append(message)
+    return messages
+
+
+def convert_item(ibis_data, input_hash, io_type, subcircuit_type, corner, output_filepath, max_points=None,
+                 edge_tolerance=subcircuit.EDGE_TOLERANCE, fit_tolerance=None):
+    """
+    Creates a single subcircuit file and returns its report record
+
+        Parameters:
+            ibis_data - a DataModel object (defined in pybis2spice.py)
+            input_hash - sha256 hex digest of the ibis file
+            io_type - "Input" or "Output"
+            subcircuit_type - "LTSpice" or "Generic"
+            corner - "WeakSlow" or "Typical" or "FastStrong"
+            output_filepath - path of output file
+            max_points - if given, the size of the adaptive k-parameter time grid of output models
+            edge_tolerance - the k-parameter switching window tolerance of output models, None to not trim
+            fit_tolerance - if given, the error bound of the closed-form IV curves that replace the tables
+
+        Returns:
+            the "conversion" report record dictionary
+    """
+    with warnings.catch_warnings(record=True) as caught_warnings, instrument.Profiler() as profiler:
+        warnings.simplefilter("always")
+        ret = subcircuit.generate_spice_model(io_type=io_type,
+                                              subcircuit_type=subcircuit_type,
+                                              ibis_data=ibis_data,
+                                              corner=corner,
+                                              output_filepath=output_filepath,
+                                              max_points=max_points,
+                                              edge_tolerance=edge_tolerance,
+                                              fit_tolerance=fit_tolerance)
+
+    warning_messages = format_warnings(caught_warnings)
+    output_bytes = None
+    if ret == 0:
+        output_bytes = os.path.getsize(output_filepath)
+    else:
+        warning_messages.append("conversion failed")
+
+    return {"record": "conversion",
+            "input_hash": input_hash,
+            "component": ibis_data.component_name,
+            "model": ibis_data.model_name,
+            "model_type": ibis_data.model_type,
+            "io_type": io_type,
+            "subcircuit_type": subcircuit_type,
+            "corner": corner,
+            "status": "ok" if ret == 0 else "failed",
+            "stages": get_stage_times(profiler),
+            "table_sizes": get_table_sizes(ibis_data),
+            "k_points": get_k_points(profiler),
+            "iv_fits": get_iv_fits(profiler),
+            "output_file": output_filepath,
+            "output_bytes": output_bytes,
+            "warnings": warning_messages}
+
+
+def validate_item(ibis_data, input_hash, corners):
+    """
+    Simulates the generated output model with the fixture of each ibis V-T waveform and returns the
+    "validation" report record. Models without the V-T waveforms needed to simulate them (see simulate.can_simulate),
+    such as the models whose edges are synthesised from the [Ramp], are skipped with a warning
+    """
+    waveforms = []
+    warning_messages = []
+    with warnings.catch_warnings(record=True) as caught_warnings, instrument.Profiler() as profiler:
+        warnings.simplefilter("always")
+        if not simulate.can_simulate(ibis_data):
+            warning_messages.append("validation skipped: the model does not have the rising and falling V-T "
+                                    "waveforms needed to simulate its fixtures")
+        else:
+            try:
+                waveforms = simulate.validate_model(ibis_data, corners=corners)
+            except Exception as error:
+                warning_messages.append(f"validation failed: {error}")
+
+    warning_messages = format_warnings(caught_warnings) + warning_messages
+    relative_errors = [waveform["relative_max_error"] for waveform in waveforms
+                       if waveform["relative_max_error"] is not None]
+
+    return {"record": "validation",
+            "input_hash": input_hash,
+            "component": ibis_data.component_name,
+            "model": ibis_data.model_name,
+            "model_type": ibis_data.model_type,
+            "stages": get_stage_times(profiler),
+            "waveforms": waveforms,
+            "max_relative_error": max(relative_errors) if relative_errors else None,
+            "warnings": warning_messages}
+
+
+def load_model(ibis, input_hash, model_name, component_name):
+    """
+    Extracts the DataModel of a model
+
+        Returns:
+            (ibis_data, record) - the DataModel (None if it could not be loaded) and its "model" report record
+    """
+    ibis_data = None
+    load_error = None
+    with warnings.catch_warnings(record=True) as caught_warnings, instrument.Profiler() as profiler:
+        warnings.simplefilter("always")
+        try:
+            ibis_data = pybis2spice.DataModel(ibis, model_name, component_name)
+        except pybis2spice.ModelLoadError as error:
+            load_error = error
+
+    warning_messages = format_warnings(caught_warnings)
+    if load_error is not None:
+        warning_messages.append(f"unable to load the model: {load_error.__cause__}")
+        model_type = None
+    else:
+        model_type = ibis_data.model_type
+        warning_messages += list(ibis_data.iv_warnings)
+
+    record = {"record": "model",
+              "input_hash": input_hash,
+              "component": component_name,
+              "model": model_name,
+              "model_type": model_type,
+              "stages": get_stage_times(profiler),
+              "table_sizes": get_table_sizes(ibis_data),
+              "warnings": warning_messages}
+
+    return ibis_data, record
+
+
+def run_batch(ibis_filepaths, output_dir, report, corners=None, subcircuit_type="LTSpice", validate=False,
+              max_points=None, edge_tolerance=subcircuit.EDGE_TOLERANCE, fit_tolerance=None):
+    """
+    Converts every supported model of each ibis file into subcircuit files for each corner.
+    Output models create both an input and output subcircuit file if the model type supports both.
+    The report records are written as the run progresses.
+
+        Parameters:
+            ibis_filepaths - list of ibis file paths
+            output_dir - directory for the subcircuit files. A sub-directory is created for each ibis file
+            report - a ReportWriter object
+            corners - list of corners (default all corners)
+            subcircuit_type - "LTSpice" or "Generic", applies to the output models only
+            validate - if True, the output models are simulated with the ibis waveform fixtures and a
+                       "validation" record is written for each (see simulate.py)
+            max_points - if given, the size of the adaptive k-parameter time grid of the output models
+                         (see pybis2spice.build_adaptive_time_grid)
+            edge_tolerance - the output model k-parameters are trimmed to the switching window with this start and
+                             settling tolerance (see pybis2spice.trim_k_param). None keeps the full waveform window
+            fit_tolerance - if given, the IV tables are replaced by closed-form curves within this error of the tables
+                            (see pybis2spice.fit_iv_curve). None keeps the tables
+
+        Returns:
+            the "summary" report record dictionary
+    """
+    if corners is None:
+        corners = CORNERS
+
+    summary = {"record": "summary", "files": 0, "models": 0, "conversions": 0, "failures": 0, "output_bytes": 0,
+               "validations": 0, "warnings": 0}
+    start = time.perf_counter()
+
+    for ibis_filepath in ibis_filepaths:
+        input_hash = pybis2spice.hash_file(ibis_filepath)
+        with instrument.Profiler() as profiler:
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+        report.write({"record": "file",
+                      "input_hash": input_hash,
+                      "file": str(ibis_filepath),
+                      "file_bytes": os.path.getsize(ibis_filepath),
+                      "stages": get_stage_times(profiler),
+                      "components": len(ibis.component_names),
+                      "models": len(ibis.model_names)})
+        summary["files"] += 1
+        if not ibis.component_names:
+            continue
+
+        file_output_dir = os.path.join(output_dir, os.path.splitext(os.path.basename(ibis_filepath))[0])
+        os.makedirs(file_output_dir, exist_ok=True)
+
+        for model_name in pybis2spice.list_models(ibis):
+            component_name = pybis2spice.find_component_for_model(ibis, model_name)
+            ibis_data, model_record = load_model(ibis, input_hash, model_name, component_name)
+            if ibis_data is not None and not get_io_types(ibis_data.model_type):
+                model_record["warnings"].append(f"model type {ibis_data.model_type} is not supported")
+            report.write(model_record)
+            summary["models"] += 1
+            summary["warnings"] += len(model_record["warnings"])
+            if ibis_data is None:
+                continue
+
+            for io_type in get_io_types(ibis_data.model_type):
+                _subcircuit_type = subcircuit_type if io_type == "Output" else "Generic"
+                for corner in corners:
+                    output_filepath = os.path.join(file_output_dir, f'{model_name}-{io_type}-{corner}.sub')
+                    record = convert_item(ibis_data, input_hash, io_type, _subcircuit_type, corner, output_filepath,
+                                          max_points=max_points, edge_tolerance=edge_tolerance,
+                                          fit_tolerance=fit_tolerance)
+                    report.write(record)
+
+                    summary["conversions"] += 1
+                    summary["failures"] += record["status"] != "ok"
+                    summary["output_bytes"] += record["output_bytes"] or 0
+                    summary["warnings"] += len(record["warnings"])
+
+            if validate and "Output" in get_io_types(ibis_data.model_type):
+                record = validate_item(ibis_data, input_hash, corners)
+                report.write(record)
+                summary["validations"] += 1
+                summary["warnings"] += len(record["warnings"])
+
+    summary["total_time"] = time.perf_counter() - start
+    report.write(summary)
+    return summary
+
+
+def read_report(filepath):
+    """
+    Generator that yields the records of a JSON lines report file one at a time
+    """
+    with open(filepath) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,333 @@
+# ----------------------------------------------------------------------------
+# Author: Kishan Amratia
+# Module Name: columnar.py
+#
+# Module Description:
+# Binary columnar export and import of the model data extracted from an ibis file. Parsing the text ibis file is
+# by far the slowest way to get at the numeric tables, so the data of every model is written once to a flat binary
+# file that loads back into DataModel objects with zero-copy memory-mapped arrays.
+#
+# File layout (all integers little-endian):
+#   magic       8 bytes   b"PYBISCOL"
+#   version     uint32    FORMAT_VERSION
+#   header_len  uint64    length of the JSON header in bytes
+#   header      utf-8 JSON with the file details, component package parameters and for each model the scalars,
+#               ramp, IV table conditioning warnings and the location (offset, shape, dtype) of each of its arrays
+#   padding     up to the next 64 byte boundary, where the data section starts
+#   data        the float64 arrays, each starting on a 64 byte boundary. Offsets are relative to the data section
+#
+# Usage:
+#     columnar.export_ibis_file("test/ibis/hct1g08.ibs", "hct1g08.ibsc")
+#     store = columnar.ColumnarFile("hct1g08.ibsc")
+#     ibis_data = store.get_data_model("HCT1G08_OUTN_50", "74HCT1G08_GW")
+#
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import json
+import os
+import struct
+
+import numpy as np
+from pybis2spice import pybis2spice
+from pybis2spice import instrument
+
+FORMAT_VERSION = 2  # Version 2 stores the conditioned IV tables and their warnings
+FILE_EXTENSION = ".ibsc"
+_MAGIC = b"PYBISCOL"
+_PREAMBLE = struct.Struct("<8sIQ")
+_ALIGNMENT = 64
+_DTYPE = "<f8"
+
+_SCALARS = ["c_comp", "v_range", "temp_range", "pullup_ref", "pulldown_ref", "pwr_clamp_ref", "gnd_clamp_ref"]
+_PACKAGE = ["r_pkg", "l_pkg", "c_pkg"]
+_IV_TABLES = ["iv_pullup", "iv_pulldown", "iv_pwr_clamp", "iv_gnd_clamp"]
+
+
+class ColumnarFormatError(pybis2spice.Pybis2SpiceError):
+    """
+    Raised when a file is not a columnar model data file or was written with an unsupported format version
+    """
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _range_to_list(arr):
+    # [Typ, Min, Max] range parameters are stored as JSON lists, with null for any missing value
+    if arr is None:
+        return None
+    return [None if value is None else float(value) for value in arr]
+
+
+def _list_to_range(values):
+    # Matches extract_range_param, which returns object arrays
+    if values is None:
+        return None
+    arr = np.asarray(values, dtype=object)
+    arr.flags.writeable = False
+    return arr
+
+
+def _ramp_to_dict(ramp):
+    if ramp is None:
+        return None
+    ramp_dict = {"r_load": None if ramp.r_load is None else float(ramp.r_load)}
+    for name in ["dv_dt_r", "dv_dt_f"]:
+        value = getattr(ramp, name)
+        ramp_dict[name] = None if value is None else [[None if x is None else float(x) for x in pair]
+                                                      for pair in value]
+    return ramp_dict
+
+
+class _ArrayWriter(object):
+    """
+    Collects the arrays for the data section and records their location for the header
+    """
+
+    def __init__(self):
+        self.arrays = []
+        self.size = 0
+
+    def add(self, arr):
+        if arr is None:
+            return None
+        arr = np.ascontiguousarray(arr, dtype=_DTYPE)
+        offset = _align(self.size)
+        self.arrays.append((offset, arr))
+        self.size = offset + arr.nbytes
+        return {"offset": offset, "shape": list(arr.shape), "dtype": _DTYPE}
+
+
+def get_model_entry(ibis_data, arrays):
+    """
+    returns the header entry of a model, adding its arrays to the _ArrayWriter
+    """
+    entry = {"model_name": ibis_data.model_name,
+             "model_type": ibis_data.model_type,
+             "scalars": {name: _range_to_list(getattr(ibis_data, name)) for name in _SCALARS},
+             "ramp": _ramp_to_dict(ibis_data.ramp),
+             "iv": {name: arrays.add(getattr(ibis_data, name)) for name in _IV_TABLES},
+             "iv_warnings": list(ibis_data.iv_warnings)}
+
+    for name in ["vt_rising", "vt_falling"]:
+        entry[name] = [{"data": arrays.add(waveform.data),
+                        "v_fix": [float(value) for value in waveform.v_fix],
+                        "r_fix": waveform.r_fix} for waveform in getattr(ibis_data, name)]
+    return entry
+
+
+def export_ibis(ibis, filepath, source_hash=None):
+    """
+    Writes the data of every model of the parsed ibis file to a columnar file
+
+        Parameters:
+            ibis - the ecdtools ibis object (see pybis2spice.get_ibis_model_ecdtools)
+            filepath - path of the output file
+            source_hash - optional hash of the ibis file stored in the header to detect stale exports
+
+        Returns:
+            list of the models that could not be loaded and are missing from the file: [(model_name, error), ...]
+    """
+    with instrument.stage("columnar_export", file=str(filepath)) as record:
+        arrays = _ArrayWriter()
+        components = {}
+        for component in ibis.components:
+            package = component.package
+            components[component.name] = {
+                "package": {name: _range_to_list(pybis2spice.extract_range_param(getattr(package, name, None)))
+                            for name in _PACKAGE},
+                "models": sorted({pin.model_name for pin in component.pins if pin.model_name is not None})}
+
+        models = []
+        skipped = []
+        for model_name in pybis2spice.list_models(ibis):
+            # The model data does not depend on the component, any component is fine to build the DataModel
+            component_name = pybis2spice.find_component_for_model(ibis, model_name)
+            try:
+                ibis_data = pybis2spice.DataModel(ibis, model_name, component_name)
+            except pybis2spice.ModelLoadError as error:
+                skipped.append((model_name, str(error)))
+                continue
+            models.append(get_model_entry(ibis_data, arrays))
+
+        header = {"version": FORMAT_VERSION,
+                  "file_name": ibis.file_name,
+                  "source_hash": source_hash,
+                  "component_names": list(ibis.component_names),
+                  "components": components,
+                  "models": models,
+                  "skipped": [{"model_name": name, "error": error} for name, error in skipped]}
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+        with open(filepath, 'wb') as file:
+            file.write(_PREAMBLE.pack(_MAGIC, FORMAT_VERSION, len(header_bytes)))
+            file.write(header_bytes)
+            for offset, arr in arrays.arrays:
+                file.write(b"\0" * (data_start + offset - file.tell()))
+                file.write(arr.tobytes())
+
+        record.add_size("models", len(models))
+        record.add_size("output_bytes", data_start + arrays.size)
+
+    return skipped
+
+
+def export_ibis_file(ibis_filepath, filepath=None):
+    """
+    Parses the ibis file and writes its columnar file. Defaults to the ibis file path with the .ibsc extension
+
+        Returns:
+            the path of the columnar file
+    """
+    if filepath is None:
+        filepath = os.path.splitext(ibis_filepath)[0] + FILE_EXTENSION
+    ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+    export_ibis(ibis, filepath, source_hash=pybis2spice.hash_file(ibis_filepath))
+    return filepath
+
+
+class StoredRamp(object):
+    """
+    The ramp parameters of a stored model, with the same attributes as the ecdtools Ramp object
+        dv_dt_r, dv_dt_f: ((dv, dt) typ, (dv, dt) min, (dv, dt) max)
+        r_load: the ramp load resistance
+    """
+
+    def __init__(self, ramp_dict):
+        self.dv_dt_r = None if ramp_dict["dv_dt_r"] is None else tuple(tuple(pair) for pair in ramp_dict["dv_dt_r"])
+        self.dv_dt_f = None if ramp_dict["dv_dt_f"] is None else tuple(tuple(pair) for pair in ramp_dict["dv_dt_f"])
+        self.r_load = ramp_dict["r_load"]
+
+
+class StoredWaveform(pybis2spice.Waveform):
+    """
+    A Waveform whose data array is memory-mapped from a columnar file
+    """
+
+    def __init__(self, data, v_fix, r_fix):
+        self.data = data
+        self.v_fix = pybis2spice.freeze_array(np.asarray(v_fix, dtype='float64'))
+        self.r_fix = r_fix
+        self._freeze()
+
+
+class StoredDataModel(pybis2spice.DataModel):
+    """
+    A DataModel loaded from a columnar file. The tables are read-only memory-mapped views of the file.
+    The file attribute is the ColumnarFile and the ecdtools model and component attributes are None
+    """
+
+    def __init__(self, store, entry, component_name):
+        self.model_name = entry["model_name"]
+        self.component_name = component_name
+
+        with instrument.stage("data_model", component=component_name, model=self.model_name, source="columnar"):
+            self.file = store
+            self.file_name = store.file_name
+            self.model = None
+            self.component = None
+            self.model_type = entry["model_type"]
+
+            package = store.components[component_name]["package"]
+            for name in _PACKAGE:
+                setattr(self, name, _list_to_range(package[name]))
+            for name in _SCALARS:
+                setattr(self, name, _list_to_range(entry["scalars"][name]))
+            for name in _IV_TABLES:
+                setattr(self, name, store.get_array(entry["iv"][name]))
+            self.iv_warnings = tuple(entry["iv_warnings"])
+
+            self.ramp = None if entry["ramp"] is None else StoredRamp(entry["ramp"])
+            self.vt_rising = tuple(StoredWaveform(store.get_array(waveform["data"]), waveform["v_fix"],
+                                                  waveform["r_fix"]) for waveform in entry["vt_rising"])
+            self.vt_falling = tuple(StoredWaveform(store.get_array(waveform["data"]), waveform["v_fix"],
+                                                   waveform["r_fix"]) for waveform in entry["vt_falling"])
+
+        self._freeze()
+
+
+class ColumnarFile(object):
+    """
+    A columnar model data file opened for reading. The data section is memory-mapped once and every array handed
+    out is a read-only view of it, so only the pages that are used are read from disk.
+    The component_names and model_names attributes match the ecdtools ibis object, so list_components and
+    list_models work on a ColumnarFile
+
+        Parameters:
+            filepath - path of the columnar file
+
+        Raises:
+            ColumnarFormatError: if the file is not a columnar file or the format version is not supported
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        with open(filepath, 'rb') as file:
+            preamble = file.read(_PREAMBLE.size)
+            if len(preamble) < _PREAMBLE.size:
+                raise ColumnarFormatError(f"{filepath} is not a columnar model data file")
+            magic, version, header_len = _PREAMBLE.unpack(preamble)
+            if magic != _MAGIC:
+                raise ColumnarFormatError(f"{filepath} is not a columnar model data file")
+            if version != FORMAT_VERSION:
+                raise ColumnarFormatError(f"{filepath} has format version {version}, "
+                                          f"expected version {FORMAT_VERSION}")
+            header = json.loads(file.read(header_len).decode("utf-8"))
+
+        self.header = header
+        self.file_name = header["file_name"]
+        self.source_hash = header["source_hash"]
+        self.component_names = header["component_names"]
+        self.components = header["components"]
+        self.model_names = [entry["model_name"] for entry in header["models"]]
+        self._entries = {entry["model_name"]: entry for entry in header["models"]}
+
+        data_start = _align(_PREAMBLE.size + header_len)
+        data_size = os.path.getsize(filepath) - data_start
+        if data_size > 0:
+            self._data = np.memmap(filepath, dtype=np.uint8, mode='r', offset=data_start, shape=(data_size,))
+        else:
+            self._data = np.zeros(0, dtype=np.uint8)
+
+    def get_array(self, location):
+        """
+        returns the read-only memory-mapped view of an array from its header location (None is returned unchanged)
+        """
+        if location is None:
+            return None
+        dtype = np.dtype(location["dtype"])
+        size = int(np.prod(location["shape"])) * dtype.itemsize
+        offset = location["offset"]
+        return self._data[offset:offset + size].view(dtype).reshape(location["shape"])
+
+    def get_model_type(self, model_name):
+        return self._entries[model_name]["model_type"]
+
+    def get_data_model(self, model_name, component_name):
+        """
+        returns the StoredDataModel of the model with the package parameters of the component
+
+            Raises:
+                pybis2spice.ModelLoadError: if the model or component is not in the file
+        """
+        if model_name not in self._entries:
+            raise pybis2spice.ModelLoadError(f"Unable to load model {model_name} of component {component_name}: "
+                                             f"model not found in {self.filepath}")
+        if component_name not in self.components:
+            raise pybis2spice.ModelLoadError(f"Unable to load model {model_name} of component {component_name}: "
+                                             f"component not found in {self.filepath}")
+        return StoredDataModel(self, self._entries[model_name], component_name)
+
+    def find_component_for_model(self, model_name):
+        """
+        returns the name of the first component with a pin that uses the model. Defaults to the first component
+        """
+        for component_name in self.component_names:
+            if model_name in self.components[component_name]["models"]:
+                return component_name
+        return self.component_names[0]
@@ -0,0 +1,340 @@
+# ----------------------------------------------------------------------------
+# Author: Kishan Amratia
+# Module Name: generator.py
+#
+# Module Description:
+# Companion functions for the pybis2spice module to write synthetic ibis files of any size.
+# Used for scale and stress testing the conversion pipeline (see benchmark/pybis2spice-benchmark.py)
+#
+# The IV tables are created from simple device models (tanh drivers and soft diode clamps). The waveforms are the
+# quasi-static solution of the buffer into each fixture while the drivers switch, so the k-parameters can be solved.
+#
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import os
+
+import numpy as np
+
+
+# Sizes of the generated file when the scale is 1. Roughly the size of a typical vendor ibis file
+DEFAULT_SIZES = {"components": 1, "pins": 16, "models": 5, "iv_points": 100, "waveform_points": 100}
+
+MODEL_TYPES = ["I/O", "Output", "3-State", "Input", "Open_drain"]
+
+# Corner multipliers in the order [typ, min, max]. Min is the weak/slow corner and max is the fast/strong corner
+_VCC = np.asarray([3.3, 3.0, 3.6])
+_STRENGTH = np.asarray([1.0, 0.75, 1.3])
+_EDGE_TIME = np.asarray([1.0, 1.4, 0.7])
+
+_THERMAL_VOLTAGE = 0.026
+
+
+def scaled_sizes(scale, param=None):
+    """
+    Returns the DEFAULT_SIZES dictionary with sizes multiplied by scale
+
+        Parameters:
+            scale - multiplier for the sizes
+            param - name of a single size to scale i.e. "waveform_points". If None, the iv_points and
+                    waveform_points are scaled
+    """
+    sizes = dict(DEFAULT_SIZES)
+    params = [param] if param is not None else ["iv_points", "waveform_points"]
+    for name in params:
+        sizes[name] = max(int(round(sizes[name] * scale)), 1)
+    return sizes
+
+
+def diode_current(v, v_on=0.7, r_series=2.0, n=1.5):
+    """
+    Forward current of a soft diode clamp. Exponential below v_on, tending to a series resistance above it
+    """
+    n_vt = n * _THERMAL_VOLTAGE
+    return (n_vt / r_series) * np.logaddexp(0, (v - v_on) / n_vt)
+
+
+def driver_current(v, strength, i_sat=0.05, v_sat=1.0):
+    """
+    Current of a driver transistor with the given voltage across it. Linear at low voltage, saturates at i_sat
+    """
+    return strength * i_sat * np.tanh(v / v_sat)
+
+
+def create_iv_tables(iv_points):
+    """
+    Creates the IV tables for the synthetic model. Pullup and pulldown tables include the clamp currents as they
+    would when measured on a real device.
+
+        Returns:
+            dictionary of numpy arrays organised as [voltage, typ, min, max] for the keys:
+            "pulldown", "pullup", "gnd_clamp", "power_clamp"
+    """
+    v_max = np.max(_VCC)
+    v_device = np.linspace(-v_max, 2 * v_max, iv_points)
+    v_clamp = np.linspace(-v_max, v_max, iv_points)
+
+    tables = {"pulldown": np.zeros([iv_points, 4]),
+              "pullup": np.zeros([iv_points, 4]),
+              "gnd_clamp": np.zeros([iv_points, 4]),
+              "power_clamp": np.zeros([iv_points, 4])}
+    tables["pulldown"][:, 0] = v_device
+    tables["pullup"][:, 0] = v_device
+    tables["gnd_clamp"][:, 0] = v_clamp
+    tables["power_clamp"][:, 0] = v_clamp
+
+    # ground clamp is referenced to ground and the power clamp to vcc (voltage is vcc - v_pin)
+    gnd_clamp_device = -diode_current(-v_device)
+    pwr_clamp_device = diode_current(-v_device)
+    for corner in range(0, 3):
+        tables["pulldown"][:, corner + 1] = driver_current(v_device, _STRENGTH[corner]) + gnd_clamp_device
+        tables["pullup"][:, corner + 1] = -driver_current(v_device, _STRENGTH[corner]) + pwr_clamp_device
+        tables["gnd_clamp"][:, corner + 1] = -diode_current(-v_clamp)
+        tables["power_clamp"][:, corner + 1] = diode_current(-v_clamp)
+
+    return tables
+
+
+def solve_pin_voltage(vcc, strength, k_u, k_d, v_fix, r_fix, iterations=60):
+    """
+    Solves the quasi-static pin voltage of the buffer into a fixture, for every sample of k_u and k_d at once.
+    The buffer current is monotonic in the pin voltage, so a vectorised bisection is used.
+    """
+    v_low = np.full(np.shape(k_u), -vcc)
+    v_high = np.full(np.shape(k_u), 2 * vcc)
+    for _ in range(iterations):
+        v = (v_low + v_high) / 2
+        i_buffer = k_d * driver_current(v, strength) - k_u * driver_current(vcc - v, strength) \
+            - diode_current(-v) + diode_current(v - vcc)
+        i_fixture = (v_fix - v) / r_fix
+        too_high = i_buffer > i_fixture
+        v_high = np.where(too_high, v, v_high)
+        v_low = np.where(too_high, v_low, v)
+    return (v_low + v_high) / 2
+
+
+def create_waveform(waveform_points, waveform_type, v_fix, r_fix, open_drain=False):
+    """
+    Creates a V-T waveform table organised as [time, typ, min, max]
+
+        Parameters:
+            waveform_points - number of time samples
+            waveform_type - "Rising" or "Falling"
+            v_fix - fixture voltage as a numpy array [typ, min, max]
+            r_fix - fixture resistance
+            open_drain - if True, the pullup device is never switched on
+    """
+    edge_duration = 2e-9
+    t_stop = 4 * edge_duration * np.max(_EDGE_TIME)
+    time = np.linspace(0, t_stop, waveform_points)
+
+    table = np.zeros([waveform_points, 4])
+    table[:, 0] = time
+    for corner in range(0, 3):
+        tau = 0.2 * edge_duration * _EDGE_TIME[corner]
+        k_on = 0.5 * (1 + np.tanh((time - 0.3 * t_stop) / tau))
+        if waveform_type == "Rising":
+            k_u, k_d = k_on, 1 - k_on
+        else:
+            k_u, k_d = 1 - k_on, k_on
+        if open_drain:
+            k_u = np.zeros(np.shape(time))
+
+        table[:, corner + 1] = solve_pin_voltage(_VCC[corner], _STRENGTH[corner], k_u, k_d, v_fix[corner], r_fix)
+
+    return table
+
+
+def apply_na_pattern(table, na_pattern, na_fraction, rng):
+    """
+    Returns a copy of the table with NaN values (written as NA) in the min and max columns
+
+        Parameters:
+            na_pattern - None, "columns" (the whole min and max columns are NA) or
+                         "random" (each min and max value is NA with a probability of na_fraction)
+    """
+    table = np.array(table)
+    if na_pattern == "columns":
+        table[:, 2:] = np.nan
+    elif na_pattern == "random":
+        mask = rng.random(np.shape(table[:, 2:])) < na_fraction
+        table[:, 2:][mask] = np.nan
+    return table
+
+
+def format_row(row):
+    """
+    returns a table row as an ibis formatted string, with NaN values written as NA
+    """
+    items = []
+    for value in row:
+        if np.isnan(value):
+            items.append(f'{"NA":>14}')
+        else:
+            items.append(f'{value:14.6E}')
+    return "  ".join(items)
+
+
+def write_table(file, keyword, table):
+    file.write(f'{keyword}\n')
+    for row in table:
+        file.write(f'{format_row(row)}\n')
+
+
+def write_range(file, keyword, values):
+    file.write(f'{keyword:24s}{values[0]:>10.4g}{values[1]:>10.4g}{values[2]:>10.4g}\n')
+
+
+def get_ramp(waveform):
+    """
+    Determines the 20% to 80% ramp [dV, dt] for each corner of a waveform table
+    """
+    ramp = []
+    for corner in range(1, 4):
+        voltage = waveform[:, corner]
+        v_start = voltage[0]
+        v_end = voltage[-1]
+        v_20 = v_start + 0.2 * (v_end - v_start)
+        v_80 = v_start + 0.8 * (v_end - v_start)
+        t_20 = waveform[np.argmax(np.abs(voltage - v_start) >= np.abs(v_20 - v_start)), 0]
+        t_80 = waveform[np.argmax(np.abs(voltage - v_start) >= np.abs(v_80 - v_start)), 0]
+        ramp.append((abs(v_80 - v_20), max(t_80 - t_20, 1e-12)))
+    return ramp
+
+
+def write_model(file, model_name, model_type, sizes, na_pattern, na_fraction, rng, waveforms=True):
+    """
+    Writes a single [Model] section to the file
+    """
+    tables = create_iv_tables(sizes["iv_points"])
+    open_drain = model_type.lower() == "open_drain"
+    has_output = model_type.lower() != "input"
+
+    file.write(f'[Model]          {model_name}\n')
+    file.write(f'Model_type       {model_type}\n')
+    if model_type.lower() in ["input", "i/o"]:
+        file.write('Vinl = 0.8\n')
+        file.write('Vinh = 2.0\n')
+    if has_output:
+        file.write('Vmeas = 1.65\n')
+        file.write('Cref = 0\n')
+        file.write('Rref = 50\n')
+    file.write('C_comp        2.0000pF        1.8000pF        2.2000pF\n')
+    write_range(file, '[Temperature Range]', [25, 85, 0])
+    write_range(file, '[Voltage Range]', _VCC)
+
+    if has_output:
+        write_table(file, '[Pulldown]', apply_na_pattern(tables["pulldown"], na_pattern, na_fraction, rng))
+        if not open_drain:
+            write_table(file, '[Pullup]', apply_na_pattern(tables["pullup"], na_pattern, na_fraction, rng))
+    write_table(file, '[GND Clamp]', apply_na_pattern(tables["gnd_clamp"], na_pattern, na_fraction, rng))
+    if not open_drain:
+        write_table(file, '[POWER Clamp]', apply_na_pattern(tables["power_clamp"], na_pattern, na_fraction, rng))
+
+    if has_output:
+        r_fix = 50.0
+        if open_drain:
+            fixtures = [_VCC]
+        else:
+            fixtures = [np.zeros(3), _VCC]
+
+        rising = [create_waveform(sizes["waveform_points"], "Rising", v_fix, r_fix, open_drain)
+                  for v_fix in fixtures]
+        falling = [create_waveform(sizes["waveform_points"], "Falling", v_fix, r_fix, open_drain)
+                   for v_fix in fixtures]
+
+        ramp_r = get_ramp(rising[0])
+        ramp_f = get_ramp(falling[-1])
+        file.write('[Ramp]\n')
+        file.write('|                 typ                 min                 max\n')
+        file.write('dV/dt_r' + "".join(f'  {dv:.4f}/{dt:.4E}' for dv, dt in ramp_r) + '\n')
+        file.write('dV/dt_f' + "".join(f'  {dv:.4f}/{dt:.4E}' for dv, dt in ramp_f) + '\n')
+        file.write(f'R_load = {r_fix:g}\n')
+
+        if waveforms:
+            for waveform_type, waveform_tables in [("Rising", rising), ("Falling", falling)]:
+                for v_fix, table in zip(fixtures, waveform_tables):
+                    file.write(f'[{waveform_type} Waveform]\n')
+                    file.write(f'R_fixture = {r_fix:g}\n')
+                    file.write(f'V_fixture = {v_fix[0]:g}\n')
+                    file.write(f'V_fixture_min = {v_fix[1]:g}\n')
+                    file.write(f'V_fixture_max = {v_fix[2]:g}\n')
+                    file.write('| time             V(typ)             V(min)             V(max)\n')
+                    for row in table:
+                        file.write(f'{format_row(row)}\n')
+
+    file.write('|\n')
+
+
+def generate_ibis_file(filepath, components=1, pins=16, models=5, iv_points=100, waveform_points=100,
+                       model_types=None, na_pattern=None, na_fraction=0.1, waveforms=True, seed=0):
+    """
+    Writes a valid synthetic ibis file
+
+        Parameters:
+            filepath - path of the ibis file to create
+            components - number of [Component] sections
+            pins - number of pins per component. Pins are assigned to the models in turn
+            models - number of [Model] sections
+            iv_points - number of rows in each IV table
+            waveform_points - number of rows in each V-T waveform table
+            model_types - list of model types assigned to the models in turn. Defaults to MODEL_TYPES
+            na_pattern - None, "columns" or "random". NA values in the min/max columns of the IV tables
+            na_fraction - probability of a min/max value being NA when na_pattern is "random"
+            waveforms - if False, output models only have [Ramp] data and no V-T waveforms
+            seed - seed for the random NA pattern
+
+        Returns:
+            the list of model names in the file
+    """
+    if model_types is None:
+        model_types = MODEL_TYPES
+    rng = np.random.default_rng(seed)
+    sizes = {"iv_points": iv_points, "waveform_points": waveform_points}
+
+    model_names = [f'SYN_MODEL_{n}' for n in range(0, models)]
+    file_name = os.path.basename(filepath).lower()
+
+    with open(filepath, 'w') as file:
+        file.write('[IBIS Ver]       5.1\n')
+        file.write(f'[File Name]      {file_name}\n')
+        file.write('[File Rev]       1.0\n')
+        file.write('[Date]           19-Oct-2026\n')
+        file.write('[Source]         Synthetic model created by the pybis2spice generator module\n')
+        file.write('[Notes]          For scale and stress testing only\n')
+        file.write('[Disclaimer]     Not a model of any real device\n')
+
+        for c in range(0, components):
+            file.write(f'[Component]      SYN_COMPONENT_{c}\n')
+            file.write('[Manufacturer]   pybis2spice\n')
+            file.write('[Package]\n')
+            file.write('R_pkg   8.00E-02   7.00E-02   9.00E-02\n')
+            file.write('L_pkg   1.50E-09   1.40E-09   1.60E-09\n')
+            file.write('C_pkg   2.50E-13   2.00E-13   3.00E-13\n')
+            file.write('[Pin] signal_name     model_name\n')
+            for p in range(0, pins):
+                if p == 0:
+                    model_name = 'GND'
+                elif p == 1:
+                    model_name = 'POWER'
+                else:
+                    model_name = model_names[(p - 2) % models]
+                file.write(f'{p + 1:<8d}SIG_{p + 1:<12d}{model_name}\n')
+
+        for m, model_name in enumerate(model_names):
+            write_model(file, model_name, model_types[m % len(model_types)], sizes, na_pattern, na_fraction, rng,
+                        waveforms=waveforms)
+
+        file.write('[End]\n')
+
+    return model_names
+
+
+def generate_scaled_ibis_file(filepath, scale, param=None, **kwargs):
+    """
+    Writes a synthetic ibis file with the DEFAULT_SIZES multiplied by scale (see scaled_sizes)
+    Any other keyword arguments are passed to generate_ibis_file
+    """
+    return generate_ibis_file(filepath, **scaled_sizes(scale, param), **kwargs)
@@ -0,0 +1,331 @@
+# ----------------------------------------------------------------------------
+# Author: Kishan Amratia
+# Module Name: instrument.py
+#
+# Module Description:
+# Companion functions for the pybis2spice module to record the time spent in each stage of the conversion
+# pipeline (ibis parsing, DataModel extraction, k-parameter solving, compression and netlist creation)
+# Optionally records the peak memory and top allocation sites of each stage using tracemalloc
+#
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import contextvars
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+
+# The profiler that is currently recording. Held in a context variable so that each thread has its own profiler
+_active_profiler = contextvars.ContextVar("pybis2spice_active_profiler", default=None)
+
+
+class StageRecord(object):
+    """
+    A data container for the measurements of a single pipeline stage
+
+        Contains the following attributes:
+            name: stage name i.e. "parse", "data_model", "solve_k_params", "compress" or "netlist"
+            labels: dictionary of extra information about the stage i.e. model name or corner
+            parent: name of the enclosing stage, None if the stage is not nested
+            wall_time: elapsed wall-clock time in seconds
+            cpu_time: elapsed process cpu time in seconds
+            sizes: dictionary of array shapes (as lists) or item counts recorded during the stage
+
+        When the profiler traces memory, the following attributes are also populated (otherwise None):
+            memory_peak: peak traced memory during the stage in bytes, relative to the start of the stage
+            memory_delta: traced memory still allocated at the end of the stage in bytes, relative to the start
+            top_allocations: list of the allocation sites that grew the most during the stage
+                             [{"site": "file:line", "size_diff": bytes, "count_diff": number of blocks}, ...]
+    """
+
+    def __init__(self, name, labels, parent=None):
+        self.name = name
+        self.labels = labels
+        self.parent = parent
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.sizes = {}
+        self.memory_peak = None
+        self.memory_delta = None
+        self.top_allocations = None
+
+    def add_size(self, label, value):
+        """
+        Records the size of an array (as its shape) or a plain count against the given label
+        """
+        if value is None:
+            self.sizes[label] = None
+        elif isinstance(value, (int, np.integer)):
+            self.sizes[label] = int(value)
+        else:
+            self.sizes[label] = list(np.shape(value))
+
+    def add_label(self, label, value):
+        """
+        Adds a result of the stage, i.e. a fit error, to the labels of the record
+        """
+        self.labels[label] = value
+
+    def to_dict(self):
+        return {"name": self.name,
+                "labels": self.labels,
+                "parent": self.parent,
+                "wall_time": self.wall_time,
+                "cpu_time": self.cpu_time,
+                "sizes": self.sizes,
+                "memory_peak": self.memory_peak,
+                "memory_delta": self.memory_delta,
+                "top_allocations": self.top_allocations}
+
+    def __repr__(self):
+        st = f"> {self.name}: wall={self.wall_time:.6f}s cpu={self.cpu_time:.6f}s sizes={self.sizes}"
+        if self.memory_peak is not None:
+            st += f" memory_peak={self.memory_peak / 1e6:.3f}MB memory_delta={self.memory_delta / 1e6:.3f}MB"
+        return st
+
+
+class _NullRecord(object):
+    """
+    Stands in for a StageRecord when no profiler is active so that the instrumented code does not need to check
+    """
+
+    def add_size(self, label, value):
+        pass
+
+    def add_label(self, label, value):
+        pass
+
+
+class _NullStage(object):
+
+    def __enter__(self):
+        return _NULL_RECORD
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_RECORD = _NullRecord()
+_NULL_STAGE = _NullStage()
+
+
+# Allocations made by the import system, tracemalloc or the profiler itself are not of interest in the allocation sites
+_SNAPSHOT_FILTERS = [tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                     tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                     tracemalloc.Filter(False, tracemalloc.__file__),
+                     tracemalloc.Filter(False, __file__)]
+
+
+class _Stage(object):
+
+    def __init__(self, profiler, name, labels):
+        self.profiler = profiler
+        parent = profiler._stack[-1].record.name if profiler._stack else None
+        self.record = StageRecord(name, labels, parent)
+        self._snapshot = None
+        self._start_memory = 0
+        self._peak_memory = 0
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            if self.profiler.top_allocations:
+                self._snapshot = tracemalloc.take_snapshot()
+
+            # tracemalloc only has a single peak, so hand the peak so far to the enclosing stage before resetting it
+            current, peak = tracemalloc.get_traced_memory()
+            if self.profiler._stack:
+                self.profiler._stack[-1].fold_peak(peak)
+            tracemalloc.reset_peak()
+            self._start_memory = current
+            self._peak_memory = current
+
+        self.profiler._stack.append(self)
+        self._start_cpu = time.process_time()
+        self._start_wall = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record.wall_time = time.perf_counter() - self._start_wall
+        self.record.cpu_time = time.process_time() - self._start_cpu
+        self.profiler._stack.pop()
+
+        if self.profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            self.fold_peak(peak)
+            self.record.memory_peak = self._peak_memory - self._start_memory
+            self.record.memory_delta = current - self._start_memory
+            if self._snapshot is not None:
+                self.record.top_allocations = get_top_allocations(self._snapshot, tracemalloc.take_snapshot(),
+                                                                  self.profiler.top_allocations)
+                self._snapshot = None
+            if self.profiler._stack:
+                self.profiler._stack[-1].fold_peak(self._peak_memory)
+
+        self.profiler._add_record(self.record)
+        return False
+
+    def fold_peak(self, peak):
+        self._peak_memory = max(self._peak_memory, peak)
+
+
+def get_top_allocations(snapshot_start, snapshot_end, limit):
+    """
+    returns a list of the allocation sites that grew the most between the 2 tracemalloc snapshots
+    """
+    snapshot_start = snapshot_start.filter_traces(_SNAPSHOT_FILTERS)
+    snapshot_end = snapshot_end.filter_traces(_SNAPSHOT_FILTERS)
+
+    top_allocations = []
+    for stat in snapshot_end.compare_to(snapshot_start, 'lineno'):
+        if stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        top_allocations.append({"site": f"{frame.filename}:{frame.lineno}",
+                                "size_diff": stat.size_diff,
+                                "count_diff": stat.count_diff})
+        if len(top_allocations) >= limit:
+            break
+
+    return top_allocations
+
+
+class Profiler(object):
+    """
+    Records the wall time, cpu time and array sizes of every instrumented stage run while the profiler is active.
+    The profiler only sees the stages run within the thread that activated it.
+    If profilers are nested, the records of the inner profiler are also passed on to the enclosing profiler.
+
+        Usage:
+            with instrument.Profiler() as profiler:
+                ibis = pybis2spice.get_ibis_model_ecdtools(file_path)
+                ...
+            print(profiler.summary())
+            profiler.dump_json("profile.json")
+
+        Parameters:
+            callback: optional function called with each StageRecord as soon as the stage finishes
+            trace_memory: if True, the peak memory of each stage is recorded using tracemalloc.
+                          This is a diagnostic mode, tracemalloc slows down the pipeline considerably
+            top_allocations: number of top allocation sites to record for each stage when tracing memory.
+                             0 disables the tracemalloc snapshots, which are slow for large ibis files
+    """
+
+    def __init__(self, callback=None, trace_memory=False, top_allocations=10):
+        self.records = []
+        self.callbacks = []
+        if callback is not None:
+            self.callbacks.append(callback)
+        self.trace_memory = trace_memory
+        self.top_allocations = top_allocations
+        self._stack = []
+        self._token = None
+        self._started_tracing = False
+        self._outer = None
+
+    def __enter__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._outer = _active_profiler.get()
+        self._token = _active_profiler.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active_profiler.reset(self._token)
+        self._token = None
+        self._outer = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return False
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def _add_record(self, record):
+        self.records.append(record)
+        for callback in self.callbacks:
+            callback(record)
+        if self._outer is not None:
+            self._outer._add_record(record)
+
+    def summary(self):
+        """
+        Returns a dictionary of the totals for each stage name:
+            {stage_name: {"count": n, "wall_time": total seconds, "cpu_time": total seconds}}
+        When tracing memory, the largest memory_peak of each stage name is included as "memory_peak"
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record.name, {"count": 0, "wall_time": 0.0, "cpu_time": 0.0})
+            total["count"] += 1
+            total["wall_time"] += record.wall_time
+            total["cpu_time"] += record.cpu_time
+            if record.memory_peak is not None:
+                total["memory_peak"] = max(total.get("memory_peak", 0), record.memory_peak)
+        return totals
+
+    def memory_report(self):
+        """
+        Returns a human-readable string of the peak memory and top allocation sites of each recorded stage
+        """
+        st = ""
+        for record in self.records:
+            if record.memory_peak is None:
+                continue
+            labels = ", ".join(f"{key}={value}" for key, value in record.labels.items())
+            st += f"{record.name} ({labels})\n"
+            st += f"    peak: {record.memory_peak / 1e6:.3f} MB, retained: {record.memory_delta / 1e6:.3f} MB\n"
+            for allocation in record.top_allocations or []:
+                st += f"    {allocation['size_diff'] / 1e3:10.1f} kB {allocation['count_diff']:8d} blocks " \
+                      f"{allocation['site']}\n"
+        return st
+
+    def to_dict(self):
+        return {"records": [record.to_dict() for record in self.records],
+                "summary": self.summary()}
+
+    def dump_json(self, filepath):
+        """
+        Writes all the stage records and the per-stage summary to a json file
+        """
+        with open(filepath, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def __repr__(self):
+        st = ""
+        for record in self.records:
+            st += f"{record}\n"
+        return st
+
+
+def get_active_profiler():
+    """
+    returns the profiler recording in the current thread, or None if profiling is disabled
+    """
+    return _active_profiler.get()
+
+
+def stage(name, **labels):
+    """
+    Context manager that times a pipeline stage and returns its StageRecord for sizes to be added.
+    When no profiler is active a shared do-nothing context is returned so the cost is a single lookup.
+
+        Parameters:
+            name: stage name
+            labels: any extra information about the stage to be stored with the record
+
+        Usage:
+            with instrument.stage("compress", corner=corner) as record:
+                ...
+                record.add_size("k_param", k_param)
+    """
+    profiler = _active_profiler.get()
+    if profiler is None:
+        return _NULL_STAGE
+    return _Stage(profiler, name, labels)
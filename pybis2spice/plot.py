@@ -12,15 +12,107 @@
 # ---------------------------------------------------------------------------
 import numpy as np
 import matplotlib.pyplot as plt
+from pybis2spice import pybis2spice
 
+# Series with more points than this are decimated before plotting. A figure canvas is around 1000 pixels wide,
+# and the min-max decimation keeps 2 points per pixel bucket
+_DEFAULT_MAX_POINTS = 2000
 
-def plot_iv_data_single(data, title, marker=None):
+
+def decimate_min_max(x, y, max_points, x_min=None, x_max=None):
+    """
+    Reduces a series to at most max_points (plus the end points) by splitting it into buckets and keeping the
+    minimum and maximum sample of each bucket. The envelope of the series is preserved, so peaks and edges are
+    still drawn at the right height.
+
+        Parameters:
+            x - numpy array of the x-data, in ascending order
+            y - numpy array of the y-data
+            max_points - maximum number of points to return
+            x_min, x_max - optional visible x range. Only the samples within the range (and one either side so
+                           the line reaches the edges of the axes) are kept
+
+        Returns:
+            (x_dec, y_dec) - the decimated series
+    """
+    start = 0
+    stop = len(x)
+    if x_min is not None:
+        start = max(np.searchsorted(x, x_min, side='left') - 1, 0)
+    if x_max is not None:
+        stop = min(np.searchsorted(x, x_max, side='right') + 1, len(x))
+    x = x[start:stop]
+    y = y[start:stop]
+
+    num_points = len(x)
+    num_buckets = max_points // 2
+    if num_points <= max_points or num_buckets < 1:
+        return x, y
+
+    # Pad the series to a whole number of buckets by repeating the last sample
+    bucket_size = int(np.ceil(num_points / num_buckets))
+    padded = np.pad(y, (0, bucket_size * num_buckets - num_points), mode='edge').reshape(num_buckets, bucket_size)
+    offsets = np.arange(num_buckets) * bucket_size
+    index_min = np.minimum(offsets + np.argmin(padded, axis=1), num_points - 1)
+    index_max = np.minimum(offsets + np.argmax(padded, axis=1), num_points - 1)
+
+    index = np.unique(np.concatenate(([0, num_points - 1], index_min, index_max)))
+    return x[index], y[index]
+
+
+class DecimatedLine(object):
+    """
+    A matplotlib line that only draws a decimated copy of its data. The line is re-decimated whenever the x-axis
+    limits change (i.e. zoom and pan in the navigation toolbar), so more detail is shown as the user zooms in.
+
+        Parameters:
+            ax - matplotlib axes
+            x, y - numpy arrays of the full series
+            max_points - maximum number of points drawn
+            kwargs - passed on to ax.plot i.e. label, marker
+    """
+
+    def __init__(self, ax, x, y, max_points=_DEFAULT_MAX_POINTS, **kwargs):
+        self.x = x
+        self.y = y
+        self.max_points = max_points
+        x_dec, y_dec = decimate_min_max(x, y, max_points)
+        (self.line,) = ax.plot(x_dec, y_dec, **kwargs)
+        # matplotlib only holds weak references to bound methods, the lambda keeps this object alive with the axes
+        ax.callbacks.connect('xlim_changed', lambda _ax: self.xlim_changed_callback(_ax))
+
+    def xlim_changed_callback(self, ax):
+        x_min, x_max = sorted(ax.get_xlim())
+        x_dec, y_dec = decimate_min_max(self.x, self.y, self.max_points, x_min, x_max)
+        self.line.set_data(x_dec, y_dec)
+
+
+def plot_line(ax, x, y, label, marker=None, max_points=_DEFAULT_MAX_POINTS):
+    """
+    Plots a series on the axes. Series longer than max_points are plotted as a DecimatedLine
+
+        Returns:
+            the matplotlib Line2D object
+    """
+    kwargs = {"label": label}
+    if marker is not None:
+        kwargs["marker"] = marker
+
+    if max_points is None or len(x) <= max_points:
+        (line,) = ax.plot(x, y, **kwargs)
+        return line
+
+    return DecimatedLine(ax, x, y, max_points, **kwargs).line
+
+
+def plot_iv_data_single(data, title, marker=None, fig=None):
     """
     Plots the data in a single figure
 
     Parameters:
         data: numpy array with data organised as [x-data, y-data_1, y-data_2..., y-data_n]
         title: Plot title
+        fig: optional figure to clear and reuse instead of creating a new figure
     """
     fig = plot_single(data,
                       data_labels=['Typ', 'Min', 'Max'],
@@ -28,18 +120,20 @@ def plot_iv_data_single(data, title, marker=None):
                       ylabel='Current (A)',
                       title=title,
                       font_title_size=10,
-                      marker=marker)
+                      marker=marker,
+                      fig=fig)
 
     return fig
 
 
-def plot_rv_data_single(data, title, marker=None):
+def plot_rv_data_single(data, title, marker=None, fig=None):
     """
     Plots the resistance-voltage data in a single figure
 
     Parameters:
         data: numpy array with data organised as [x-data, y-data_1, y-data_2..., y-data_n]
         title: Plot title
+        fig: optional figure to clear and reuse instead of creating a new figure
     """
     fig = plot_single(data,
                       data_labels=['Typ', 'Min v_range - Weak', 'Max v_range - Strong'],
@@ -47,7 +141,64 @@ def plot_rv_data_single(data, title, marker=None):
                       ylabel='Resistance of Device (Ω)',
                       title=title,
                       font_title_size=10,
-                      marker=marker)
+                      marker=marker,
+                      fig=fig)
+
+    return fig
+
+
+def calculate_rv_data(ibis_data, iv_data):
+    """
+    Calculates the Resistance-Voltage curve of a pullup or pulldown device from its IV table.
+    Only the voltages within the 0 to VCC range are kept
+
+    Parameters:
+        ibis_data: a DataModel object
+        iv_data: the pullup or pulldown IV table [voltage, I_typ, I_min, I_max]
+
+    Returns:
+        rv_array: numpy array [voltage, R_typ, R_min, R_max]
+    """
+    array_size = np.shape(iv_data[:, 0])[0]  # Get length of the table data
+    rv_array = np.zeros([array_size, 4])  # Create empty array
+    rv_array[:, 0] = iv_data[:, 0]
+
+    # Divide Voltage by current to get resistance
+    rv_array[:, 1] = np.absolute(iv_data[:, 0] / iv_data[:, 1])  # Typical
+    rv_array[:, 2] = np.absolute(iv_data[:, 0] / iv_data[:, 2])  # min
+    rv_array[:, 3] = np.absolute(iv_data[:, 0] / iv_data[:, 3])  # max
+
+    # Remove values outside the 0 - VCC range
+    vcc = pybis2spice.get_reference(ibis_data.pullup_ref, ibis_data.v_range, 3)
+    rv_array = rv_array[(np.logical_and(rv_array[:, 0] >= 0, rv_array[:, 0] <= vcc))]
+
+    return rv_array
+
+
+def plot_k_params(k_param_rising, k_param_falling, title1, title2, marker=None, fig=None):
+    """
+    Plots the rising and falling k-parameter waveforms in 2 graphs laid out horizontally
+
+    Parameters:
+        k_param_rising, k_param_falling: k-parameter arrays [time, k_u, k_d] or [time, k_d] for open-drain outputs
+        title1, title2: titles of the rising and falling graphs
+        fig: optional figure to clear and reuse instead of creating a new figure
+    """
+    if np.shape(k_param_rising)[1] == 2:
+        data_labels = ['Kd']
+    else:
+        data_labels = ['Ku', 'Kd']
+
+    fig = plot_dual(k_param_rising,
+                    k_param_falling,
+                    data_labels=data_labels,
+                    xlabel='Time (s)',
+                    ylabel='k-parameter',
+                    title1=title1,
+                    title2=title2,
+                    font_title_size=10,
+                    marker=marker,
+                    fig=fig)
 
     return fig
 
@@ -107,7 +258,7 @@ def generate_vt_plot_title(waveform_type_str, waveform_obj):
     return title_str
 
 
-def plot_vt_rising_waveform_data(ibis_data, marker=None):
+def plot_vt_rising_waveform_data(ibis_data, marker=None, fig=None):
     """
     takes the ibis_data DataModel object and plots the rising waveform data in 2 graphs laid out horizontally
     left graph - Rising Waveform 1. right graph - Rising Waveform 2
@@ -125,7 +276,8 @@ def plot_vt_rising_waveform_data(ibis_data, marker=None):
                             title1=title1,
                             title2=title2,
                             font_title_size=10,
-                            marker=marker)
+                            marker=marker,
+                            fig=fig)
         else:
             title1 = generate_vt_plot_title("Rising Waveform", ibis_data.vt_rising[0])
             fig = plot_single(ibis_data.vt_rising[0].data,
@@ -134,12 +286,13 @@ def plot_vt_rising_waveform_data(ibis_data, marker=None):
                               ylabel='Voltage (V)',
                               title=title1,
                               font_title_size=10,
-                              marker=marker)
+                              marker=marker,
+                              fig=fig)
 
         return fig
 
 
-def plot_vt_falling_waveform_data(ibis_data, marker=None):
+def plot_vt_falling_waveform_data(ibis_data, marker=None, fig=None):
     """
     takes the ibis_data DataModel object and plots the falling waveform data in 2 graphs laid out horizontally
     left graph - Rising Waveform 1. right graph - Rising Waveform 2
@@ -157,7 +310,8 @@ def plot_vt_falling_waveform_data(ibis_data, marker=None):
                             title1=title1,
                             title2=title2,
                             font_title_size=10,
-                            marker=marker)
+                            marker=marker,
+                            fig=fig)
         else:
             title1 = generate_vt_plot_title("Falling Waveform", ibis_data.vt_falling[0])
             fig = plot_single(ibis_data.vt_falling[0].data,
@@ -166,7 +320,8 @@ def plot_vt_falling_waveform_data(ibis_data, marker=None):
                               ylabel='Voltage (V)',
                               title=title1,
                               font_title_size=10,
-                              marker=marker)
+                              marker=marker,
+                              fig=fig)
         return fig
 
 
@@ -180,7 +335,8 @@ def plot_all_ibis_data(ibis_data):
     plot_vt_falling_waveform_data(ibis_data)
 
 
-def plot_dual(data1, data2, data_labels, xlabel, ylabel, title1, title2, font_title_size=None, marker=None):
+def plot_dual(data1, data2, data_labels, xlabel, ylabel, title1, title2, font_title_size=None, marker=None,
+              max_points=_DEFAULT_MAX_POINTS, fig=None):
     """
     Plots 2 graphs laid out horizontally with given input data (Graph 1 - Left, Graph 2 - Right)
 
@@ -192,8 +348,14 @@ def plot_dual(data1, data2, data_labels, xlabel, ylabel, title1, title2, font_ti
             y_label - y-axis label
             title1 - title of graph 1
             title1 - title of graph 2
+            max_points - lines with more points are decimated (see DecimatedLine). None disables the decimation
+            fig - optional figure to clear and reuse instead of creating a new figure
     """
-    fig, (ax1, ax2) = plt.subplots(1, 2)
+    if fig is None:
+        fig, (ax1, ax2) = plt.subplots(1, 2)
+    else:
+        fig.clf()
+        (ax1, ax2) = fig.subplots(1, 2)
 
     if data1 is not None:
         num_columns = np.shape(data1)[1]
@@ -204,10 +366,7 @@ def plot_dual(data1, data2, data_labels, xlabel, ylabel, title1, title2, font_ti
             x = data1[:, 0][not_nan]
             y = data1[:, i][not_nan]
 
-            if marker is None:
-                ax1.plot(x, y, label=data_labels[i - 1])
-            else:
-                ax1.plot(x, y, label=data_labels[i - 1], marker=marker)
+            plot_line(ax1, x, y, label=data_labels[i - 1], marker=marker, max_points=max_points)
 
         ax1.legend()
         ax1.grid(color='0.9')
@@ -229,10 +388,7 @@ def plot_dual(data1, data2, data_labels, xlabel, ylabel, title1, title2, font_ti
             x = data2[:, 0][not_nan]
             y = data2[:, i][not_nan]
 
-            if marker is None:
-                ax2.plot(x, y, label=data_labels[i - 1])
-            else:
-                ax2.plot(x, y, label=data_labels[i - 1], marker=marker)
+            plot_line(ax2, x, y, label=data_labels[i - 1], marker=marker, max_points=max_points)
 
         ax2.legend()
         ax2.grid(color='0.9')
@@ -250,7 +406,8 @@ def plot_dual(data1, data2, data_labels, xlabel, ylabel, title1, title2, font_ti
     return fig
 
 
-def plot_single(data, data_labels, xlabel, ylabel, title, font_title_size=None, marker=None):
+def plot_single(data, data_labels, xlabel, ylabel, title, font_title_size=None, marker=None,
+                max_points=_DEFAULT_MAX_POINTS, fig=None):
     """
     Plots a graph with given input data
 
@@ -260,9 +417,15 @@ def plot_single(data, data_labels, xlabel, ylabel, title, font_title_size=None,
             x_label - x-axis label
             y_label - y-axis label
             title - title of graph
+            max_points - lines with more points are decimated (see DecimatedLine). None disables the decimation
+            fig - optional figure to clear and reuse instead of creating a new figure
     """
 
-    fig, ax1 = plt.subplots()
+    if fig is None:
+        fig, ax1 = plt.subplots()
+    else:
+        fig.clf()
+        ax1 = fig.subplots()
 
     if data is not None:
         num_columns = np.shape(data)[1]
@@ -274,10 +437,7 @@ def plot_single(data, data_labels, xlabel, ylabel, title, font_title_size=None,
             x = data[:, 0][not_nan]
             y = data[:, i][not_nan]
 
-            if marker is None:
-                ax1.plot(x, y, label=data_labels[i - 1])
-            else:
-                ax1.plot(x, y, label=data_labels[i - 1], marker=marker)
+            plot_line(ax1, x, y, label=data_labels[i - 1], marker=marker, max_points=max_points)
 
         ax1.legend()
         ax1.grid(color='0.9')
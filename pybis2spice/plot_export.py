@@ -0,0 +1,250 @@
+# ----------------------------------------------------------------------------
+# Author: Kishan Amratia
+# Module Name: plot_export.py
+#
+# Module Description:
+# Headless export of the review plots for every model in an ibis file. The IV, V-T and R-V plots shown in the
+# GUI check model window, plus the typical corner k-parameter plots, are rendered with the matplotlib Agg
+# backend to PNG and/or SVG files. The models are rendered in parallel in a process pool and an HTML index
+# page is created for each model and for the whole file.
+#
+# Usage:
+#     from pybis2spice import plot_export
+#     plot_export.export_plots("test/ibis/sample1.ibs", "plots", formats=("png", "svg"))
+#
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import concurrent.futures
+import html
+import os
+
+import matplotlib
+
+# Parsed ibis files of the worker process, so that each worker only parses the file once
+_ibis_cache = {}
+
+_FIGURE_SIZE = (8, 6)
+_DPI = 100
+FORMATS = ["png", "svg"]
+
+
+def _init_worker():
+    # The workers never display a figure, so the non-interactive Agg backend is selected before pyplot is used
+    matplotlib.use("Agg")
+
+
+def get_ibis(ibis_filepath):
+    """
+    returns the parsed ibis file, parsing it only on the first call within the process
+    """
+    from pybis2spice import pybis2spice
+
+    ibis = _ibis_cache.get(ibis_filepath)
+    if ibis is None:
+        _ibis_cache.clear()  # Only the latest file is kept to keep the memory of the workers flat
+        ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+        _ibis_cache[ibis_filepath] = ibis
+    return ibis
+
+
+def get_plots(ibis_data, marker=None):
+    """
+    returns the list of plots available for the model as (plot name, title, function(fig) that draws the plot)
+    """
+    from pybis2spice import pybis2spice
+    from pybis2spice import plot
+    from pybis2spice import subcircuit
+
+    plots = []
+    if ibis_data.iv_pullup is not None:
+        plots.append(("pullup", "Pullup device IV data",
+                      lambda fig: plot.plot_iv_data_single(ibis_data.iv_pullup, "Pullup device IV data",
+                                                           marker=marker, fig=fig)))
+    if ibis_data.iv_pulldown is not None:
+        plots.append(("pulldown", "Pulldown device IV data",
+                      lambda fig: plot.plot_iv_data_single(ibis_data.iv_pulldown, "Pulldown device IV data",
+                                                           marker=marker, fig=fig)))
+    if ibis_data.iv_pwr_clamp is not None:
+        plots.append(("power_clamp", "Power clamp IV data",
+                      lambda fig: plot.plot_iv_data_single(ibis_data.iv_pwr_clamp, "Power clamp IV data",
+                                                           marker=marker, fig=fig)))
+    if ibis_data.iv_gnd_clamp is not None:
+        plots.append(("ground_clamp", "Ground clamp IV data",
+                      lambda fig: plot.plot_iv_data_single(ibis_data.iv_gnd_clamp, "Ground clamp IV data",
+                                                           marker=marker, fig=fig)))
+    if ibis_data.vt_rising:
+        plots.append(("rising_waveforms", "Rising Waveforms",
+                      lambda fig: plot.plot_vt_rising_waveform_data(ibis_data, marker=marker, fig=fig)))
+    if ibis_data.vt_falling:
+        plots.append(("falling_waveforms", "Falling Waveforms",
+                      lambda fig: plot.plot_vt_falling_waveform_data(ibis_data, marker=marker, fig=fig)))
+    if ibis_data.iv_pullup is not None:
+        plots.append(("pullup_resistance", "Pullup device Resistance-Voltage data",
+                      lambda fig: plot.plot_rv_data_single(plot.calculate_rv_data(ibis_data, ibis_data.iv_pullup),
+                                                           "Pullup device Resistance-Voltage data",
+                                                           marker=marker, fig=fig)))
+    if ibis_data.iv_pulldown is not None:
+        plots.append(("pulldown_resistance", "Pulldown device Resistance-Voltage data",
+                      lambda fig: plot.plot_rv_data_single(plot.calculate_rv_data(ibis_data, ibis_data.iv_pulldown),
+                                                           "Pulldown device Resistance-Voltage data",
+                                                           marker=marker, fig=fig)))
+
+    # The k-parameters are plotted as they are written to the netlists, each edge is solved from its V-T waveforms
+    # or synthesised from the [Ramp]
+    has_rising = ibis_data.vt_rising or pybis2spice.extract_ramp_param(ibis_data.ramp, "Rising") is not None
+    has_falling = ibis_data.vt_falling or pybis2spice.extract_ramp_param(ibis_data.ramp, "Falling") is not None
+    if has_rising and has_falling and ibis_data.model_type.lower() in subcircuit.OUTPUT_MODEL_TYPES:
+
+        def plot_k_params(fig):
+            k_param_rising, k_param_falling = subcircuit.solve_output_k_params(ibis_data, 1)
+            return plot.plot_k_params(k_param_rising, k_param_falling, "Rising k-parameters (Typical)",
+                                      "Falling k-parameters (Typical)", marker=marker, fig=fig)
+
+        plots.append(("k_params", "k-parameters (Typical)", plot_k_params))
+
+    return plots
+
+
+def render_model_plots(ibis_filepath, model_name, component_name, output_dir, formats=("png",), marker=None):
+    """
+    Renders all the plots of a single model into output_dir. Run within a process pool worker.
+    A single figure is reused for all the plots of the model and closed at the end.
+
+        Returns:
+            dictionary with the model details and the list of plots:
+            {"model": name, "component": name, "model_type": type, "directory": output_dir,
+             "plots": [{"name": plot name, "title": title, "files": [file names]}], "errors": [messages]}
+    """
+    import matplotlib.pyplot as plt
+    from pybis2spice import pybis2spice
+
+    result = {"model": model_name, "component": component_name, "model_type": None, "directory": output_dir,
+              "plots": [], "errors": []}
+
+    try:
+        ibis_data = pybis2spice.DataModel(get_ibis(ibis_filepath), model_name, component_name)
+    except pybis2spice.ModelLoadError as error:
+        result["errors"].append(str(error))
+        return result
+    result["model_type"] = ibis_data.model_type
+
+    os.makedirs(output_dir, exist_ok=True)
+    fig = plt.figure(figsize=_FIGURE_SIZE, dpi=_DPI)
+    try:
+        for plot_name, title, draw in get_plots(ibis_data, marker=marker):
+            try:
+                draw(fig)
+                if plot_name in ["rising_waveforms", "falling_waveforms"]:
+                    fig.subplots_adjust(top=0.86, wspace=0.3)
+
+                files = []
+                for file_format in formats:
+                    filename = f"{plot_name}.{file_format}"
+                    fig.savefig(os.path.join(output_dir, filename), format=file_format)
+                    files.append(filename)
+                result["plots"].append({"name": plot_name, "title": title, "files": files})
+            except Exception as error:
+                result["errors"].append(f"{plot_name}: {error}")
+    finally:
+        plt.close(fig)
+
+    return result
+
+
+def write_model_index(result):
+    """
+    Writes the index.html page of a model, showing all its plots. Returns the file path of the page
+    """
+    st = "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+    st += f"<title>{html.escape(result['model'])}</title>\n</head>\n<body>\n"
+    st += f"<h1>{html.escape(result['model'])}</h1>\n"
+    st += f"<p>Component: {html.escape(result['component'])}<br>\n"
+    st += f"Model type: {html.escape(str(result['model_type']))}</p>\n"
+    st += "<p><a href=\"../index.html\">All models</a></p>\n"
+
+    for error in result["errors"]:
+        st += f"<p style=\"color:red\">{html.escape(error)}</p>\n"
+
+    for plot_result in result["plots"]:
+        st += f"<h2>{html.escape(plot_result['title'])}</h2>\n"
+        image_file = plot_result["files"][0]
+        st += f"<p><img src=\"{html.escape(image_file)}\" alt=\"{html.escape(plot_result['title'])}\"><br>\n"
+        st += " ".join(f"<a href=\"{html.escape(filename)}\">{html.escape(filename)}</a>"
+                       for filename in plot_result["files"])
+        st += "</p>\n"
+
+    st += "</body>\n</html>\n"
+
+    filepath = os.path.join(result["directory"], "index.html")
+    with open(filepath, 'w', encoding='utf-8') as file:
+        file.write(st)
+    return filepath
+
+
+def write_file_index(ibis_filepath, results, output_dir):
+    """
+    Writes the top level index.html page linking to the page of each model. Returns the file path of the page
+    """
+    title = os.path.basename(ibis_filepath)
+    st = "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+    st += f"<title>{html.escape(title)}</title>\n</head>\n<body>\n"
+    st += f"<h1>{html.escape(title)}</h1>\n"
+    st += "<table>\n<tr><th>Model</th><th>Component</th><th>Model type</th><th>Plots</th><th>Errors</th></tr>\n"
+    for result in results:
+        link = f"{os.path.basename(result['directory'])}/index.html"
+        st += f"<tr><td><a href=\"{html.escape(link)}\">{html.escape(result['model'])}</a></td>" \
+              f"<td>{html.escape(result['component'])}</td>" \
+              f"<td>{html.escape(str(result['model_type']))}</td>" \
+              f"<td>{len(result['plots'])}</td>" \
+              f"<td>{len(result['errors'])}</td></tr>\n"
+    st += "</table>\n</body>\n</html>\n"
+
+    filepath = os.path.join(output_dir, "index.html")
+    with open(filepath, 'w', encoding='utf-8') as file:
+        file.write(st)
+    return filepath
+
+
+def export_plots(ibis_filepath, output_dir, formats=("png",), processes=None, marker=None, model_names=None):
+    """
+    Renders the review plots of every model of the ibis file into a sub-directory per model, in parallel.
+
+        Parameters:
+            ibis_filepath - path of the ibis file
+            output_dir - directory for the plots and the index pages
+            formats - list of the image formats to save, "png" and/or "svg"
+            processes - number of worker processes (default is the number of cpus)
+            marker - optional matplotlib marker for the data points i.e. "."
+            model_names - optional list of the models to export (default all models)
+
+        Returns:
+            list of the render_model_plots result dictionaries, in the order of the models in the file
+    """
+    from pybis2spice import pybis2spice
+
+    for file_format in formats:
+        if file_format not in FORMATS:
+            raise ValueError(f"Unsupported plot format {file_format}. Expected one of {FORMATS}")
+
+    ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+    if model_names is None:
+        model_names = pybis2spice.list_models(ibis)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as executor:
+        futures = []
+        for model_name in model_names:
+            component_name = pybis2spice.find_component_for_model(ibis, model_name)
+            model_dir = os.path.join(output_dir, model_name.replace("/", "_"))
+            futures.append(executor.submit(render_model_plots, os.path.abspath(ibis_filepath), model_name,
+                                           component_name, model_dir, tuple(formats), marker))
+        results = [future.result() for future in futures]
+
+    for result in results:
+        write_model_index(result)
+    write_file_index(ibis_filepath, results, output_dir)
+
+    return results
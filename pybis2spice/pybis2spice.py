@@ -18,20 +18,113 @@
 # ---------------------------------------------------------------------------
 # Imports
 # ---------------------------------------------------------------------------
-import sys
+import copy
+import hashlib
 import ecdtools
 import numpy as np
+from pybis2spice import instrument
+
+_LSTSQ_RCOND = 1e-12  # Relative singular value below which a k-parameter sample is treated as singular
+_GRID_UNIFORM_WEIGHT = 0.1  # Fraction of the adaptive time grid points that are spread uniformly over the window
+_GRID_CURVATURE_WEIGHT = 0.45  # Fraction placed by the V-T waveform curvature
+_GRID_K_WEIGHT = 0.45  # Fraction placed by the k-parameter derivative
+_EDGE_START_TOLERANCE = 0.005  # Fraction of the k-parameter swing that marks the start of the switching window
+_EDGE_SETTLING_TOLERANCE = 0.005  # Fraction of the k-parameter swing that marks the end of the switching window
+_RAMP_POINTS = 6  # Number of k-parameter samples of an edge synthesised from the [Ramp] parameters
+_RAMP_R_LOAD = 50.0  # Default [Ramp] R_load in ohms
+_RAMP_FRACTION = 0.6  # The [Ramp] dV is measured between 20% and 80% of the swing
+_DC_POINTS = 4001  # Voltage samples searched for the dc operating point of the buffer
+_DC_MARGIN = 1.0  # Volts beyond the supply and fixture voltages searched for the dc operating point
+_FIT_CURRENT_FLOOR = 1e-6  # Amps, the IV fit error is absolute below this current
+_FIT_SUBDIVISIONS = 4  # The IV fit is checked, and its knots placed, on this many sub-intervals of each table step
+_FIT_MAX_SEGMENTS = 48  # Largest number of cubic segments of an IV fit
+_IV_CURRENT_LIMIT = 100.0  # Amps, IV table currents are clipped to this magnitude
+_IV_MAX_CONDUCTANCE = 1e3  # Siemens, steepest IV table slope (a 1 milliohm series resistance)
+_HASH_BLOCK_SIZE = 1 << 20  # Bytes read at a time by hash_file
+
+
+# ---------------------------------------------------------------------------
+# Exceptions
+# ---------------------------------------------------------------------------
+
+class Pybis2SpiceError(Exception):
+    """
+    Base class for the errors raised by the pybis2spice package
+    """
+
+
+class ModelLoadError(Pybis2SpiceError):
+    """
+    Raised when the DataModel of a model and component cannot be extracted from the ibis file
+    """
+
+
+class WaveformTypeError(Pybis2SpiceError, ValueError):
+    """
+    Raised when a waveform_type other than "Rising" or "Falling" is requested
+    """
 
 
 # ---------------------------------------------------------------------------
 # Create some data model classes for convenient data referencing
 # ---------------------------------------------------------------------------
 
+def freeze_array(arr):
+    """
+    returns a read-only copy of the numpy array (None is returned unchanged)
+    """
+    if arr is None:
+        return None
+    arr = np.array(arr)
+    arr.flags.writeable = False
+    return arr
+
+
+class _Immutable(object):
+    """
+    Blocks attribute assignment once the object has been built, so that the data containers can be shared
+    between threads without locking
+    """
+    _frozen = False
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f"{type(self).__name__} is immutable, use replace() to create a modified copy")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        if self._frozen:
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        object.__delattr__(self, name)
+
+    def _freeze(self):
+        object.__setattr__(self, "_frozen", True)
+
+    def replace(self, **changes):
+        """
+        returns a copy of the object with the given attributes replaced. Numpy arrays are stored as read-only copies
+        and lists as tuples. The original object is unchanged
+
+            Usage:
+                ibis_data_no_clamps = ibis_data.replace(iv_pwr_clamp=None, iv_gnd_clamp=None)
+        """
+        obj = copy.copy(self)
+        for name, value in changes.items():
+            if name.startswith("_") or not hasattr(self, name):
+                raise AttributeError(f"{type(self).__name__} has no attribute {name}")
+            if isinstance(value, np.ndarray):
+                value = freeze_array(value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            object.__setattr__(obj, name, value)
+        return obj
+
+
 
-class Waveform(object):
+class Waveform(_Immutable):
     """
     A data container for a single waveform with a given v_fixture and r_fixture condition
-    Used by the DataModel object
+    Used by the DataModel object. The object and its arrays are read-only once created
 
         Parameters:
             waveform_obj: the waveform object from the ecdtools library
@@ -43,10 +136,11 @@ class Waveform(object):
     """
 
     def __init__(self, waveform_obj):
-        self.data = np.asarray(waveform_obj.table.samples, dtype='float64')  # Time, Typ, Min, Max
-        self.v_fix = np.asarray([float(waveform_obj.v_fixture.typical), float(waveform_obj.v_fixture.minimum),
-                                 float(waveform_obj.v_fixture.maximum)])
+        self.data = freeze_array(np.asarray(waveform_obj.table.samples, dtype='float64'))  # Time, Typ, Min, Max
+        self.v_fix = freeze_array([float(waveform_obj.v_fixture.typical), float(waveform_obj.v_fixture.minimum),
+                                   float(waveform_obj.v_fixture.maximum)])
         self.r_fix = float(waveform_obj.r_fixture)
+        self._freeze()
 
     def __repr__(self):
         return f"> v_fixture:{self.v_fix}\n" \
@@ -54,12 +148,82 @@ class Waveform(object):
                f"> waveform_size: {np.shape(self.data)}"
 
 
-class DataModel(object):
+class RampWaveform(Waveform):
+    """
+    A synthetic V-T waveform of an edge built from the [Ramp] parameters (see solve_k_params_ramp)
+
+        Parameters:
+            data: numpy array [time, v_typ, v_min, v_max]
+            v_fix: the v_fixture (the ramp load termination) for the 3 corners [typ, min, max]
+            r_fix: the ramp load resistance
+    """
+
+    def __init__(self, data, v_fix, r_fix):
+        self.data = freeze_array(np.asarray(data, dtype='float64'))
+        self.v_fix = freeze_array(np.asarray(v_fix, dtype='float64'))
+        self.r_fix = float(r_fix)
+        self._freeze()
+
+
+class IVFit(_Immutable):
     """
-    A data container for the various data tables in the ibis model
+    A closed-form approximation of an IV table (see fit_iv_curve). The current is i_scale * sinh(y(v)), where y is a
+    piecewise cubic Hermite curve through the knots. Outside the knots the end currents are held, which matches the
+    SPICE table() function. The object and its arrays are read-only once created
+
+        Parameters:
+            voltage: numpy array of the knot voltages (increasing)
+            value: numpy array of y at the knots
+            slope: numpy array of dy/dv at the knots
+            i_scale: current scale in amps, the curve is linear in the current below it and exponential above it
+            max_error: the largest error of the fit relative to the table (see fit_iv_curve)
     """
 
-    def __init__(self, ibis_ecdtools, model_name, component_name):
+    def __init__(self, voltage, value, slope, i_scale, max_error):
+        self.voltage = freeze_array(np.asarray(voltage, dtype='float64'))
+        self.value = freeze_array(np.asarray(value, dtype='float64'))
+        self.slope = freeze_array(np.asarray(slope, dtype='float64'))
+        self.i_scale = float(i_scale)
+        self.max_error = float(max_error)
+        self._freeze()
+
+    def __repr__(self):
+        return f"> segments: {len(self.voltage) - 1}\n" \
+               f"> i_scale: {self.i_scale}\n" \
+               f"> max_error: {self.max_error}"
+
+    def coefficients(self):
+        """
+        returns the numpy array [segments, 4] of the polynomial coefficients [c0, c1, c2, c3] of each segment, with
+        y = c0 + c1*t + c2*t^2 + c3*t^3 and t the voltage above the start knot of the segment
+        """
+        h = np.diff(self.voltage)
+        delta = np.diff(self.value) / h
+        m0 = self.slope[:-1]
+        m1 = self.slope[1:]
+        return np.column_stack((self.value[:-1], m0, (3 * delta - 2 * m0 - m1) / h, (m0 + m1 - 2 * delta) / h ** 2))
+
+    def evaluate(self, voltage):
+        """
+        returns the fitted current at the voltages as a numpy array
+        """
+        v = np.clip(np.asarray(voltage, dtype='float64'), self.voltage[0], self.voltage[-1])
+        index = np.clip(np.searchsorted(self.voltage, v, side='right') - 1, 0, len(self.voltage) - 2)
+        c = self.coefficients()[index]
+        t = v - self.voltage[index]
+        return self.i_scale * np.sinh(c[..., 0] + t * (c[..., 1] + t * (c[..., 2] + t * c[..., 3])))
+
+
+class DataModel(_Immutable):
+    """
+    A data container for the various data tables in the ibis model.
+    The DataModel is immutable once built: the attributes cannot be reassigned and the numpy arrays are read-only,
+    so a single DataModel can be used by several conversions running in parallel threads.
+    Use replace() to create a modified copy. The file, model and component attributes are references to the
+    ecdtools objects and are shared with the parsed ibis file
+    """
+
+    def __init__(self, ibis_ecdtools, model_name, component_name, condition_tables=True):
         """
         Populate the attributes of the DataModel object
 
@@ -67,6 +231,8 @@ class DataModel(object):
                 ibis_ecdtools: the ecdtools object from the ecdtools.ibis.load_file() function.
                 model_name: model name as defined in ibis model
                 component_name: component name as defined in ibis model
+                condition_tables: if True, the IV tables are conditioned for the simulator (see condition_iv_table)
+                                  and each change is listed in the iv_warnings attribute
 
             All Data is stored in numpy arrays organised in columns as typical, min and max:
                 For parasitics, it is typ, min, max
@@ -74,44 +240,68 @@ class DataModel(object):
                 For VT tables, it is time, typ, min max
 
             If a table or parameter doesn't exist, then it will have a None value
+
+            Raises:
+                ModelLoadError: if the model or component cannot be found or its data cannot be extracted
         """
         self.model_name = model_name
         self.component_name = component_name
 
-        try:
-            # Load IBIS file. Transform=True converts numerical numbers from strings to decimal
-            ibis = ibis_ecdtools
-            # ecdtools.ibis.load_file(file_path, transform=True)
-
-            self.file = ibis
-            self.file_name = ibis.file_name
-            self.model = ibis.get_model_by_name(model_name)
-            self.component = ibis.get_component_by_name(component_name)
-            self.model_type = self.model.model_type
-
-            self.r_pkg = extract_range_param(self.component.package.r_pkg)
-            self.l_pkg = extract_range_param(self.component.package.l_pkg)
-            self.c_pkg = extract_range_param(self.component.package.c_pkg)
-            self.c_comp = extract_range_param(self.model.c_comp)
-            self.v_range = extract_range_param(self.model.voltage_range)
-            self.temp_range = extract_range_param(self.model.temperature_range)
-            self.pullup_ref = extract_range_param(self.model.pullup_reference)
-            self.pulldown_ref = extract_range_param(self.model.pulldown_reference)
-            self.pwr_clamp_ref = extract_range_param(self.model.power_clamp_reference)
-            self.gnd_clamp_ref = extract_range_param(self.model.gnd_clamp_reference)
-
-            self.iv_pullup = extract_iv_table(self.model.pullup)
-            self.iv_pulldown = extract_iv_table(self.model.pulldown)
-            self.iv_pwr_clamp = extract_iv_table(self.model.power_clamp)
-            self.iv_gnd_clamp = extract_iv_table(self.model.gnd_clamp)
-
-            self.ramp = self.model.ramp  # TODO - Create a function to extract the ramp parameters
-
-            self.vt_rising = [Waveform(data) for data in self.model.rising_waveforms]
-            self.vt_falling = [Waveform(data) for data in self.model.falling_waveforms]
-
-        except Exception as error:
-            print(error)
+        with instrument.stage("data_model", component=component_name, model=model_name) as record:
+            try:
+                # Load IBIS file. Transform=True converts numerical numbers from strings to decimal
+                ibis = ibis_ecdtools
+                # ecdtools.ibis.load_file(file_path, transform=True)
+
+                self.file = ibis
+                self.file_name = ibis.file_name
+                self.model = ibis.get_model_by_name(model_name)
+                self.component = ibis.get_component_by_name(component_name)
+                self.model_type = self.model.model_type
+
+                self.r_pkg = freeze_array(extract_range_param(self.component.package.r_pkg))
+                self.l_pkg = freeze_array(extract_range_param(self.component.package.l_pkg))
+                self.c_pkg = freeze_array(extract_range_param(self.component.package.c_pkg))
+                self.c_comp = freeze_array(extract_range_param(self.model.c_comp))
+                self.v_range = freeze_array(extract_range_param(self.model.voltage_range))
+                self.temp_range = freeze_array(extract_range_param(self.model.temperature_range))
+                self.pullup_ref = freeze_array(extract_range_param(self.model.pullup_reference))
+                self.pulldown_ref = freeze_array(extract_range_param(self.model.pulldown_reference))
+                self.pwr_clamp_ref = freeze_array(extract_range_param(self.model.power_clamp_reference))
+                self.gnd_clamp_ref = freeze_array(extract_range_param(self.model.gnd_clamp_reference))
+
+                self.iv_pullup = freeze_array(extract_iv_table(self.model.pullup))
+                self.iv_pulldown = freeze_array(extract_iv_table(self.model.pulldown))
+                self.iv_pwr_clamp = freeze_array(extract_iv_table(self.model.power_clamp))
+                self.iv_gnd_clamp = freeze_array(extract_iv_table(self.model.gnd_clamp))
+
+                iv_warnings = []
+                if condition_tables:
+                    for name in ["iv_pullup", "iv_pulldown", "iv_pwr_clamp", "iv_gnd_clamp"]:
+                        (iv_table, messages) = condition_iv_table(getattr(self, name), name)
+                        setattr(self, name, freeze_array(iv_table))
+                        iv_warnings += messages
+                self.iv_warnings = tuple(iv_warnings)
+
+                self.ramp = self.model.ramp  # The raw ramp parameters, see extract_ramp_param
+
+                self.vt_rising = tuple(Waveform(data) for data in self.model.rising_waveforms)
+                self.vt_falling = tuple(Waveform(data) for data in self.model.falling_waveforms)
+
+                record.add_size("iv_pullup", self.iv_pullup)
+                record.add_size("iv_pulldown", self.iv_pulldown)
+                record.add_size("iv_pwr_clamp", self.iv_pwr_clamp)
+                record.add_size("iv_gnd_clamp", self.iv_gnd_clamp)
+                for n, waveform in enumerate(self.vt_rising):
+                    record.add_size(f"vt_rising_{n}", waveform.data)
+                for n, waveform in enumerate(self.vt_falling):
+                    record.add_size(f"vt_falling_{n}", waveform.data)
+
+            except Exception as error:
+                raise ModelLoadError(f"Unable to load model {model_name} of component {component_name}: "
+                                     f"{error}") from error
+
+        self._freeze()
 
     def __repr__(self):
         st = f'----------------------------------------------------------------------\n\n'
@@ -198,11 +388,105 @@ def extract_iv_table(iv_data):
     return arr
 
 
+def condition_iv_table(iv_table, table_name="iv", current_limit=_IV_CURRENT_LIMIT,
+                       max_conductance=_IV_MAX_CONDUCTANCE):
+    """
+    Conditions an IV table for the SPICE simulator, which cuts the timestep or fails to converge on NA entries,
+    duplicate voltages, extreme currents and near vertical slopes. In order:
+        - rows without a voltage are removed
+        - NA currents are interpolated from the other currents of the same corner. Beyond the first and last
+          currents of a min or max corner the typical current is followed from them, and a corner without any
+          current is filled from the typical current. A table without any typical current is removed
+        - the currents of duplicate voltages are averaged
+        - the currents are clipped to +/- current_limit
+        - the slope between the points is limited to max_conductance. The point with the smallest current is kept
+          and the limited steps are accumulated outwards from it, so the normal operating region is unchanged
+
+        Parameters:
+            iv_table: numpy array [voltage, I_typ, I_min, I_max] sorted by voltage, or None
+            table_name: name of the table used in the messages
+            current_limit: largest current magnitude in amps
+            max_conductance: largest slope magnitude in siemens
+
+        Returns:
+            tuple of (iv_conditioned, messages) - the conditioned table (None if it is removed) and a list of strings
+            describing each change
+    """
+    messages = []
+    if iv_table is None:
+        return None, messages
+
+    with instrument.stage("condition", table=table_name) as record:
+        iv_table = np.array(iv_table, dtype='float64')
+        record.add_size("iv_table", iv_table)
+
+        no_voltage = np.isnan(iv_table[:, 0])
+        if np.any(no_voltage):
+            iv_table = iv_table[~no_voltage]
+            messages.append(f"{table_name}: {np.count_nonzero(no_voltage)} rows without a voltage removed")
+
+        voltage = iv_table[:, 0]
+        typ_na = np.isnan(iv_table[:, 1])
+        if np.all(typ_na):
+            messages.append(f"{table_name}: no typical currents, the table is removed")
+            return None, messages
+        if np.any(typ_na):
+            iv_table[typ_na, 1] = np.interp(voltage[typ_na], voltage[~typ_na], iv_table[~typ_na, 1])
+            messages.append(f"{table_name}: {np.count_nonzero(typ_na)} NA typical currents interpolated")
+        for column, corner_name in [(2, "min"), (3, "max")]:
+            na = np.isnan(iv_table[:, column])
+            if np.all(na):
+                iv_table[:, column] = iv_table[:, 1]
+                messages.append(f"{table_name}: {np.count_nonzero(na)} NA {corner_name} currents filled from typical")
+            elif np.any(na):
+                (first, last) = np.flatnonzero(~na)[[0, -1]]
+                filled = np.interp(voltage[na], voltage[~na], iv_table[~na, column])
+                # Beyond its own points the corner follows the shape of the typical current
+                below = voltage[na] < voltage[first]
+                above = voltage[na] > voltage[last]
+                filled[below] = iv_table[na, 1][below] + iv_table[first, column] - iv_table[first, 1]
+                filled[above] = iv_table[na, 1][above] + iv_table[last, column] - iv_table[last, 1]
+                iv_table[na, column] = filled
+                messages.append(f"{table_name}: {np.count_nonzero(na)} NA {corner_name} currents interpolated")
+
+        (voltage, index, counts) = np.unique(iv_table[:, 0], return_inverse=True, return_counts=True)
+        if len(voltage) < len(iv_table):
+            currents = np.zeros([len(voltage), 3])
+            np.add.at(currents, index, iv_table[:, 1:])
+            iv_table = np.column_stack((voltage, currents / counts[:, np.newaxis]))
+            messages.append(f"{table_name}: {np.count_nonzero(counts > 1)} duplicate voltages averaged")
+
+        extreme = np.absolute(iv_table[:, 1:]) > current_limit
+        if np.any(extreme):
+            messages.append(f"{table_name}: {np.count_nonzero(extreme)} currents up to "
+                            f"{np.max(np.absolute(iv_table[:, 1:])):.3g} A clipped to {current_limit:.3g} A")
+            iv_table[:, 1:] = np.clip(iv_table[:, 1:], -current_limit, current_limit)
+
+        if len(iv_table) > 1:
+            currents = iv_table[:, 1:]
+            max_step = max_conductance * np.diff(iv_table[:, 0])[:, np.newaxis]
+            steps = np.diff(currents, axis=0)
+            steep = np.absolute(steps) > max_step
+            if np.any(steep):
+                cumulative = np.vstack((np.zeros([1, 3]), np.cumsum(np.clip(steps, -max_step, max_step), axis=0)))
+                anchor = np.argmin(np.absolute(currents), axis=0)
+                columns = np.arange(3)
+                iv_table[:, 1:] = currents[anchor, columns] + cumulative - cumulative[anchor, columns]
+                messages.append(f"{table_name}: {np.count_nonzero(steep)} slopes limited to {max_conductance:.3g} S")
+
+        record.add_size("iv_conditioned", iv_table)
+
+    return iv_table, messages
+
+
 def get_ibis_model_ecdtools(ibis_filename):
     """
     returns the ibis object from the ecdtools library
     """
-    ibis = ecdtools.ibis.load_file(ibis_filename, transform=True)
+    with instrument.stage("parse", file=str(ibis_filename)) as record:
+        ibis = ecdtools.ibis.load_file(ibis_filename, transform=True)
+        record.add_size("components", len(ibis.component_names))
+        record.add_size("models", len(ibis.model_names))
     return ibis
 
 
@@ -220,6 +504,28 @@ def list_models(ibis_data_model):
     return ibis_data_model.model_names
 
 
+def hash_file(filepath):
+    """
+    returns the sha256 hex digest of the file contents
+    """
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(_HASH_BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def find_component_for_model(ibis, model_name):
+    """
+    returns the name of the first component with a pin that uses the model. Defaults to the first component
+    """
+    for component in ibis.components:
+        for pin in component.pins:
+            if pin.model_name == model_name:
+                return component.name
+    return ibis.component_names[0]
+
+
 def adjust_device_data(iv_device, iv_clamp):
     """
     The pullup and pulldown data in the IBIS model is captured with clamps still present.
@@ -316,6 +622,29 @@ def get_reference(ref, v_range, corner):
     return value
 
 
+def get_device_currents(ibis_data, voltage, corner):
+    """
+    returns the device and clamp currents (i_pu, i_pd, i_pc, i_gc) at each voltage of the voltage array
+    (see generating_current_data)
+    """
+    pullup_ref = get_reference(ibis_data.pullup_ref, ibis_data.v_range, corner)
+    pulldown_ref = get_reference(ibis_data.pulldown_ref, 0, corner)
+    pwr_clamp_ref = get_reference(ibis_data.pwr_clamp_ref, ibis_data.v_range, corner)
+    gnd_clamp_ref = get_reference(ibis_data.gnd_clamp_ref, 0, corner)
+
+    # Pullup and pulldown device current
+    i_pu = get_current_data_from_iv_data(voltage, ibis_data.iv_pullup, pullup_ref, corner,
+                                         iv_data_adjust=ibis_data.iv_pwr_clamp)
+    i_pd = get_current_data_from_iv_data(voltage, ibis_data.iv_pulldown, pulldown_ref, corner,
+                                         iv_data_adjust=ibis_data.iv_gnd_clamp)
+
+    # Power and ground clamp current
+    i_pc = get_current_data_from_iv_data(voltage, ibis_data.iv_pwr_clamp, pwr_clamp_ref, corner, iv_data_adjust=None)
+    i_gc = get_current_data_from_iv_data(voltage, ibis_data.iv_gnd_clamp, gnd_clamp_ref, corner, iv_data_adjust=None)
+
+    return i_pu, i_pd, i_pc, i_gc
+
+
 def generating_current_data(ibis_data, time, corner, waveform_obj):
     """
     Generates the current waveforms for the devices and clamps with respect to the given time array
@@ -343,20 +672,7 @@ def generating_current_data(ibis_data, time, corner, waveform_obj):
     # Get the voltage waveform corresponding to the given time array
     vt = np.interp(time, waveform_obj.data[:, _TIME], waveform_obj.data[:, corner])
 
-    pullup_ref = get_reference(ibis_data.pullup_ref, ibis_data.v_range, corner)
-    pulldown_ref = get_reference(ibis_data.pulldown_ref, 0, corner)
-    pwr_clamp_ref = get_reference(ibis_data.pwr_clamp_ref, ibis_data.v_range, corner)
-    gnd_clamp_ref = get_reference(ibis_data.gnd_clamp_ref, 0, corner)
-
-    # Pullup and pulldown device current
-    i_pu = get_current_data_from_iv_data(vt, ibis_data.iv_pullup, pullup_ref, corner,
-                                         iv_data_adjust=ibis_data.iv_pwr_clamp)
-    i_pd = get_current_data_from_iv_data(vt, ibis_data.iv_pulldown, pulldown_ref, corner,
-                                         iv_data_adjust=ibis_data.iv_gnd_clamp)
-
-    # Power and ground clamp current
-    i_pc = get_current_data_from_iv_data(vt, ibis_data.iv_pwr_clamp, pwr_clamp_ref, corner, iv_data_adjust=None)
-    i_gc = get_current_data_from_iv_data(vt, ibis_data.iv_gnd_clamp, gnd_clamp_ref, corner, iv_data_adjust=None)
+    (i_pu, i_pd, i_pc, i_gc) = get_device_currents(ibis_data, vt, corner)
 
     # Current through r_fixture
     i_rfix = (waveform_obj.v_fix[corner - 1] - vt) / waveform_obj.r_fix
@@ -367,59 +683,210 @@ def generating_current_data(ibis_data, time, corner, waveform_obj):
     return i_pu, i_pd, i_pc, i_gc, i_rfix, i_c_comp
 
 
-def solve_k_params_output(ibis_data, corner=1, waveform_type="Rising"):
+def _normalised_density(density, time):
     """
-    Solves the k-parameters for the ibis model for any 2 or 3-state output buffer
+    returns the density scaled to integrate to 1 over the time array (zeros if the density is zero everywhere)
+    """
+    integral = np.sum(0.5 * (density[1:] + density[:-1]) * np.diff(time))
+    if integral <= 0:
+        return np.zeros_like(density)
+    return density / integral
+
+
+def build_adaptive_time_grid(time, voltages, k_values=None, max_points=200):
+    """
+    Builds a time grid of max_points samples that is dense where the V-T waveforms bend or the k-parameters change
+    quickly and sparse where they are settled. The points are placed so that each grid interval holds an equal
+    share of a density made up of a uniform part, the curvature of the V-T waveforms (normalised by their swing)
+    and the absolute derivative of the k-parameters
+
+        Parameters:
+            time: numpy array of the sorted candidate time samples (the union of the waveform time samples)
+            voltages: list of numpy arrays of the V-T waveforms sampled at the time array
+            k_values: optional numpy array [time, k] of the k-parameters solved on the time array
+            max_points: the number of samples of the grid
+
+        Returns:
+            numpy array of the grid time samples, starting and ending at the ends of the time array
+    """
+    time = np.asarray(time, dtype='float64')
+    if max_points < 2:
+        raise ValueError(f"max_points must be at least 2, got {max_points}")
+    if np.shape(time)[0] < 3:
+        return time
+
+    curvature = np.zeros_like(time)
+    for voltage in voltages:
+        swing = np.max(voltage) - np.min(voltage)
+        if swing > 0:
+            slope = np.diff(voltage / swing) / np.diff(time)
+            curvature[1:-1] += np.absolute(np.diff(slope)) / (0.5 * (time[2:] - time[:-2]))
+
+    weights = [_GRID_UNIFORM_WEIGHT, _GRID_CURVATURE_WEIGHT, _GRID_K_WEIGHT]
+    densities = [np.ones_like(time), curvature, np.zeros_like(time)]
+    if k_values is not None:
+        k_derivative = np.absolute(np.diff(k_values, axis=0)) / np.diff(time)[:, np.newaxis]
+        densities[2][:-1] += np.sum(k_derivative, axis=1)
+        densities[2][1:] += np.sum(k_derivative, axis=1)
+
+    # Redistribute the weight of any part that is zero everywhere (e.g. no k_values) to the other parts
+    densities = [_normalised_density(density, time) for density in densities]
+    weights = [weight if np.any(density) else 0.0 for weight, density in zip(weights, densities)]
+    density = sum(weight * density for weight, density in zip(weights, densities)) / sum(weights)
+
+    # Equidistribute the points with respect to the cumulative density
+    cumulative = np.concatenate(([0.0], np.cumsum(0.5 * (density[1:] + density[:-1]) * np.diff(time))))
+    grid = np.interp(np.linspace(0, cumulative[-1], max_points), cumulative, time)
+    grid[0], grid[-1] = time[0], time[-1]
+    return np.unique(grid)
+
+
+def solve_least_squares(a, b, regularization=0.0):
+    """
+    Solves a batch of linear systems a[n] x[n] = b[n] in the least squares sense in one vectorised pass.
+    Each equation is weighted by the inverse of its row norm, so a fixture with large currents does not dominate
+    the solution and the condition number of each sample is not inflated by the scale difference between the
+    equations. Singular values below _LSTSQ_RCOND times the largest are discarded, so a singular sample returns
+    the minimum norm solution instead of failing.
+
+        Parameters:
+            a: numpy array [samples, equations, unknowns]
+            b: numpy array [samples, equations]
+            regularization: Tikhonov regularization factor relative to the largest singular value of each sample.
+                            0 gives the plain least squares solution
+
+        Returns:
+            tuple of values (x, residuals, condition)
+                x - numpy array [samples, unknowns]
+                residuals - numpy array [samples, equations] of b - a x in the units of b
+                condition - numpy array [samples] of the condition number of each weighted sample (inf if singular)
+    """
+    row_norm = np.linalg.norm(a, axis=2)
+    weight = np.divide(1.0, row_norm, out=np.zeros_like(row_norm), where=row_norm > 0)
+    u, s, vt = np.linalg.svd(a * weight[:, :, np.newaxis], full_matrices=False)
+
+    s_max = s[:, :1]
+    keep = s > _LSTSQ_RCOND * s_max
+    s_inv = np.divide(s, s ** 2 + (regularization * s_max) ** 2, out=np.zeros_like(s), where=keep)
+    u_b = np.einsum('nej,ne->nj', u, b * weight)
+    x = np.einsum('nji,nj->ni', vt, s_inv * u_b)
+
+    residuals = b - np.einsum('nei,ni->ne', a, x)
+    condition = np.divide(s[:, 0], s[:, -1], out=np.full(np.shape(s)[0], np.inf), where=keep[:, -1])
+
+    return x, residuals, condition
+
+
+def _solve_k_equations(ibis_data, corner, waveforms, time, regularization):
+    """
+    Solves the k_u and k_d equations of the waveforms at each sample of the time array (see solve_least_squares)
+    """
+    # Each waveform gives one equation per time sample: k_u * i_pu + k_d * i_pd = i_gc + i_pc + i_rfix - i_c_comp
+    a = np.zeros([np.shape(time)[0], len(waveforms), 2])
+    b = np.zeros([np.shape(time)[0], len(waveforms)])
+    for n, waveform in enumerate(waveforms):
+        (i_pu, i_pd, i_pc, i_gc, i_rfix, i_c_comp) = generating_current_data(ibis_data, time, corner, waveform)
+        a[:, n, 0] = i_pu
+        a[:, n, 1] = i_pd
+        b[:, n] = i_gc + i_pc + i_rfix - i_c_comp
+
+    return solve_least_squares(a, b, regularization=regularization)
+
+
+def solve_k_params_least_squares(ibis_data, corner=1, waveform_type="Rising", regularization=0.0,
+                                 max_points=None):
+    """
+    Solves the k-parameters for the ibis model for any 2 or 3-state output buffer using every V-T waveform of the
+    edge. The waveforms are combined onto a common time grid and the equation of each waveform is solved for k_u
+    and k_d at every time sample in the least squares sense (see solve_least_squares)
 
         Parameters:
             ibis_data: a DataModel object
             corner: value of either 1, 2 or 3 to signify the typical , slow-weak (min) and fast-strong (max) corners
             waveform_type: Either "Rising" or "Falling" to select the waveform to solve the k-parameters for
+            regularization: Tikhonov regularization factor (default 0, no regularization)
+            max_points: if given, the k-parameters are solved on an adaptive time grid of this many samples
+                        (see build_adaptive_time_grid) instead of the union of the waveform time samples
 
         Returns:
-            k_param: numpy array with 3 columns [time, k_u, k_d]
+            tuple of values (k_param, residuals, condition)
+                k_param - numpy array with 3 columns [time, k_u, k_d]
+                residuals - numpy array with a column of the current residual in amps for each waveform
+                condition - numpy array of the condition number of each time sample
+
+        Raises:
+            WaveformTypeError: if waveform_type is not "Rising" or "Falling"
+            ValueError: if the model has less than 2 waveforms for the edge
     """
-    # Input 
     if waveform_type == "Rising":
-        waveform1 = ibis_data.vt_rising[0]
-        waveform2 = ibis_data.vt_rising[1]
+        waveforms = ibis_data.vt_rising
     elif waveform_type == "Falling":
-        waveform1 = ibis_data.vt_falling[0]
-        waveform2 = ibis_data.vt_falling[1]
+        waveforms = ibis_data.vt_falling
     else:
-        sys.exit(f"Error in waveform_type parameter. Expected 'Rising' or 'Falling', got {waveform_type}")
+        raise WaveformTypeError(f"Error in waveform_type parameter. Expected 'Rising' or 'Falling', "
+                                f"got {waveform_type}")
+    if len(waveforms) < 2:
+        raise ValueError(f"At least 2 {waveform_type} waveforms are required to solve k_u and k_d, "
+                         f"got {len(waveforms)}")
 
-    # Combine the time samples to obtain a single time-series for both waveforms 1 and 2
-    time = np.concatenate((waveform1.data[:, 0], waveform2.data[:, 0]))
+    with instrument.stage("solve_k_params", model=ibis_data.model_name, corner=corner,
+                          waveform_type=waveform_type) as record:
+        # Combine the time samples to obtain a single sorted time-series without duplicates for all the waveforms
+        time = np.unique(np.concatenate([waveform.data[:, 0] for waveform in waveforms]))
+        x, residuals, condition = _solve_k_equations(ibis_data, corner, waveforms, time, regularization)
 
-    # Sort the time samples to be monotonic and remove any duplicate time samples
-    time = np.sort(time)
-    time = np.unique(time)
-    array_size = np.shape(time)[0]
+        if max_points is not None:
+            voltages = [np.interp(time, waveform.data[:, 0], waveform.data[:, corner]) for waveform in waveforms]
+            time = build_adaptive_time_grid(time, voltages, k_values=x, max_points=max_points)
+            x, residuals, condition = _solve_k_equations(ibis_data, corner, waveforms, time, regularization)
 
-    # Getting the device and clamp current waveforms based on the new time series
-    (i_pu1, i_pd1, i_pc1, i_gc1, i_rfix1, i_c_comp1) = generating_current_data(ibis_data, time, corner, waveform1)
-    (i_pu2, i_pd2, i_pc2, i_gc2, i_rfix2, i_c_comp2) = generating_current_data(ibis_data, time, corner, waveform2)
+        # creating a k-parameters array with columns [time, k_u, k_d]
+        k_param = np.column_stack((time, x))
 
-    # creating a k-parameters array with columns [time, k_u, k_d]
-    k_param = np.zeros([array_size, 3])
-    k_param[:, 0] = time
+        record.add_size("k_param", k_param)
 
-    # Rearrange equation and solve for k_u and kd parameters
-    i1 = i_gc1 + i_pc1 + i_rfix1 - i_c_comp1
-    i2 = i_gc2 + i_pc2 + i_rfix2 - i_c_comp2
+    return k_param, residuals, condition
+
+
+def solve_k_params_output(ibis_data, corner=1, waveform_type="Rising", regularization=0.0, max_points=None):
+    """
+    Solves the k-parameters for the ibis model for any 2 or 3-state output buffer from all the V-T waveforms of
+    the edge (see solve_k_params_least_squares)
 
-    for n in range(0, array_size):
-        a = np.array([[i_pu1[n], i_pd1[n]], [i_pu2[n], i_pd2[n]]])
-        b = np.array([i1[n], i2[n]])
-        x = np.linalg.solve(a, b)
-        k_param[:, 1][n] = x[0]  # k_u
-        k_param[:, 2][n] = x[1]  # k_d
+        Parameters:
+            ibis_data: a DataModel object
+            corner: value of either 1, 2 or 3 to signify the typical , slow-weak (min) and fast-strong (max) corners
+            waveform_type: Either "Rising" or "Falling" to select the waveform to solve the k-parameters for
+            regularization: Tikhonov regularization factor (default 0, no regularization)
+            max_points: if given, the size of the adaptive time grid (see build_adaptive_time_grid)
+
+        Returns:
+            k_param: numpy array with 3 columns [time, k_u, k_d]
 
+        Raises:
+            WaveformTypeError: if waveform_type is not "Rising" or "Falling"
+            ValueError: if the model has less than 2 waveforms for the edge
+    """
+    k_param, residuals, condition = solve_k_params_least_squares(ibis_data, corner=corner,
+                                                                 waveform_type=waveform_type,
+                                                                 regularization=regularization,
+                                                                 max_points=max_points)
     return k_param
 
 
-def solve_k_params_output_open_drain(ibis_data, corner=1, waveform_type="Rising"):
+def _solve_k_equation_open_drain(ibis_data, corner, waveform, time):
+    """
+    Solves the k_d equation of the open drain waveform at each sample of the time array
+    """
+    # Getting the device and clamp current waveforms based on the time series
+    (i_pu1, i_pd1, i_pc1, i_gc1, i_rfix1, i_c_comp1) = generating_current_data(ibis_data, time, corner, waveform)
+
+    # Rearrange equation and solve for the kd parameter
+    i1 = i_gc1 + i_pc1 + i_rfix1 - i_c_comp1
+    return np.divide(i1, i_pd1)
+
+
+def solve_k_params_output_open_drain(ibis_data, corner=1, waveform_type="Rising", max_points=None):
     """
     Solves the k-parameters for the ibis model for any 2 or 3-state output buffer
 
@@ -427,9 +894,13 @@ def solve_k_params_output_open_drain(ibis_data, corner=1, waveform_type="Rising"
             ibis_data: a DataModel object
             corner: value of either 1, 2 or 3 to signify the typical , slow-weak (min) and fast-strong (max) corners
             waveform_type: Either "Rising" or "Falling" to select the waveform to solve the k-parameters for
+            max_points: if given, the size of the adaptive time grid (see build_adaptive_time_grid)
 
         Returns:
             k_param: numpy array with 2 columns [time, k_d]
+
+        Raises:
+            WaveformTypeError: if waveform_type is not "Rising" or "Falling"
     """
     # Input
     if waveform_type == "Rising":
@@ -437,22 +908,142 @@ def solve_k_params_output_open_drain(ibis_data, corner=1, waveform_type="Rising"
     elif waveform_type == "Falling":
         waveform1 = ibis_data.vt_falling[0]
     else:
-        sys.exit(f"Error in waveform_type parameter. Expected 'Rising' or 'Falling', got {waveform_type}")
+        raise WaveformTypeError(f"Error in waveform_type parameter. Expected 'Rising' or 'Falling', "
+                                f"got {waveform_type}")
 
-    # Get only unique samples for time array
-    time = np.unique(waveform1.data[:, 0])
-    array_size = np.shape(time)[0]
+    with instrument.stage("solve_k_params", model=ibis_data.model_name, corner=corner,
+                          waveform_type=waveform_type) as record:
+        # Get only unique samples for time array
+        time = np.unique(waveform1.data[:, 0])
+        k_d = _solve_k_equation_open_drain(ibis_data, corner, waveform1, time)
 
-    # Getting the device and clamp current waveforms based on the new time series
-    (i_pu1, i_pd1, i_pc1, i_gc1, i_rfix1, i_c_comp1) = generating_current_data(ibis_data, time, corner, waveform1)
+        if max_points is not None:
+            voltage = np.interp(time, waveform1.data[:, 0], waveform1.data[:, corner])
+            time = build_adaptive_time_grid(time, [voltage], k_values=k_d[:, np.newaxis], max_points=max_points)
+            k_d = _solve_k_equation_open_drain(ibis_data, corner, waveform1, time)
 
-    # creating a k-parameters array with columns [time, k_d]
-    k_param = np.zeros([array_size, 2])
-    k_param[:, 0] = time
+        # creating a k-parameters array with columns [time, k_d]
+        k_param = np.column_stack((time, k_d))
 
-    # Rearrange equation and solve for k_u and kd parameters
-    i1 = i_gc1 + i_pc1 + i_rfix1 - i_c_comp1
-    k_param[:, 1] = np.divide(i1, i_pd1)
+        record.add_size("k_param", k_param)
+
+    return k_param
+
+
+def extract_ramp_param(ramp, waveform_type):
+    """
+    Extracts the [Ramp] rate of an edge
+
+        Parameters:
+            ramp: the ramp object of the model (the DataModel ramp attribute)
+            waveform_type: Either "Rising" or "Falling"
+
+        Returns:
+            numpy array with 2 columns [dv, dt] and a row for each corner [typ, min, max], or None if the ramp does not
+            define the edge. A missing min or max corner uses the typical value
+    """
+    if ramp is None:
+        return None
+    if waveform_type == "Rising":
+        dv_dt = ramp.dv_dt_r
+    elif waveform_type == "Falling":
+        dv_dt = ramp.dv_dt_f
+    else:
+        raise WaveformTypeError(f"Error in waveform_type parameter. Expected 'Rising' or 'Falling', "
+                                f"got {waveform_type}")
+    if dv_dt is None or dv_dt[0] is None:
+        return None
+
+    rates = [dv_dt[0] if pair is None or None in pair else pair for pair in dv_dt]
+    return np.asarray([[float(dv), float(dt)] for dv, dt in rates], dtype='float64')
+
+
+def solve_dc_voltage(ibis_data, corner, k_u, k_d, v_fix, r_load):
+    """
+    Solves the dc output voltage of the buffer with the k-parameters k_u and k_d driving a load resistor r_load
+    terminated to v_fix. The device and clamp tables are sampled over the supply and fixture voltages and the
+    crossing of the current balance is linearly interpolated. Only crossings where the balance increases with the
+    voltage (as the load current does) are stable, the others come from the table ends being held constant
+
+        Returns:
+            the output voltage
+    """
+    vcc = get_reference(ibis_data.pullup_ref, ibis_data.v_range, corner)
+    voltage = np.linspace(min(0.0, v_fix) - _DC_MARGIN, max(vcc, v_fix) + _DC_MARGIN, _DC_POINTS)
+    (i_pu, i_pd, i_pc, i_gc) = get_device_currents(ibis_data, voltage, corner)
+    balance = k_u * i_pu + k_d * i_pd - i_gc - i_pc - (v_fix - voltage) / r_load
+
+    crossing = np.nonzero((balance[:-1] < 0) & (balance[1:] >= 0))[0]
+    if np.shape(crossing)[0] == 0:
+        return float(voltage[np.argmin(np.absolute(balance))])
+    n = crossing[0]
+    return float(voltage[n] - balance[n] * (voltage[n + 1] - voltage[n]) / (balance[n + 1] - balance[n]))
+
+
+def solve_k_params_ramp(ibis_data, corner=1, waveform_type="Rising", points=_RAMP_POINTS):
+    """
+    Synthesises the k-parameters of an edge from the [Ramp] parameters for models without V-T waveforms.
+    The edge is a linear ramp of the output voltage between the dc levels of the buffer driving the ramp R_load, at
+    the ramp dV/dt rate. The load is terminated to ground for a rising edge and to the supply for a falling edge
+    (always to the supply for open drain models). The ramp only gives one equation per sample, so the pullup and
+    pulldown are assumed to switch together with k_u = 1 - k_d
+
+        Parameters:
+            ibis_data: a DataModel object
+            corner: value of either 1, 2 or 3 to signify the typical , slow-weak (min) and fast-strong (max) corners
+            waveform_type: Either "Rising" or "Falling" to select the edge
+            points: number of samples of the edge
+
+        Returns:
+            k_param: numpy array with 3 columns [time, k_u, k_d], or 2 columns [time, k_d] for open drain models
+
+        Raises:
+            WaveformTypeError: if waveform_type is not "Rising" or "Falling"
+            ValueError: if the model has no ramp for the edge, or its I-V tables do not switch the load
+    """
+    rates = extract_ramp_param(ibis_data.ramp, waveform_type)
+    if rates is None:
+        raise ValueError(f"Model {ibis_data.model_name} has no {waveform_type} [Ramp] or V-T waveforms")
+    (dv, dt) = rates[corner - 1]
+    r_load = _RAMP_R_LOAD if ibis_data.ramp.r_load is None else float(ibis_data.ramp.r_load)
+    open_drain = ibis_data.model_type.lower() == "open_drain"
+
+    with instrument.stage("solve_k_params", model=ibis_data.model_name, corner=corner,
+                          waveform_type=waveform_type, source="ramp") as record:
+        vcc = get_reference(ibis_data.pullup_ref, ibis_data.v_range, corner)
+        v_fix = vcc if (open_drain or waveform_type == "Falling") else 0.0
+
+        # The k-parameters before and after the edge: a rising edge switches from the pulldown to the pullup
+        (k_start, k_end) = ((0.0, 1.0), (1.0, 0.0)) if waveform_type == "Rising" else ((1.0, 0.0), (0.0, 1.0))
+        if open_drain:
+            k_start, k_end = (0.0, k_start[1]), (0.0, k_end[1])
+        v_start = solve_dc_voltage(ibis_data, corner, k_start[0], k_start[1], v_fix, r_load)
+        v_end = solve_dc_voltage(ibis_data, corner, k_end[0], k_end[1], v_fix, r_load)
+        if np.isclose(v_start, v_end):
+            raise ValueError(f"Model {ibis_data.model_name} does not drive a {waveform_type} edge into the ramp load")
+
+        # Linear ramp of the full swing at the ramp rate. dv is the 20% to 80% swing of the ramp measurement
+        duration = abs(v_end - v_start) * dt / dv if dv > 0 else dt / _RAMP_FRACTION
+        time = np.linspace(0.0, duration, points)
+        data = np.column_stack([time] + [np.linspace(v_start, v_end, points)] * 3)
+        waveform = RampWaveform(data, [v_fix] * 3, r_load)
+
+        (i_pu, i_pd, i_pc, i_gc, i_rfix, i_c_comp) = generating_current_data(ibis_data, time, corner, waveform)
+        i1 = i_gc + i_pc + i_rfix - i_c_comp
+        if open_drain:
+            k_d = np.divide(i1, i_pd, out=np.zeros_like(i1), where=i_pd != 0)
+        else:
+            # k_u * i_pu + (1 - k_u) * i_pd = i1
+            k_d = 1 - np.divide(i1 - i_pd, i_pu - i_pd, out=np.zeros_like(i1), where=i_pu != i_pd)
+        k_d = np.clip(k_d, 0.0, 1.0)
+        k_d[0], k_d[-1] = k_start[1], k_end[1]
+
+        if open_drain:
+            k_param = np.column_stack((time, k_d))
+        else:
+            k_param = np.column_stack((time, 1 - k_d, k_d))
+
+        record.add_size("k_param", k_param)
 
     return k_param
 
@@ -476,7 +1067,7 @@ def differentiate(y, x):
     return dy_dx
 
 
-def compress_param(k_param, threshold=1e-6):
+def compress_param(k_param, threshold=1e-6, **labels):
     """
     Compresses the k_parameter waveform by removing redundant samples
     Remove any samples that do not change in value between subsequent samples by more than the given threshold
@@ -484,34 +1075,173 @@ def compress_param(k_param, threshold=1e-6):
         Parameters:
             k_param: numpy array - 2 or 3 columns: [time, Ku, Kd] or [time, K]
             threshold: threshold value to decide if sample is redundant
+            labels: extra information recorded with the "compress" stage, i.e. corner and waveform_type
 
         Returns:
             k_comp: The compressed waveform
     """
-    k_comp = None
-    num_rows = np.shape(k_param)[0]
-    num_columns = np.shape(k_param)[1]
+    with instrument.stage("compress", **labels) as record:
+        k_comp = None
+        num_rows = np.shape(k_param)[0]
+        num_columns = np.shape(k_param)[1]
+
+        # Differentiate the ku and kd waveforms with respect to time
+        diff_k = np.zeros([num_rows, num_columns])
+        diff_k[:, 0] = k_param[:, 0]  # column 0 is the time
 
-    # Differentiate the ku and kd waveforms with respect to time
-    diff_k = np.zeros([num_rows, num_columns])
-    diff_k[:, 0] = k_param[:, 0]  # column 0 is the time
+        for i in range(1, num_columns):
+            diff_k[:, i] = np.absolute(np.diff(np.append(k_param[:, i], k_param[:, i][-1])))
 
-    for i in range(1, num_columns):
-        diff_k[:, i] = np.absolute(np.diff(np.append(k_param[:, i], k_param[:, i][-1])))
+        if num_columns == 3:  # There are two k parameters, Ku and Kd
+            # Extract samples that have very small differences between time samples
+            c1 = (diff_k[:, 1] <= threshold)
+            c2 = (diff_k[:, 2] <= threshold)
+            condition = np.logical_not(np.logical_and(c1, c2))
 
-    if num_columns == 3:  # There are two k parameters, Ku and Kd
-        # Extract samples that have very small differences between time samples
-        c1 = (diff_k[:, 1] <= threshold)
-        c2 = (diff_k[:, 2] <= threshold)
-        condition = np.logical_not(np.logical_and(c1, c2))
+            k_comp = np.extract(condition, k_param[:, 0])
+            k_comp = np.column_stack((k_comp, np.extract(condition, k_param[:, 1])))
+            k_comp = np.column_stack((k_comp, np.extract(condition, k_param[:, 2])))
 
-        k_comp = np.extract(condition, k_param[:, 0])
-        k_comp = np.column_stack((k_comp, np.extract(condition, k_param[:, 1])))
-        k_comp = np.column_stack((k_comp, np.extract(condition, k_param[:, 2])))
+        if num_columns == 2:  # There is only a single k-parameter as it is an open-drain type output
+            condition = np.logical_not(diff_k[:, 1] <= threshold)
+            k_comp = np.extract(condition, k_param[:, 0])
+            k_comp = np.column_stack((k_comp, np.extract(condition, k_param[:, 1])))
 
-    if num_columns == 2:  # There is only a single k-parameter as it is an open-drain type output
-        condition = (diff_k[:, 1] <= threshold)
-        k_comp = np.extract(condition, k_param[:, 0])
-        k_comp = np.column_stack((k_comp, np.extract(condition, k_param[:, 1])))
+        record.add_size("k_param", k_param)
+        record.add_size("k_comp", k_comp)
 
     return k_comp
+
+
+def find_edge_window(k_param, start_tolerance=_EDGE_START_TOLERANCE, settling_tolerance=_EDGE_SETTLING_TOLERANCE):
+    """
+    Finds the active switching window of a k-parameter waveform. The window starts at the last sample before any
+    k-parameter moves away from its initial value by more than start_tolerance of its swing, and ends at the first
+    sample after which every k-parameter stays within settling_tolerance of its swing of its final value
+
+        Parameters:
+            k_param: numpy array - 2 or 3 columns: [time, Ku, Kd] or [time, K]
+            start_tolerance: fraction of the swing of each k-parameter
+            settling_tolerance: fraction of the swing of each k-parameter
+
+        Returns:
+            tuple of the sample indexes (index_start, index_end) of the window
+    """
+    k_values = np.asarray(k_param)[:, 1:]
+    num_rows = np.shape(k_values)[0]
+    swing = np.max(k_values, axis=0) - np.min(k_values, axis=0)
+
+    started = np.any(np.absolute(k_values - k_values[0]) > start_tolerance * swing, axis=1)
+    unsettled = np.any(np.absolute(k_values - k_values[-1]) > settling_tolerance * swing, axis=1)
+    if not np.any(started) or not np.any(unsettled):
+        return 0, num_rows - 1
+
+    index_start = max(int(np.argmax(started)) - 1, 0)
+    index_end = min(num_rows - int(np.argmax(np.flip(unsettled))), num_rows - 1)
+    return index_start, index_end
+
+
+def trim_k_param(k_param, start_tolerance=_EDGE_START_TOLERANCE, settling_tolerance=_EDGE_SETTLING_TOLERANCE):
+    """
+    Trims the k-parameter waveform to its active switching window (see find_edge_window), removing the settled
+    lead and tail. The time samples are unchanged, so the edge keeps its timing relative to the start of the ibis
+    waveform. The first and last samples are set to the initial and final k-parameter values so that the dc levels
+    before and after the edge are unchanged
+
+        Parameters:
+            k_param: numpy array - 2 or 3 columns: [time, Ku, Kd] or [time, K]
+            start_tolerance: fraction of the swing of each k-parameter
+            settling_tolerance: fraction of the swing of each k-parameter
+
+        Returns:
+            k_trim: The trimmed waveform
+    """
+    with instrument.stage("trim") as record:
+        index_start, index_end = find_edge_window(k_param, start_tolerance, settling_tolerance)
+        k_trim = np.array(k_param[index_start:index_end + 1])
+        k_trim[0, 1:] = k_param[0, 1:]
+        k_trim[-1, 1:] = k_param[-1, 1:]
+
+        record.add_size("k_param", k_param)
+        record.add_size("k_trim", k_trim)
+
+    return k_trim
+
+
+def _hermite_slopes(x, y):
+    """
+    Shape preserving (Fritsch-Carlson) slopes of the piecewise cubic Hermite curve through the points, so that the
+    curve does not overshoot between them
+    """
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    if len(x) == 2:
+        return np.full(2, delta[0])
+
+    # Interior slopes: weighted harmonic mean of the neighbouring secants, zero at local extrema
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        harmonic_mean = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    slope = np.zeros_like(y)
+    slope[1:-1] = np.where(delta[:-1] * delta[1:] > 0, harmonic_mean, 0.0)
+
+    # End slopes: three point estimate, limited to keep the end segments monotonic
+    for (end, h0, h1, d0, d1) in ((0, h[0], h[1], delta[0], delta[1]), (-1, h[-1], h[-2], delta[-1], delta[-2])):
+        s = ((2 * h0 + h1) * d0 - h0 * d1) / (h0 + h1)
+        if np.sign(s) != np.sign(d0):
+            s = 0.0
+        elif np.sign(d0) != np.sign(d1) and abs(s) > abs(3 * d0):
+            s = 3 * d0
+        slope[end] = s
+    return slope
+
+
+def fit_iv_curve(voltage, current, tolerance=0.01, max_segments=_FIT_MAX_SEGMENTS):
+    """
+    Fits a smooth closed-form curve to an IV table, to replace the table() lookup of the SPICE current sources.
+    The current is fitted as i_scale * sinh(y(v)): below i_scale the curve is linear in the current, above it y is the
+    log of the current, so clamp tables that span many orders of magnitude become gentle curves. y is a shape
+    preserving piecewise cubic Hermite curve, which has a continuous conductance unlike the piecewise linear table.
+    Knots are added one at a time where the error is largest until the error is within the tolerance
+
+    The error of each sample is |i_fit - i| / (|i| + i_scale), a relative error for currents well above
+    i_scale = 1uA and an absolute error below it. The floor does not scale with the peak table current, so a clamp
+    that reaches amps outside the rails is still fitted to within nanoamps where it is off. The table is linearly
+    interpolated onto a finer voltage grid, so the error also bounds the fit between the table points
+
+        Parameters:
+            voltage: numpy voltage array (increasing)
+            current: corresponding numpy current array
+            tolerance: the target error
+            max_segments: the fit stops at this many cubic segments even if the error is above the tolerance
+
+        Returns:
+            an IVFit object. Its max_error may be above the tolerance if the table could not be fitted
+    """
+    voltage = np.asarray(voltage, dtype='float64')
+    current = np.asarray(current, dtype='float64')
+    i_scale = _FIT_CURRENT_FLOOR
+
+    with instrument.stage("fit_iv") as record:
+        fractions = np.arange(1, _FIT_SUBDIVISIONS) / _FIT_SUBDIVISIONS
+        v = np.union1d(voltage, (voltage[:-1, np.newaxis] + np.diff(voltage)[:, np.newaxis] * fractions).ravel())
+        i = np.interp(v, voltage, current)
+        y = np.arcsinh(i / i_scale)
+
+        knots = np.asarray([0, len(v) - 1])
+        while True:
+            slope = _hermite_slopes(v[knots], y[knots])
+            fit = IVFit(v[knots], y[knots], slope, i_scale, 0.0)
+            error = np.absolute(fit.evaluate(v) - i) / (np.absolute(i) + i_scale)
+            error[knots] = 0.0
+            if np.max(error) <= tolerance or len(knots) - 1 >= max_segments:
+                break
+            knots = np.union1d(knots, [np.argmax(error)])
+
+        fit = fit.replace(max_error=np.max(error))
+        record.add_size("table", len(voltage))
+        record.add_size("segments", len(knots) - 1)
+        record.add_label("max_error", fit.max_error)
+
+    return fit
@@ -0,0 +1,586 @@
+# ----------------------------------------------------------------------------
+# Author: Kishan Amratia
+# Module Name: simulate.py
+#
+# Module Description:
+# A pure numpy transient simulation of the output subcircuit created by the subcircuit module, loaded with the
+# r_fixture and v_fixture of each ibis V-T waveform. Used to validate a generated model against the ibis
+# rising and falling waveforms without running a SPICE simulator.
+#
+# The simulated circuit matches the subcircuit netlist:
+#
+#   V_fixture --R_fixture-- OUT --R_pkg-- MID --L_pkg-- DIE
+#                            |                           |-- C_comp to ground
+#                            |-- C_pkg to ground         |-- power and ground clamp tables
+#                                                        |-- Ku * pullup table and Kd * pulldown table
+#
+# The Ku and Kd waveforms are the compressed k-parameters used for the rising and falling edge PWL sources.
+# Every waveform and corner is simulated at the same time as one batch with a backward Euler integration.
+# At each time step the linear package and fixture equations are eliminated, which leaves a single nonlinear
+# equation in V(DIE) for each batch item that is solved with a vectorised Newton iteration.
+#
+# The same solver is used for load sweeps, where the fixture is replaced by a grid of R_load to V_term and
+# C_load to ground loads on OUT, and the rise/fall time, delay, overshoot and settling time of each edge are
+# measured for every corner, edge and load at once.
+#
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Imports
+# ---------------------------------------------------------------------------
+import numpy as np
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+from pybis2spice import instrument
+
+CORNERS = ["Typical", "WeakSlow", "FastStrong"]
+_DEFAULT_STEPS = 2000
+_NEWTON_TOLERANCE = 1e-9  # Volts
+_NEWTON_MAX_ITERATIONS = 50
+_NEWTON_MAX_STEP = 0.5  # Volts, limits the Newton step so that the iteration does not jump across the tables
+_DC_ITERATIONS = 100
+_DC_MARGIN = 10.0  # Volts beyond the table voltages searched for the dc operating point
+
+
+class SimulatedWaveform(object):
+    """
+    The simulated fixture waveform of a single ibis V-T waveform and corner
+
+        Contains the following attributes:
+            waveform_type: "Rising" or "Falling"
+            corner: "Typical", "WeakSlow" or "FastStrong"
+            index: index of the waveform in the DataModel vt_rising or vt_falling list
+            waveform: the ibis Waveform object
+            time: numpy array of the simulation time points
+            voltage: numpy array of the simulated voltage at the fixture node (OUT, or DIE without the package)
+    """
+
+    def __init__(self, waveform_type, corner, index, waveform, time, voltage):
+        self.waveform_type = waveform_type
+        self.corner = corner
+        self.index = index
+        self.waveform = waveform
+        self.time = time
+        self.voltage = voltage
+
+    def get_errors(self):
+        """
+        returns a dictionary of the error between the simulated and ibis waveform at the ibis time samples:
+            max_error: maximum absolute error in volts
+            rms_error: rms error in volts
+            relative_max_error: max_error divided by the voltage swing of the ibis waveform
+        """
+        _corner_index = subcircuit.convert_corner_str_to_index(self.corner) + 1
+        ibis_time = self.waveform.data[:, 0]
+        ibis_voltage = self.waveform.data[:, _corner_index]
+        error = np.interp(ibis_time, self.time, self.voltage) - ibis_voltage
+
+        swing = np.max(ibis_voltage) - np.min(ibis_voltage)
+        max_error = float(np.max(np.absolute(error)))
+        return {"max_error": max_error,
+                "rms_error": float(np.sqrt(np.mean(error ** 2))),
+                "relative_max_error": float(max_error / swing) if swing > 0 else None}
+
+    def to_record(self):
+        """
+        returns a JSON serialisable dictionary of the waveform details and errors
+        """
+        record = {"waveform_type": self.waveform_type,
+                  "corner": self.corner,
+                  "index": self.index,
+                  "v_fixture": float(self.waveform.v_fix[subcircuit.convert_corner_str_to_index(self.corner)]),
+                  "r_fixture": self.waveform.r_fix}
+        record.update(self.get_errors())
+        return record
+
+
+class _TableBatch(object):
+    """
+    A batch of piecewise linear tables, one per batch item, evaluated together.
+    Outside the table voltages the end value is held, which matches the SPICE table() function
+    """
+
+    def __init__(self, tables):
+        size = max(2, max(len(x) for x, y in tables))
+        self.xp = np.empty([len(tables), size])
+        self.fp = np.empty([len(tables), size])
+        for n, (x, y) in enumerate(tables):
+            if len(x) == 1:
+                x, y = np.repeat(x, 2), np.repeat(y, 2)
+            # Pad with the last point, the zero width intervals have no effect on the interpolation
+            self.xp[n] = np.pad(x, (0, size - len(x)), mode='edge')
+            self.fp[n] = np.pad(y, (0, size - len(y)), mode='edge')
+
+        self.x_min = self.xp[:, 0]
+        self.x_max = self.xp[:, -1]
+        dx = np.diff(self.xp, axis=1)
+        self.slope = np.divide(np.diff(self.fp, axis=1), dx, out=np.zeros_like(dx), where=dx > 0)
+
+        # All the rows are shifted into separate ranges of one sorted array so a single searchsorted call finds
+        # the interval of every batch item
+        span = np.max(self.x_max - self.x_min) + 1.0
+        self._row_offset = np.arange(len(tables)) * span - self.x_min
+        self._flat_x = (self.xp + self._row_offset[:, np.newaxis]).ravel()
+        self._row_start = np.arange(len(tables)) * size
+        self._rows = np.arange(len(tables))
+        self._size = size
+
+    def evaluate(self, v):
+        """
+        returns (value, slope) of each table at the voltages v (one voltage per batch item)
+        """
+        v_clip = np.clip(v, self.x_min, self.x_max)
+        index = np.searchsorted(self._flat_x, v_clip + self._row_offset, side='right') - self._row_start - 1
+        index = np.clip(index, 0, self._size - 2)
+        slope = self.slope[self._rows, index]
+        value = self.fp[self._rows, index] + slope * (v_clip - self.xp[self._rows, index])
+        in_range = (v > self.x_min) & (v < self.x_max)
+        return value, np.where(in_range, slope, 0.0)
+
+
+def _zero_table():
+    return np.asarray([0.0, 1.0]), np.asarray([0.0, 0.0])
+
+
+def get_device_tables(ibis_data, corner):
+    """
+    returns the pullup, pulldown and combined clamp tables as (v_die, current) arrays for the corner.
+    The tables are the same as the ones written by define_pwr_and_gnd_clamps and define_pullup_and_pulldown_devices,
+    with the current flowing from the DIE node into the reference node. Missing tables are zero
+    """
+    _CORNER_INDEX = subcircuit.convert_corner_str_to_index(corner) + 1
+
+    pullup_ref = pybis2spice.get_reference(ibis_data.pullup_ref, ibis_data.v_range, _CORNER_INDEX)
+    pulldown_ref = pybis2spice.get_reference(ibis_data.pulldown_ref, 0, _CORNER_INDEX)
+    pwr_clamp_ref = pybis2spice.get_reference(ibis_data.pwr_clamp_ref, ibis_data.v_range, _CORNER_INDEX)
+    gnd_clamp_ref = pybis2spice.get_reference(ibis_data.gnd_clamp_ref, 0, _CORNER_INDEX)
+
+    pullup = _zero_table()
+    if ibis_data.iv_pullup is not None:
+        pullup = (np.flip(pullup_ref - ibis_data.iv_pullup[:, 0]), np.flip(ibis_data.iv_pullup[:, _CORNER_INDEX]))
+
+    pulldown = _zero_table()
+    if ibis_data.iv_pulldown is not None:
+        pulldown = (ibis_data.iv_pulldown[:, 0] - pulldown_ref, ibis_data.iv_pulldown[:, _CORNER_INDEX])
+
+    clamp_tables = []
+    if ibis_data.iv_pwr_clamp is not None:
+        clamp_tables.append((np.flip(pwr_clamp_ref - ibis_data.iv_pwr_clamp[:, 0]),
+                             np.flip(ibis_data.iv_pwr_clamp[:, _CORNER_INDEX])))
+    if ibis_data.iv_gnd_clamp is not None:
+        clamp_tables.append((ibis_data.iv_gnd_clamp[:, 0] - gnd_clamp_ref, ibis_data.iv_gnd_clamp[:, _CORNER_INDEX]))
+
+    # The clamps are always on, so they are summed into a single table. The sum of 2 piecewise linear tables is
+    # exact on the union of their voltages
+    clamps = _zero_table()
+    if clamp_tables:
+        v = np.unique(np.concatenate([x for x, y in clamp_tables]))
+        clamps = (v, np.sum([np.interp(v, x, y) for x, y in clamp_tables], axis=0))
+
+    return pullup, pulldown, clamps
+
+
+def get_package_values(ibis_data, corner):
+    """
+    returns (r_pkg, l_pkg, c_pkg, c_comp) for the corner with the same substitutions as spice_rlc_netlist:
+    a missing corner value uses the typical value and a zero value uses the nominal 0.01ohm, 1nH and 0.1pF
+    """
+    _INDEX = subcircuit.convert_corner_str_to_index(corner)
+    values = []
+    for param, nominal in [(ibis_data.r_pkg, 0.01), (ibis_data.l_pkg, 1e-9), (ibis_data.c_pkg, 0.1e-12)]:
+        value = param[_INDEX]
+        if value is None:
+            value = param[0]
+        elif value == 0:
+            value = nominal
+        values.append(float(value))
+
+    c_comp = ibis_data.c_comp[_INDEX]
+    values.append(float(ibis_data.c_comp[0] if c_comp is None else c_comp))
+    return tuple(values)
+
+
+def get_k_params(ibis_data, corner, waveform_type):
+    """
+    returns the compressed k-parameters used for the edge PWL sources as (time, ku, kd).
+    Open drain models have no pullup device, so ku is zero
+    """
+    _CORNER_INDEX = subcircuit.convert_corner_str_to_index(corner) + 1
+    k_param = subcircuit.solve_edge_k_params(ibis_data, _CORNER_INDEX, waveform_type)
+    if ibis_data.model_type.lower() == "open_drain":
+        ku = np.zeros(np.shape(k_param)[0])
+        kd = k_param[:, 1]
+    else:
+        ku = k_param[:, 1]
+        kd = k_param[:, 2]
+
+    # create_edge_waveform_pwl places the first point at the edge delay, which is 0 here
+    time = np.array(k_param[:, 0])
+    time[0] = 0.0
+    return time, ku, kd
+
+
+class _Circuit(object):
+    """
+    The batch of output subcircuits, one per batch item, each driving a load resistor r_load to v_term with a
+    capacitor c_load in parallel at the OUT node
+
+        Parameters:
+            items - list of dictionaries, one per batch item, with the keys:
+                    "ibis_data", "corner", "k_time", "ku", "kd" - the model, corner and the edge k-parameters
+                    "r_load", "v_term", "c_load" - the load at the OUT node. r_load may be np.inf for no resistor
+                    "t_end" - the simulation end time
+            include_package - if False the load is connected to the DIE node and the package is not simulated
+    """
+
+    def __init__(self, items, include_package=True):
+        self.items = items
+        batch_size = len(items)
+
+        # The tables only depend on the model and corner, so they are only built once for each
+        tables = {}
+        for item in items:
+            key = (id(item["ibis_data"]), item["corner"])
+            if key not in tables:
+                tables[key] = get_device_tables(item["ibis_data"], item["corner"])
+        item_tables = [tables[(id(item["ibis_data"]), item["corner"])] for item in items]
+        self.pullup = _TableBatch([table[0] for table in item_tables])
+        self.pulldown = _TableBatch([table[1] for table in item_tables])
+        self.clamps = _TableBatch([table[2] for table in item_tables])
+
+        package = np.asarray([get_package_values(item["ibis_data"], item["corner"]) for item in items])
+        self.r_pkg, self.l_pkg, self.c_pkg, self.c_comp = package.T
+        if not include_package:
+            self.r_pkg, self.l_pkg, self.c_pkg = np.zeros(batch_size), np.zeros(batch_size), np.zeros(batch_size)
+
+        self.g_load = 1 / np.asarray([item["r_load"] for item in items], dtype='float64')  # 0 for no resistor
+        self.v_term = np.asarray([item["v_term"] for item in items], dtype='float64')
+        self.c_out = self.c_pkg + np.asarray([item["c_load"] for item in items], dtype='float64')
+        if np.any((self.c_out == 0) & (self.g_load == 0)):
+            raise ValueError("The OUT node needs a load resistor or capacitance")
+        self.t_end = np.asarray([item["t_end"] for item in items], dtype='float64')
+
+    def get_k(self, time):
+        """
+        returns the ku and kd values of each batch item at the time points (a row per batch item)
+        """
+        ku = np.asarray([np.interp(time[n], item["k_time"], item["ku"]) for n, item in enumerate(self.items)])
+        kd = np.asarray([np.interp(time[n], item["k_time"], item["kd"]) for n, item in enumerate(self.items)])
+        return ku, kd
+
+    def solve_dc(self, ku, kd):
+        """
+        returns the dc (v_die, i_l, v_out) of each batch item, with V(DIE) found by bisection. At dc the
+        capacitors are open and the inductor is shorted, so the load current through r_load + r_pkg equals the
+        device current
+        """
+        pullup, pulldown, clamps = self.pullup, self.pulldown, self.clamps
+        g_total = self.g_load / (1 + self.g_load * self.r_pkg)
+        low = np.minimum(np.minimum(pullup.x_min, pulldown.x_min), clamps.x_min) - _DC_MARGIN
+        high = np.maximum(np.maximum(pullup.x_max, pulldown.x_max), clamps.x_max) + _DC_MARGIN
+        low = np.minimum(low, self.v_term)
+        high = np.maximum(high, self.v_term)
+
+        for _ in range(_DC_ITERATIONS):
+            v = (low + high) / 2
+            i_device = ku * pullup.evaluate(v)[0] + kd * pulldown.evaluate(v)[0] + clamps.evaluate(v)[0]
+            positive = (i_device - (self.v_term - v) * g_total) > 0
+            high = np.where(positive, v, high)
+            low = np.where(positive, low, v)
+
+        v_die = (low + high) / 2
+        i_l = (self.v_term - v_die) * g_total
+        return v_die, i_l, v_die + self.r_pkg * i_l
+
+    def transient(self, steps):
+        """
+        Runs the backward Euler transient simulation from the dc operating point at time 0
+
+            Returns:
+                (time, voltage) - numpy arrays of the time points and V(OUT) with a row per batch item
+        """
+        # Each batch item has its own time step so that all the items are covered by the same number of steps
+        time = np.linspace(0, 1, steps + 1)[np.newaxis, :] * self.t_end[:, np.newaxis]
+        h = self.t_end / steps
+        ku, kd = self.get_k(time)
+
+        voltage = np.zeros([len(self.items), steps + 1])
+        v_die, i_l, v_out = self.solve_dc(ku[:, 0], kd[:, 0])
+        voltage[:, 0] = v_out
+
+        # Backward Euler companion values. Eliminating v_out and i_l leaves A * v_die - B + I_device(v_die) = 0
+        g_cout = self.c_out / h
+        g_comp = self.c_comp / h
+        l_h = self.l_pkg / h
+        b = 1 / (g_cout + self.g_load)  # v_out = a - b * i_l
+        d = 1 / (l_h + self.r_pkg + b)  # i_l = c - d * v_die
+        coefficient = g_comp + d
+
+        for n in range(1, steps + 1):
+            a = (g_cout * v_out + self.g_load * self.v_term) * b
+            c = (l_h * i_l + a) * d
+            rhs = g_comp * v_die + c
+            ku_n = ku[:, n]
+            kd_n = kd[:, n]
+
+            v = v_die
+            for _ in range(_NEWTON_MAX_ITERATIONS):
+                i_pu, di_pu = self.pullup.evaluate(v)
+                i_pd, di_pd = self.pulldown.evaluate(v)
+                i_cl, di_cl = self.clamps.evaluate(v)
+                residual = coefficient * v - rhs + ku_n * i_pu + kd_n * i_pd + i_cl
+                derivative = coefficient + ku_n * di_pu + kd_n * di_pd + di_cl
+                # A negative resistance region of the tables is stepped over using the linear part only
+                derivative = np.where(derivative > 0, derivative, coefficient)
+                dv = np.clip(residual / derivative, -_NEWTON_MAX_STEP, _NEWTON_MAX_STEP)
+                v = v - dv
+                if np.max(np.absolute(dv)) < _NEWTON_TOLERANCE:
+                    break
+
+            v_die = v
+            i_l = c - d * v_die
+            v_out = a - b * i_l
+            voltage[:, n] = v_out
+
+        return time, voltage
+
+
+def simulate_batch(items, steps=_DEFAULT_STEPS, include_package=True):
+    """
+    Simulates a batch of output subcircuits with their loads together
+
+        Parameters:
+            items - list of dictionaries, one per batch item (see _Circuit for the keys)
+            steps - number of backward Euler time steps across each item
+            include_package - if False the load is connected to the DIE node and the package is not simulated,
+                              which is how the ibis V-T waveforms are defined
+
+        Returns:
+            (time, voltage) - numpy arrays with a row per batch item
+    """
+    return _Circuit(items, include_package=include_package).transient(steps)
+
+
+def get_simulation_items(ibis_data, corners=None):
+    """
+    returns the batch items of simulate_batch for every rising and falling waveform of each corner
+    """
+    if corners is None:
+        corners = CORNERS
+
+    items = []
+    for corner in corners:
+        for waveform_type, waveforms in [("Rising", ibis_data.vt_rising), ("Falling", ibis_data.vt_falling)]:
+            k_time, ku, kd = get_k_params(ibis_data, corner, waveform_type)
+            for index, waveform in enumerate(waveforms):
+                _INDEX = subcircuit.convert_corner_str_to_index(corner)
+                items.append({"ibis_data": ibis_data, "corner": corner, "waveform_type": waveform_type,
+                              "index": index, "waveform": waveform, "k_time": k_time, "ku": ku, "kd": kd,
+                              "r_load": waveform.r_fix, "v_term": waveform.v_fix[_INDEX], "c_load": 0.0,
+                              "t_end": waveform.data[-1, 0]})
+    return items
+
+
+def can_simulate(ibis_data):
+    """
+    returns True if the model is an output model with the waveforms needed to solve the k-parameters
+    """
+    if ibis_data.model_type is None or ibis_data.model_type.lower() not in subcircuit.OUTPUT_MODEL_TYPES:
+        return False
+    min_waveforms = 1 if ibis_data.model_type.lower() == "open_drain" else 2
+    return len(ibis_data.vt_rising) >= min_waveforms and len(ibis_data.vt_falling) >= min_waveforms
+
+
+def simulate_fixtures(ibis_data, corners=None, steps=_DEFAULT_STEPS, include_package=True):
+    """
+    Simulates the generated output subcircuit of the model with the fixture of every ibis V-T waveform
+
+        Parameters:
+            ibis_data - a DataModel object (defined in pybis2spice.py)
+            corners - list of corners "Typical", "WeakSlow" and/or "FastStrong" (default all corners)
+            steps - number of time steps across each waveform
+            include_package - simulate the package R/L/C between the die and the fixture (as in the subcircuit)
+
+        Returns:
+            list of SimulatedWaveform objects. Empty if the model cannot be simulated (see can_simulate)
+    """
+    if not can_simulate(ibis_data):
+        return []
+
+    with instrument.stage("simulate", model=ibis_data.model_name) as record:
+        items = get_simulation_items(ibis_data, corners)
+        time, voltage = simulate_batch(items, steps=steps, include_package=include_package)
+        record.add_size("voltage", voltage)
+
+    return [SimulatedWaveform(item["waveform_type"], item["corner"], item["index"], item["waveform"], time[n],
+                              voltage[n]) for n, item in enumerate(items)]
+
+
+def validate_model(ibis_data, corners=None, steps=_DEFAULT_STEPS, include_package=True):
+    """
+    returns a list of the error records (see SimulatedWaveform.to_record) between the simulated and ibis
+    waveforms for every rising and falling waveform of each corner
+    """
+    return [simulated.to_record() for simulated in simulate_fixtures(ibis_data, corners, steps, include_package)]
+
+
+# ---------------------------------------------------------------------------
+# Load Sweep
+# ---------------------------------------------------------------------------
+
+_SWEEP_STEPS = 1000
+_SWEEP_TIME_FACTOR = 4  # The default sweep time is this multiple of the k-parameter edge duration
+_SETTLING_TOLERANCE = 0.02  # Fraction of the swing
+SWEEP_METRICS = ["transition_time", "delay", "overshoot", "settling_time"]
+
+
+class LoadSweep(object):
+    """
+    The results of a load sweep. The metric arrays are indexed [corner, waveform_type, r_load, c_load]
+
+        Contains the following attributes:
+            corners: list of the swept corners
+            waveform_types: list of the swept edges, "Rising" and/or "Falling"
+            r_loads: numpy array of the load resistances
+            c_loads: numpy array of the load capacitances
+            v_term: numpy array of the load termination voltage [corner, waveform_type]
+            time, voltage: the simulated V(OUT) waveforms, indexed [corner, waveform_type, r_load, c_load, step]
+            metrics: dictionary of the metric arrays (NaN where the metric could not be measured):
+                transition_time: 10% to 90% rise or fall time of the edge
+                delay: time from the start of the edge to the 50% crossing
+                overshoot: peak beyond the final value as a fraction of the swing
+                settling_time: time from the start of the edge until the output stays within the settling
+                               tolerance of the final value. NaN if it does not settle within the simulated time
+    """
+
+    def __init__(self, corners, waveform_types, r_loads, c_loads, v_term, time, voltage, metrics):
+        self.corners = corners
+        self.waveform_types = waveform_types
+        self.r_loads = r_loads
+        self.c_loads = c_loads
+        self.v_term = v_term
+        self.time = time
+        self.voltage = voltage
+        self.metrics = metrics
+
+    def to_records(self):
+        """
+        returns a JSON serialisable list of dictionaries, one per grid point, with the load and the metrics
+        """
+        records = []
+        for index in np.ndindex(*self.metrics["delay"].shape):
+            n_corner, n_type, n_r, n_c = index
+            record = {"corner": self.corners[n_corner],
+                      "waveform_type": self.waveform_types[n_type],
+                      "r_load": float(self.r_loads[n_r]),
+                      "c_load": float(self.c_loads[n_c]),
+                      "v_term": float(self.v_term[n_corner, n_type])}
+            for name in SWEEP_METRICS:
+                value = float(self.metrics[name][index])
+                record[name] = None if np.isnan(value) else value
+            records.append(record)
+        return records
+
+
+def get_edge_metrics(time, voltage, v_initial, v_final, settling_tolerance=_SETTLING_TOLERANCE):
+    """
+    Measures the edges of a batch of waveforms
+
+        Parameters:
+            time, voltage - numpy arrays with a row per waveform
+            v_initial, v_final - the initial and final (dc) voltage of each waveform
+            settling_tolerance - the settling band as a fraction of the swing
+
+        Returns:
+            dictionary of the metric arrays, see LoadSweep. NaN for waveforms with no swing
+    """
+    swing = v_final - v_initial
+    has_swing = np.absolute(swing) > 0
+    y = (voltage - v_initial[:, np.newaxis]) / np.where(has_swing, swing, 1.0)[:, np.newaxis]
+
+    transition_time = subcircuit.find_crossing_times(time, y, 0.9) - subcircuit.find_crossing_times(time, y, 0.1)
+    delay = subcircuit.find_crossing_times(time, y, 0.5)
+    overshoot = np.maximum(np.max(y, axis=1) - 1, 0)
+
+    outside = np.absolute(y - 1) > settling_tolerance
+    last_outside = np.shape(y)[1] - 1 - np.argmax(np.flip(outside, axis=1), axis=1)
+    settled = ~outside[:, -1]
+    settle_index = np.minimum(last_outside + 1, np.shape(y)[1] - 1)
+    settling_time = np.where(settled, time[np.arange(np.shape(y)[0]), settle_index], np.nan)
+
+    metrics = {"transition_time": transition_time, "delay": delay, "overshoot": overshoot,
+               "settling_time": settling_time}
+    return {name: np.where(has_swing, value, np.nan) for name, value in metrics.items()}
+
+
+def get_default_termination(ibis_data, corner, waveform_type):
+    """
+    returns the default load termination voltage: ground for a rising edge and the pullup supply for a falling
+    edge, so that the load opposes the edge. Open drain models are always terminated to the pullup supply
+    """
+    _CORNER_INDEX = subcircuit.convert_corner_str_to_index(corner) + 1
+    if waveform_type == "Rising" and ibis_data.model_type.lower() != "open_drain":
+        return 0.0
+    return float(pybis2spice.get_reference(ibis_data.pullup_ref, ibis_data.v_range, _CORNER_INDEX))
+
+
+def sweep_loads(ibis_data, r_loads, c_loads, corners=None, waveform_types=None, v_term=None, t_end=None,
+                steps=_SWEEP_STEPS, settling_tolerance=_SETTLING_TOLERANCE):
+    """
+    Simulates the generated output model driving every combination of load resistance and capacitance for each
+    corner and edge as a single batch, and measures the edges
+
+        Parameters:
+            ibis_data - a DataModel object (defined in pybis2spice.py)
+            r_loads - list of load resistances in ohms from OUT to v_term. np.inf for a capacitive only load
+            c_loads - list of load capacitances in farads from OUT to ground
+            corners - list of corners "Typical", "WeakSlow" and/or "FastStrong" (default all corners)
+            waveform_types - list of edges "Rising" and/or "Falling" (default both)
+            v_term - load termination voltage (default see get_default_termination)
+            t_end - simulated time of each edge (default 4 times the k-parameter edge duration)
+            steps - number of time steps of each edge
+            settling_tolerance - the settling band as a fraction of the swing
+
+        Returns:
+            a LoadSweep object
+
+        Raises:
+            ValueError: if the model is not an output model with enough waveforms (see can_simulate)
+    """
+    if not can_simulate(ibis_data):
+        raise ValueError(f"Model {ibis_data.model_name} of type {ibis_data.model_type} cannot be simulated")
+    if corners is None:
+        corners = CORNERS
+    if waveform_types is None:
+        waveform_types = ["Rising", "Falling"]
+    r_loads = np.asarray(r_loads, dtype='float64')
+    c_loads = np.asarray(c_loads, dtype='float64')
+
+    with instrument.stage("sweep", model=ibis_data.model_name) as record:
+        items = []
+        terminations = np.zeros([len(corners), len(waveform_types)])
+        for n_corner, corner in enumerate(corners):
+            for n_type, waveform_type in enumerate(waveform_types):
+                k_time, ku, kd = get_k_params(ibis_data, corner, waveform_type)
+                _v_term = get_default_termination(ibis_data, corner, waveform_type) if v_term is None else v_term
+                _t_end = k_time[-1] * _SWEEP_TIME_FACTOR if t_end is None else t_end
+                terminations[n_corner, n_type] = _v_term
+                for r_load in r_loads:
+                    for c_load in c_loads:
+                        items.append({"ibis_data": ibis_data, "corner": corner, "k_time": k_time, "ku": ku,
+                                      "kd": kd, "r_load": r_load, "v_term": _v_term, "c_load": c_load,
+                                      "t_end": _t_end})
+
+        circuit = _Circuit(items)
+        time, voltage = circuit.transient(steps)
+        # The final value is the dc operating point at the end of the edge, which does not depend on the
+        # simulated time being long enough for the edge to settle
+        ku_end, kd_end = circuit.get_k(time[:, -1:])
+        v_final = circuit.solve_dc(ku_end[:, 0], kd_end[:, 0])[2]
+        metrics = get_edge_metrics(time, voltage, voltage[:, 0], v_final, settling_tolerance)
+        record.add_size("voltage", voltage)
+
+    shape = (len(corners), len(waveform_types), len(r_loads), len(c_loads))
+    return LoadSweep(list(corners), list(waveform_types), r_loads, c_loads, terminations,
+                     time.reshape(shape + (steps + 1,)), voltage.reshape(shape + (steps + 1,)),
+                     {name: value.reshape(shape) for name, value in metrics.items()})
@@ -11,9 +11,11 @@
 # Imports
 # ---------------------------------------------------------------------------
 import os.path
+import re
 
 import numpy as np
 from pybis2spice import pybis2spice
+from pybis2spice import instrument
 from pybis2spice import version
 
 
@@ -21,9 +23,14 @@ _TIME = 0
 _KU = 1
 _KD = 2
 _KD_OD = 1
+OUTPUT_MODEL_TYPES = ["output", "i/o", "3-state", "open_drain", "i/o_open_drain"]  # Lower case, see solve_edge_k_params
+EDGE_TOLERANCE = 0.005  # Default start and settling tolerance of the k-parameter switching window
+FIT_TOLERANCE = 0.01  # Default error bound of the closed-form IV curves, relative to the table current
+_STEPS_PER_EDGE = 20  # Transient timesteps across the fastest k-parameter edge for the recommended maximum timestep
 
 
-def generate_spice_model(io_type, subcircuit_type, ibis_data, corner, output_filepath):
+def generate_spice_model(io_type, subcircuit_type, ibis_data, corner, output_filepath, max_points=None,
+                         edge_tolerance=EDGE_TOLERANCE, fit_tolerance=None):
     """
     Wrapper around the subcircuit file creation functions. Calls the relevant function i.e. LTSpice or Generic
 
@@ -33,21 +40,33 @@ def generate_spice_model(io_type, subcircuit_type, ibis_data, corner, output_fil
             ibis_data - a DataModel object (defined in pybis2spice.py)
             corner - "WeakSlow" or "Typical" or "FastStrong"
             output_filepath - path of output file
+            max_points - if given, the k-parameters of output models are solved on an adaptive time grid of this
+                         many samples (see pybis2spice.build_adaptive_time_grid)
+            edge_tolerance - the k-parameters of output models are trimmed to the switching window where they are
+                             further than this fraction of their swing from their initial and final values
+                             (see pybis2spice.trim_k_param). None keeps the full ibis waveform window
+            fit_tolerance - if given, the IV tables of the devices and clamps are replaced by closed-form curves that
+                            are within this error of the tables (see pybis2spice.fit_iv_curve). A table that cannot
+                            be fitted within the tolerance is kept
 
         Returns:
             The path of the created file
     """
     ret = None
-    if io_type == "Output":
+    with instrument.stage("conversion", model=ibis_data.model_name, corner=corner, io_type=io_type,
+                          subcircuit_type=subcircuit_type):
+        if io_type == "Output":
 
-        if subcircuit_type == "Generic":
-            ret = create_generic_output_model(ibis_data, corner, io_type, output_filepath)
+            if subcircuit_type == "Generic":
+                ret = create_generic_output_model(ibis_data, corner, io_type, output_filepath, max_points=max_points,
+                                                  edge_tolerance=edge_tolerance, fit_tolerance=fit_tolerance)
 
-        if subcircuit_type == "LTSpice":
-            ret = create_ltspice_output_model(ibis_data, corner, io_type, output_filepath)
+            if subcircuit_type == "LTSpice":
+                ret = create_ltspice_output_model(ibis_data, corner, io_type, output_filepath, max_points=max_points,
+                                                  edge_tolerance=edge_tolerance, fit_tolerance=fit_tolerance)
 
-    if io_type == "Input":
-        ret = create_input_model(ibis_data, corner, io_type, output_filepath)
+        if io_type == "Input":
+            ret = create_input_model(ibis_data, corner, io_type, output_filepath, fit_tolerance=fit_tolerance)
 
     return ret
 
@@ -72,13 +91,16 @@ def convert_corner_str_to_index(corner):
     return index
 
 
-def spice_header_info(ibis_data, corner, extra_info=""):
+def spice_header_info(ibis_data, corner, extra_info="", timestep_hints=None):
     """
     Returns a header string for the ibis file. Helps create a comment on the SPICE subcircuit file
 
     Parameters:
         ibis_data - a DataModel object (defined in pybis2spice.py)
         corner - "Typical", "WeakSlow" or "FastStrong"
+        extra_info - extra comment lines of the header
+        timestep_hints - if given, the dictionary from get_timestep_hints. The hints are added to the comment and
+                         the recommended maximum timestep is defined as a parameter after the header
     """
     st = "*********************************************************************\n*\n"
     st += f'* IBIS filename: {ibis_data.file_name}\n'
@@ -90,8 +112,15 @@ def spice_header_info(ibis_data, corner, extra_info=""):
     st += f'* Temperature Range (degC): {ibis_data.temp_range} (Typ, Min, Max)\n'
     st += f'* SPICE subcircuit model created with pybis2spice version {version.get_version()}\n'
     st += f'* For more info, visit https://github.com/kamratia1/pybis2spice/\n*\n'
+    for message in ibis_data.iv_warnings:
+        st += f'* WARNING: {message}\n'
+    if ibis_data.iv_warnings:
+        st += '*\n'
     st += f'{extra_info}'
+    st += timestep_info(timestep_hints)
     st += "*********************************************************************\n\n"
+    if timestep_hints is not None:
+        st += f'.param {timestep_hints["param_name"]}={timestep_hints["max_timestep"]:.4g}\n\n'
     return st
 
 
@@ -149,12 +178,13 @@ def spice_rlc_netlist(ibis_data, corner, pin_name):
     return st
 
 
-def define_pwr_and_gnd_clamps(ibis_data, corner):
+def define_pwr_and_gnd_clamps(ibis_data, corner, fit_tolerance=None):
     """
     Arbitrary Source definition for power and ground clamp
     Parameters:
         ibis_data - a DataModel object (defined in pybis2spice.py)
         corner - "Typical", "WeakSlow" or "FastStrong"
+        fit_tolerance - if given, the clamp tables are replaced by closed-form curves (see define_iv_current)
 
     Returns the netlist for the arbitrary source
     """
@@ -170,25 +200,28 @@ def define_pwr_and_gnd_clamps(ibis_data, corner):
     # Arbitrary Source definition for power and ground clamp
     if ibis_data.iv_pwr_clamp is not None:
         return_val += f'V1 PWR_CLAMP_REF 0 {pwr_clamp_ref}\n'
-        pwr_clamp_table_str = convert_iv_table_to_str(np.flip(pwr_clamp_ref - ibis_data.iv_pwr_clamp[:, 0]),
-                                                      np.flip(ibis_data.iv_pwr_clamp[:, _CORNER_INDEX]))
-        return_val += f'B1 DIE PWR_CLAMP_REF I = table(V(DIE), {pwr_clamp_table_str})\n'
+        (pwr_clamp_str, comment) = define_iv_current("B1", np.flip(pwr_clamp_ref - ibis_data.iv_pwr_clamp[:, 0]),
+                                                     np.flip(ibis_data.iv_pwr_clamp[:, _CORNER_INDEX]), fit_tolerance)
+        return_val += comment
+        return_val += f'B1 DIE PWR_CLAMP_REF I = {pwr_clamp_str}\n'
 
     if ibis_data.iv_gnd_clamp is not None:
         return_val += f'V2 GND_CLAMP_REF 0 {gnd_clamp_ref}\n'
-        gnd_clamp_table_str = convert_iv_table_to_str(ibis_data.iv_gnd_clamp[:, 0] - gnd_clamp_ref,
-                                                      ibis_data.iv_gnd_clamp[:, _CORNER_INDEX])
-        return_val += f'B2 DIE GND_CLAMP_REF I = table(V(DIE), {gnd_clamp_table_str})\n\n'
+        (gnd_clamp_str, comment) = define_iv_current("B2", ibis_data.iv_gnd_clamp[:, 0] - gnd_clamp_ref,
+                                                     ibis_data.iv_gnd_clamp[:, _CORNER_INDEX], fit_tolerance)
+        return_val += comment
+        return_val += f'B2 DIE GND_CLAMP_REF I = {gnd_clamp_str}\n\n'
 
     return return_val
 
 
-def define_pullup_and_pulldown_devices(ibis_data, corner):
+def define_pullup_and_pulldown_devices(ibis_data, corner, fit_tolerance=None):
     """
     Arbitrary Source definition for pullup and pulldown devices
     Parameters:
         ibis_data - a DataModel object (defined in pybis2spice.py)
         corner - "Typical", "WeakSlow" or "FastStrong"
+        fit_tolerance - if given, the device tables are replaced by closed-form curves (see define_iv_current)
 
     Returns the netlist for the arbitrary source for the devices
     """
@@ -203,20 +236,22 @@ def define_pullup_and_pulldown_devices(ibis_data, corner):
     # Arbitrary Source definition for pullup and pulldown devices
     if ibis_data.iv_pullup is not None:
         return_val += f'V3 PULLUP_REF 0 {pullup_ref}\n'
-        pullup_table_str = convert_iv_table_to_str(np.flip(pullup_ref - ibis_data.iv_pullup[:, 0]),
-                                                   np.flip(ibis_data.iv_pullup[:, _CORNER_INDEX]))
-        return_val += f'B3 DIE PULLUP_REF I={{V(Ku)*table(V(DIE), {pullup_table_str})}}\n'
+        (pullup_str, comment) = define_iv_current("B3", np.flip(pullup_ref - ibis_data.iv_pullup[:, 0]),
+                                                  np.flip(ibis_data.iv_pullup[:, _CORNER_INDEX]), fit_tolerance)
+        return_val += comment
+        return_val += f'B3 DIE PULLUP_REF I={{V(Ku)*{pullup_str}}}\n'
 
     if ibis_data.iv_pulldown is not None:
         return_val += f'V4 PULLDOWN_REF 0 {pulldown_ref}\n'
-        pulldown_table_str = convert_iv_table_to_str(ibis_data.iv_pulldown[:, 0] - pulldown_ref,
-                                                     ibis_data.iv_pulldown[:, _CORNER_INDEX])
-        return_val += f'B4 DIE PULLDOWN_REF I={{V(Kd)*table(V(DIE), {pulldown_table_str})}}\n\n'
+        (pulldown_str, comment) = define_iv_current("B4", ibis_data.iv_pulldown[:, 0] - pulldown_ref,
+                                                    ibis_data.iv_pulldown[:, _CORNER_INDEX], fit_tolerance)
+        return_val += comment
+        return_val += f'B4 DIE PULLDOWN_REF I={{V(Kd)*{pulldown_str}}}\n\n'
 
     return return_val
 
 
-def create_input_model(ibis_data, corner, io_type, output_filepath):
+def create_input_model(ibis_data, corner, io_type, output_filepath, fit_tolerance=None):
     """
     Creates a SPICE generic subcircuit model.
     Generic models are simple and only supports a single oscillation pulse with a given frequency
@@ -226,9 +261,11 @@ def create_input_model(ibis_data, corner, io_type, output_filepath):
         corner - "Typical", "WeakSlow" or "FastStrong"
         io_type - "Input" or "Output"
         output_filepath - path of output file
+        fit_tolerance - if given, the error bound of the closed-form IV curves that replace the tables
     """
 
-    with open(output_filepath, 'w') as file:
+    with open(output_filepath, 'w') as file, instrument.stage("netlist", model=ibis_data.model_name,
+                                                               corner=corner) as record:
 
         header = spice_header_info(ibis_data, corner)
         file.write(header)
@@ -238,15 +275,62 @@ def create_input_model(ibis_data, corner, io_type, output_filepath):
         rlc_netlist = spice_rlc_netlist(ibis_data, corner, pin_name="IN")
         file.write(rlc_netlist)
 
-        clamps_netlist = define_pwr_and_gnd_clamps(ibis_data, corner)
+        clamps_netlist = define_pwr_and_gnd_clamps(ibis_data, corner, fit_tolerance=fit_tolerance)
         file.write(clamps_netlist)
 
         file.write(f'.ENDS\n')
+        record.add_size("output_bytes", file.tell())
 
     return 0
 
 
-def create_generic_output_model(ibis_data, corner, io_type, output_filepath):
+def solve_edge_k_params(ibis_data, corner_index, waveform_type, max_points=None, edge_tolerance=EDGE_TOLERANCE):
+    """
+    Solves, trims and compresses the k-parameters of one edge of an output model
+
+    Parameters:
+        ibis_data - a DataModel object (defined in pybis2spice.py)
+        corner_index - 1, 2 or 3 for the "Typical", "WeakSlow" and "FastStrong" corners
+        waveform_type - "Rising" or "Falling"
+        max_points - if given, the size of the adaptive time grid of the k-parameter solve
+        edge_tolerance - start and settling tolerance of the switching window, None to not trim the k-parameters
+
+    Models without enough V-T waveforms for the edge are synthesised from their [Ramp] parameters instead
+    (see pybis2spice.solve_k_params_ramp), which only needs a few samples and is not trimmed or compressed
+
+    Returns the compressed k-parameter array, [time, Ku, Kd] or [time, Kd] for open drain models
+    """
+    waveforms = ibis_data.vt_rising if waveform_type == "Rising" else ibis_data.vt_falling
+    if ibis_data.model_type.lower() == "open_drain":
+        solve = pybis2spice.solve_k_params_output_open_drain
+        min_waveforms = 1
+    else:
+        solve = pybis2spice.solve_k_params_output
+        min_waveforms = 2
+
+    if len(waveforms) < min_waveforms and pybis2spice.extract_ramp_param(ibis_data.ramp, waveform_type) is not None:
+        return pybis2spice.solve_k_params_ramp(ibis_data, corner=corner_index, waveform_type=waveform_type)
+
+    k_param = solve(ibis_data, corner=corner_index, waveform_type=waveform_type, max_points=max_points)
+    if edge_tolerance is not None:
+        k_param = pybis2spice.trim_k_param(k_param, start_tolerance=edge_tolerance, settling_tolerance=edge_tolerance)
+
+    return pybis2spice.compress_param(k_param, corner=corner_index, waveform_type=waveform_type)
+
+
+def solve_output_k_params(ibis_data, corner_index, max_points=None, edge_tolerance=EDGE_TOLERANCE):
+    """
+    Solves, trims and compresses the rising and falling k-parameters of an output model (see solve_edge_k_params)
+
+    Returns tuple of the compressed k-parameter arrays (k_param_rise, k_param_fall)
+    """
+    kr = solve_edge_k_params(ibis_data, corner_index, "Rising", max_points=max_points, edge_tolerance=edge_tolerance)
+    kf = solve_edge_k_params(ibis_data, corner_index, "Falling", max_points=max_points, edge_tolerance=edge_tolerance)
+    return kr, kf
+
+
+def create_generic_output_model(ibis_data, corner, io_type, output_filepath, max_points=None,
+                                edge_tolerance=EDGE_TOLERANCE, fit_tolerance=None):
     """
     Creates a SPICE generic subcircuit model.
     Generic models are simple and only supports a single oscillation pulse with a given frequency
@@ -255,9 +339,10 @@ def create_generic_output_model(ibis_data, corner, io_type, output_filepath):
         ibis_data - a DataModel object (defined in pybis2spice.py)
         corner - "Typical", "WeakSlow" or "FastStrong"
         io_type - "Input" or "Output"
-        k_param_rise - the k_parameter numpy array for the rising waveform (output of the solve_k_params_output method)
-        k_param_fall - the k_parameter numpy array for the falling waveform (output of the solve_k_params_output method)
         output_filepath - path of output file
+        max_points - if given, the size of the adaptive time grid of the k-parameter solve
+        edge_tolerance - start and settling tolerance of the switching window, None to not trim the k-parameters
+        fit_tolerance - if given, the error bound of the closed-form IV curves that replace the tables
 
     Returns 0 if there are no errors in the creation
     """
@@ -266,18 +351,14 @@ def create_generic_output_model(ibis_data, corner, io_type, output_filepath):
         _INDEX = convert_corner_str_to_index(corner)
         _CORNER_INDEX = _INDEX + 1
 
-        if ibis_data.model_type.lower() == "open_drain":
-            kr = pybis2spice.solve_k_params_output_open_drain(ibis_data, corner=_CORNER_INDEX, waveform_type="Rising")
-            kf = pybis2spice.solve_k_params_output_open_drain(ibis_data, corner=_CORNER_INDEX, waveform_type="Falling")
-        else:
-            kr = pybis2spice.solve_k_params_output(ibis_data, corner=_CORNER_INDEX, waveform_type="Rising")
-            kf = pybis2spice.solve_k_params_output(ibis_data, corner=_CORNER_INDEX, waveform_type="Falling")
-
-        kr = pybis2spice.compress_param(kr)
-        kf = pybis2spice.compress_param(kf)
+        (kr, kf) = solve_output_k_params(ibis_data, _CORNER_INDEX, max_points=max_points,
+                                         edge_tolerance=edge_tolerance)
 
-        with open(output_filepath, 'w') as file:
-            header = spice_header_info(ibis_data, corner)
+        with open(output_filepath, 'w') as file, instrument.stage("netlist", model=ibis_data.model_name,
+                                                                   corner=corner) as record:
+            timestep_hints = get_timestep_hints(kr, kf, timestep_param_name(ibis_data, corner))
+            header = spice_header_info(ibis_data, corner, extra_info=oscillation_info(kr, kf),
+                                       timestep_hints=timestep_hints)
             file.write(header)
 
             file.write(f'.SUBCKT {ibis_data.model_name}-{io_type}-{corner} OUT params: freq=10Meg duty=0.5\n\n')
@@ -285,10 +366,10 @@ def create_generic_output_model(ibis_data, corner, io_type, output_filepath):
             rlc_netlist = spice_rlc_netlist(ibis_data, corner, pin_name="OUT")
             file.write(rlc_netlist)
 
-            clamps_netlist = define_pwr_and_gnd_clamps(ibis_data, corner)
+            clamps_netlist = define_pwr_and_gnd_clamps(ibis_data, corner, fit_tolerance=fit_tolerance)
             file.write(clamps_netlist)
 
-            device_netlist = define_pullup_and_pulldown_devices(ibis_data, corner)
+            device_netlist = define_pullup_and_pulldown_devices(ibis_data, corner, fit_tolerance=fit_tolerance)
             file.write(device_netlist)
 
             # Calculations to define the oscillation stimulus
@@ -314,6 +395,7 @@ def create_generic_output_model(ibis_data, corner, io_type, output_filepath):
             file.write(f'V6 Kd 0 PWL({k_d_osc_str})\n\n')
 
             file.write(f'.ENDS\n')
+            record.add_size("output_bytes", file.tell())
     except:
         return_val = 1
 
@@ -352,7 +434,8 @@ def ltspice_stimulus_netlist_setup():
     return setup_str
 
 
-def create_ltspice_output_model(ibis_data, corner, io_type, output_filepath):
+def create_ltspice_output_model(ibis_data, corner, io_type, output_filepath, max_points=None,
+                                edge_tolerance=EDGE_TOLERANCE, fit_tolerance=None):
     """
     Creates a SPICE subcircuit model designed for LTSpice.
     LTSpice specific models provide extra functionality to manipulate the waveform stimulus of the output
@@ -362,6 +445,9 @@ def create_ltspice_output_model(ibis_data, corner, io_type, output_filepath):
         corner - "Typical", "WeakSlow" or "FastStrong"
         io_type - "Input" or "Output"
         output_filepath - path of output file
+        max_points - if given, the size of the adaptive time grid of the k-parameter solve
+        edge_tolerance - start and settling tolerance of the switching window, None to not trim the k-parameters
+        fit_tolerance - if given, the error bound of the closed-form IV curves that replace the tables
 
     Returns 0 if there are no errors in the creation
     """
@@ -371,17 +457,11 @@ def create_ltspice_output_model(ibis_data, corner, io_type, output_filepath):
         _INDEX = convert_corner_str_to_index(corner)
         _CORNER_INDEX = _INDEX + 1
 
-        if ibis_data.model_type.lower() == "open_drain":
-            kr = pybis2spice.solve_k_params_output_open_drain(ibis_data, corner=_CORNER_INDEX, waveform_type="Rising")
-            kf = pybis2spice.solve_k_params_output_open_drain(ibis_data, corner=_CORNER_INDEX, waveform_type="Falling")
-        else:
-            kr = pybis2spice.solve_k_params_output(ibis_data, corner=_CORNER_INDEX, waveform_type="Rising")
-            kf = pybis2spice.solve_k_params_output(ibis_data, corner=_CORNER_INDEX, waveform_type="Falling")
+        (kr, kf) = solve_output_k_params(ibis_data, _CORNER_INDEX, max_points=max_points,
+                                         edge_tolerance=edge_tolerance)
 
-        kr = pybis2spice.compress_param(kr)
-        kf = pybis2spice.compress_param(kf)
-
-        with open(output_filepath, 'w') as file:
+        with open(output_filepath, 'w') as file, instrument.stage("netlist", model=ibis_data.model_name,
+                                                                   corner=corner) as record:
 
             parameter_info = "* Note: This model may only work in LTSpice.\n"
             parameter_info += "* Stimulus Options: \n" \
@@ -392,7 +472,9 @@ def create_ltspice_output_model(ibis_data, corner, io_type, output_filepath):
                               "*\t5 - Stuck High\n" \
                               "*\t6 - Stuck Low\n" \
                               "*\t7 - HighZ (if 3-State output)\n\n"
-            header = spice_header_info(ibis_data, corner, extra_info=parameter_info)
+            parameter_info += oscillation_info(kr, kf)
+            timestep_hints = get_timestep_hints(kr, kf, timestep_param_name(ibis_data, corner))
+            header = spice_header_info(ibis_data, corner, extra_info=parameter_info, timestep_hints=timestep_hints)
             file.write(header)
 
             subcircuit = f'.SUBCKT {ibis_data.model_name}-{io_type}-{corner} '
@@ -403,10 +485,10 @@ def create_ltspice_output_model(ibis_data, corner, io_type, output_filepath):
             rlc_netlist = spice_rlc_netlist(ibis_data, corner, pin_name="OUT")
             file.write(rlc_netlist)
 
-            clamps_netlist = define_pwr_and_gnd_clamps(ibis_data, corner)
+            clamps_netlist = define_pwr_and_gnd_clamps(ibis_data, corner, fit_tolerance=fit_tolerance)
             file.write(clamps_netlist)
 
-            device_netlist = define_pullup_and_pulldown_devices(ibis_data, corner)
+            device_netlist = define_pullup_and_pulldown_devices(ibis_data, corner, fit_tolerance=fit_tolerance)
             file.write(device_netlist)
 
             stimulus_netlist = ltspice_stimulus_netlist_setup() # Look at this in more detail
@@ -480,6 +562,7 @@ def create_ltspice_output_model(ibis_data, corner, io_type, output_filepath):
                 file.write("S14 Kd 0 EN 0 SW\n")
 
             file.write(f'\n.ENDS\n')
+            record.add_size("output_bytes", file.tell())
     except:
         return_val = 1
 
@@ -557,6 +640,62 @@ def convert_iv_table_to_str(voltage, current):
     return str_val
 
 
+def convert_iv_fit_to_str(fit, node="V(DIE)"):
+    """
+    Creates the closed-form expression of a fitted IV curve for the current sources. The cubic segments are
+    selected with nested if() functions and the end currents are held outside the knots, like table()
+
+        Parameters:
+            fit - an IVFit object (defined in pybis2spice.py)
+            node - the voltage the current is a function of
+
+        Returns:
+            str_val: the expression string
+    """
+    voltage = fit.voltage
+    coefficients = fit.coefficients()
+    segment_strs = []
+    for v0, (c0, c1, c2, c3) in zip(voltage[:-1], coefficients):
+        t = f'({node}{-v0:+.12g})'
+        segment_strs.append(f'{c0:.12g}+{t}*({c1:.12g}+{t}*({c2:.12g}{c3:+.12g}*{t}))')
+
+    str_val = f'{fit.value[-1]:.12g}'
+    for i in range(len(segment_strs) - 1, -1, -1):
+        str_val = f'if({node}<{voltage[i + 1]:.12g}, {segment_strs[i]}, {str_val})'
+    str_val = f'if({node}<={voltage[0]:.12g}, {fit.value[0]:.12g}, {str_val})'
+    return f'{fit.i_scale:.12g}*sinh({str_val})'
+
+
+def define_iv_current(source_name, voltage, current, fit_tolerance=None):
+    """
+    Creates the current expression of an arbitrary source from an IV table. With a fit_tolerance the table is
+    replaced by a closed-form curve (see pybis2spice.fit_iv_curve), which is smooth and has a continuous conductance,
+    so the simulator takes fewer Newton iterations and larger timesteps. If the curve cannot be fitted within the
+    tolerance the table is kept. The fit result is reported in a comment
+
+        Parameters:
+            source_name - name of the arbitrary source, used in the comment
+            voltage - numpy voltage array
+            current - corresponding numpy current array
+            fit_tolerance - the error bound of the fit, None to always use the table
+
+        Returns:
+            tuple of the (expression, comment) strings. The comment is empty if no fit was attempted
+    """
+    if fit_tolerance is None:
+        return f'table(V(DIE), {convert_iv_table_to_str(voltage, current)})', ""
+
+    fit = pybis2spice.fit_iv_curve(voltage, current, tolerance=fit_tolerance)
+    if fit.max_error > fit_tolerance:
+        comment = f'* {source_name}: the fit error {fit.max_error:.2%} is above the {fit_tolerance:.2%} tolerance, ' \
+                  f'the table is used\n'
+        return f'table(V(DIE), {convert_iv_table_to_str(voltage, current)})', comment
+
+    comment = f'* {source_name}: fitted with {len(fit.voltage) - 1} segments, max error {fit.max_error:.2%} of the ' \
+              f'table current ({len(voltage)} table points)\n'
+    return convert_iv_fit_to_str(fit), comment
+
+
 def create_edge_waveform_pwl(time, k_param):
     """
     Creates the PWL value string for the oscillation waveform
@@ -597,7 +736,9 @@ def create_osc_waveform_pwl(t1, k1, t2, k2):
         dt = t1[i] - t1[i - 1]
         str_val = str_val + f' +{dt} {k1[i]}'
 
-    str_val = str_val + f' +{{GAP_POS}} {k1[-1]} +{t2[0]} {k2[0]}'
+    # The second edge starts straight after the gap, so that the period only depends on the edge durations and
+    # the gaps (see determine_crossover_offsets)
+    str_val = str_val + f' +{{GAP_POS}} {k1[-1]} +0.0 {k2[0]}'
 
     # Second Edge
     for i in range(1, len(t2)):
@@ -610,25 +751,244 @@ def create_osc_waveform_pwl(t1, k1, t2, k2):
     return str_val
 
 
-def determine_crossover_offsets(k_param):
+def find_crossing_times(time, values, level=0.0):
     """
-    returns the approximate crossover point between the rising and falling k_param waveforms
-        offset_neg: Time offset between beginning of k_param to crossover point
-        offset_neg: Time offset between crossover point to end of k_param
+    Finds the first time that each waveform crosses the level in either direction, linearly interpolated between the
+    samples. Vectorised over any leading axes, e.g. one waveform per corner and edge
+
+        Parameters:
+            time - numpy array [..., samples], broadcast against values
+            values - numpy array [..., samples]
+            level - the crossing level, a scalar or an array broadcast against values[..., 0]
+
+        Returns:
+            numpy array [...] of the crossing times. NaN if the waveform does not reach the level
     """
+    values = np.asarray(values, dtype='float64')
+    time = np.broadcast_to(np.asarray(time, dtype='float64'), np.shape(values))
+    if np.shape(values)[-1] < 2:
+        return np.full(np.shape(values)[:-1], np.nan)
+    d = values - np.asarray(level, dtype='float64')[..., np.newaxis]
+    d0, d1 = d[..., :-1], d[..., 1:]
+
+    # An interval holds a crossing if the sign changes or it ends on the level
+    hit = (d0 * d1 <= 0) & ((d0 != 0) | (d1 != 0))
+    found = np.any(hit, axis=-1)
+    index = np.argmax(hit, axis=-1)[..., np.newaxis]
+
+    d0, d1 = np.take_along_axis(d0, index, axis=-1), np.take_along_axis(d1, index, axis=-1)
+    t0, t1 = np.take_along_axis(time[..., :-1], index, axis=-1), np.take_along_axis(time[..., 1:], index, axis=-1)
+    fraction = np.divide(d0, d0 - d1, out=np.zeros_like(d0), where=d0 != d1)
+    crossing = (t0 + fraction * (t1 - t0))[..., 0]
+    return np.where(found, crossing, np.nan)
+
+
+def _stack_k_params(k_params):
+    """
+    returns the list of k-parameter arrays as a single [edge, sample, column] array. The shorter arrays are padded by
+    repeating their last sample, which does not add any crossings
+    """
+    num_rows = max(np.shape(k_param)[0] for k_param in k_params)
+    return np.stack([np.pad(k_param, ((0, num_rows - np.shape(k_param)[0]), (0, 0)), mode='edge')
+                     for k_param in k_params])
+
 
-    # crossover time point (x_t)
-    if np.shape(k_param)[1] == 3:
-        # Find the index of the minimum value of the difference between k_u and k_d
-        index = np.argmin(np.absolute(k_param[:, 1] - k_param[:, 2]))
-        x_t = k_param[index, 0]
+def determine_crossover_times(k_params):
+    """
+    returns a numpy array of the crossover time of each k-parameter waveform, found for all the waveforms at once.
+    The crossover is where Ku and Kd cross, or where the k-parameter of an open drain model crosses halfway between its
+    minimum and maximum, linearly interpolated between the samples.
+    If Ku and Kd do not cross, the sample where they are closest is used
+    """
+    k_stack = _stack_k_params(k_params)
+    time = k_stack[:, :, _TIME]
+    if np.shape(k_stack)[2] == 3:
+        difference = k_stack[:, :, _KU] - k_stack[:, :, _KD]
+        crossover = find_crossing_times(time, difference)
+        closest = time[np.arange(np.shape(time)[0]), np.argmin(np.absolute(difference), axis=1)]
     else:
-        # Find the index of the value at the halfway voltage point of the k-param waveform
-        index = np.argmin((np.max(k_param[:, 1]) - np.min(k_param[:, 1]))/2)
-        x_t = k_param[index, 0]
+        k = k_stack[:, :, _KD_OD]
+        crossover = find_crossing_times(time, k, level=(np.max(k, axis=1) + np.min(k, axis=1)) / 2)
+        closest = time[:, 0]  # A flat waveform has no crossover
+
+    return np.where(np.isnan(crossover), closest, crossover)
+
+
+def determine_threshold_times(k_params, levels=(0.1, 0.5, 0.9)):
+    """
+    Finds the time each k-parameter crosses each threshold level of its transition, for all the waveforms at once
+
+        Parameters:
+            k_params - list of k-parameter arrays, each [time, Ku, Kd] or [time, Kd]
+            levels - fractions of the transition from the initial to the final value
+
+        Returns:
+            numpy array [waveform, k-parameter, level] of the crossing times. NaN if the level is not crossed
+    """
+    k_stack = _stack_k_params(k_params)
+    k_values = np.moveaxis(k_stack[:, :, 1:], 1, 2)  # [waveform, k-parameter, sample]
+    k_initial, k_final = k_values[:, :, :1], k_values[:, :, -1:]
+    thresholds = k_initial + np.asarray(levels) * (k_final - k_initial)  # [waveform, k-parameter, level]
+
+    values = np.broadcast_to(k_values[:, :, np.newaxis, :], np.shape(thresholds) + (np.shape(k_values)[2],))
+    time = k_stack[:, np.newaxis, np.newaxis, :, _TIME]
+    return find_crossing_times(time, values, level=thresholds)
+
+
+def determine_crossover_offsets(k_param):
+    """
+    returns the crossover point between the rising and falling k_param waveforms (see determine_crossover_times)
+        offset_neg: Time offset between beginning of k_param to crossover point
+        offset_pos: Time offset between crossover point to end of k_param
+    """
+    x_t = determine_crossover_times([k_param])[0]
 
     # Time offset
     offset_neg = x_t - k_param[0][0]
     offset_pos = k_param[:, 0][-1] - x_t
 
     return offset_neg, offset_pos
+
+
+def get_edge_timing(ibis_data, corners=None, levels=(0.1, 0.5, 0.9), edge_tolerance=EDGE_TOLERANCE):
+    """
+    Reports the k-parameter timing of each corner and edge of an output model. The crossovers and threshold crossings
+    of all the corners and edges are found in a single vectorised pass
+
+        Parameters:
+            ibis_data - a DataModel object (defined in pybis2spice.py)
+            corners - list of corners (default all corners)
+            levels - threshold levels as fractions of the k-parameter transition
+            edge_tolerance - start and settling tolerance of the switching window, None to not trim the k-parameters
+
+        Returns:
+            list of dictionaries, one per corner and edge, with the crossover time, the offsets used for the
+            oscillation gaps and the threshold crossing times of each k-parameter
+    """
+    if corners is None:
+        corners = ["Typical", "WeakSlow", "FastStrong"]
+    names = ["kd"] if ibis_data.model_type.lower() == "open_drain" else ["ku", "kd"]
+
+    items = []
+    k_params = []
+    for corner in corners:
+        k_edges = solve_output_k_params(ibis_data, convert_corner_str_to_index(corner) + 1,
+                                        edge_tolerance=edge_tolerance)
+        for waveform_type, k_param in zip(["Rising", "Falling"], k_edges):
+            items.append((corner, waveform_type))
+            k_params.append(k_param)
+
+    crossover = determine_crossover_times(k_params)
+    thresholds = determine_threshold_times(k_params, levels)
+
+    records = []
+    for n, ((corner, waveform_type), k_param) in enumerate(zip(items, k_params)):
+        record = {"corner": corner,
+                  "waveform_type": waveform_type,
+                  "crossover": float(crossover[n]),
+                  "offset_neg": float(crossover[n] - k_param[0, _TIME]),
+                  "offset_pos": float(k_param[-1, _TIME] - crossover[n]),
+                  "levels": list(levels)}
+        for m, name in enumerate(names):
+            record[name] = [None if np.isnan(t) else float(t) for t in thresholds[n, m]]
+        records.append(record)
+    return records
+
+
+def get_minimum_period(k_param_rise, k_param_fall):
+    """
+    returns the minimum oscillation period of the output model in seconds, which is the sum of the rising and falling
+    k-parameter edge durations. The oscillation stimulus is distorted at shorter periods as the gaps are clipped
+    """
+    return (k_param_rise[-1, _TIME] - k_param_rise[0, _TIME]) + (k_param_fall[-1, _TIME] - k_param_fall[0, _TIME])
+
+
+def oscillation_info(k_param_rise, k_param_fall):
+    """
+    returns the header comment with the minimum oscillation period and maximum frequency of the output model
+    """
+    min_period = get_minimum_period(k_param_rise, k_param_fall)
+    if min_period <= 0:
+        return ''
+    return (f'* Minimum Oscillation Period (s): {min_period:.4g}\n'
+            f'* Maximum Oscillation Frequency (Hz): {1 / min_period:.4g}\n*\n')
+
+
+def timestep_param_name(ibis_data, corner):
+    """
+    returns the name of the parameter that holds the recommended maximum timestep of the model and corner.
+    Characters that are not valid in a parameter name are replaced with underscores
+    """
+    return re.sub(r'\W', '_', f'TMAX_{ibis_data.model_name}_{corner}')
+
+
+def get_timestep_hints(k_param_rise, k_param_fall, param_name="TMAX", steps_per_edge=_STEPS_PER_EDGE):
+    """
+    Derives the transient simulation timestep hints of an output model from its compressed k-parameters. The
+    edge duration is the 10% to 90% transition time of the fastest k-parameter, or the full duration of the
+    k-parameter waveform if no k-parameter transitions. The recommended maximum timestep resolves the fastest
+    edge with steps_per_edge steps. The simulator already steps to each PWL breakpoint, so the breakpoint
+    spacing is reported but does not limit the timestep
+
+        Parameters:
+            k_param_rise - the rising edge k-parameters [time, Ku, Kd] or [time, Kd]
+            k_param_fall - the falling edge k-parameters
+            param_name - name of the parameter that holds the maximum timestep in the netlist
+            steps_per_edge - number of timesteps across the fastest edge
+
+        Returns:
+            dictionary with the "min_edge_duration", "min_breakpoint_spacing" and "max_timestep" in seconds and
+            the "param_name". None if neither edge has a duration
+    """
+    k_params = [k_param_rise, k_param_fall]
+    thresholds = determine_threshold_times(k_params, levels=(0.1, 0.9))
+    durations = np.absolute(thresholds[:, :, 1] - thresholds[:, :, 0]).ravel()
+    durations = durations[durations > 0]
+    if durations.size == 0:
+        durations = np.asarray([k_param[-1, _TIME] - k_param[0, _TIME] for k_param in k_params])
+        durations = durations[durations > 0]
+        if durations.size == 0:
+            return None
+
+    spacing = np.concatenate([np.diff(k_param[:, _TIME]) for k_param in k_params])
+    spacing = spacing[spacing > 0]
+
+    min_edge_duration = float(np.min(durations))
+    return {"min_edge_duration": min_edge_duration,
+            "min_breakpoint_spacing": float(np.min(spacing)) if spacing.size else None,
+            "max_timestep": min_edge_duration / steps_per_edge,
+            "param_name": param_name}
+
+
+def get_model_timestep_hints(ibis_data, corner, max_points=None, edge_tolerance=EDGE_TOLERANCE):
+    """
+    Solves the k-parameters of an output model the same way as the subcircuit writers and returns its timestep
+    hints (see get_timestep_hints), for example to set up the transient analysis of a testbench
+
+        Parameters:
+            ibis_data - a DataModel object (defined in pybis2spice.py)
+            corner - "Typical", "WeakSlow" or "FastStrong"
+            max_points - if given, the size of the adaptive time grid of the k-parameter solve
+            edge_tolerance - start and settling tolerance of the switching window, None to not trim the k-parameters
+
+        Returns:
+            the timestep hints dictionary, None if neither edge has a duration
+    """
+    (kr, kf) = solve_output_k_params(ibis_data, convert_corner_str_to_index(corner) + 1, max_points=max_points,
+                                     edge_tolerance=edge_tolerance)
+    return get_timestep_hints(kr, kf, timestep_param_name(ibis_data, corner))
+
+
+def timestep_info(timestep_hints):
+    """
+    returns the header comment with the timestep hints of the output model, empty if there are no hints
+    """
+    if timestep_hints is None:
+        return ''
+    st = f'* Minimum Edge Duration (s): {timestep_hints["min_edge_duration"]:.4g} (10-90% of the k-parameters)\n'
+    if timestep_hints["min_breakpoint_spacing"] is not None:
+        st += f'* Minimum PWL Breakpoint Spacing (s): {timestep_hints["min_breakpoint_spacing"]:.4g}\n'
+    st += f'* Recommended Maximum Timestep (s): {timestep_hints["max_timestep"]:.4g}, defined as ' \
+          f'{timestep_hints["param_name"]}\n'
+    st += f'*\te.g. .tran 0 <tstop> 0 {{{timestep_hints["param_name"]}}}\n*\n'
+    return st
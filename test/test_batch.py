@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from pybis2spice import batch
+from pybis2spice import instrument
+from pybis2spice import pybis2spice
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_run_batch(self):
+        ibis_filepaths = ['ibis/hct1g08.ibs', 'ibis/bushold.ibs', 'ibis/bird57ex.ibs']
+        with tempfile.TemporaryDirectory() as directory:
+            report_filepath = os.path.join(directory, 'report.ndjson')
+            with batch.ReportWriter(report_filepath) as report:
+                summary = batch.run_batch(ibis_filepaths, directory, report, corners=["Typical", "FastStrong"])
+            records = list(batch.read_report(report_filepath))
+
+            self.assertEqual(report.count, len(records))
+            self.assertEqual(records[-1], json.loads(json.dumps(summary)))
+            self.assertEqual(summary["files"], 3)
+            self.assertEqual(summary["failures"], 0)
+
+            file_records = [record for record in records if record["record"] == "file"]
+            self.assertEqual(len(file_records), 3)
+            self.assertEqual(file_records[0]["input_hash"], pybis2spice.hash_file('ibis/hct1g08.ibs'))
+            self.assertIn("parse", file_records[0]["stages"])
+
+            # The I/O_open_sink model in bird57ex is not supported
+            model_records = {record["model"]: record for record in records if record["record"] == "model"}
+            self.assertEqual(len(model_records), summary["models"])
+            self.assertTrue(model_records["BIRD57ex"]["warnings"])
+
+            conversion_records = [record for record in records if record["record"] == "conversion"]
+            self.assertEqual(len(conversion_records), summary["conversions"])
+            output_records = [record for record in conversion_records if record["model"] == "HCT1G08_OUTN_50"]
+            self.assertEqual([record["corner"] for record in output_records], ["Typical", "FastStrong"])
+            for record in output_records:
+                self.assertEqual(record["component"], "74HCT1G08_GW")
+                self.assertEqual(record["status"], "ok")
+                self.assertEqual(record["output_bytes"], os.path.getsize(record["output_file"]))
+                self.assertEqual(set(record["stages"]), {"conversion", "solve_k_params", "trim", "compress", "netlist"})
+                self.assertEqual(record["table_sizes"]["iv_pulldown"], 100)
+                self.assertEqual([k_points["waveform_type"] for k_points in record["k_points"]],
+                                 ["Rising", "Falling"])
+                for k_points in record["k_points"]:
+                    self.assertLessEqual(k_points["after"], k_points["before"])
+
+    def test_run_batch_validate(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report_file = io.StringIO()
+            summary = batch.run_batch(['ibis/hct1g08.ibs'], directory, batch.ReportWriter(report_file),
+                                      corners=["Typical"], validate=True)
+            records = [json.loads(line) for line in report_file.getvalue().splitlines()]
+
+        # Only the output model is validated
+        validation_records = [record for record in records if record["record"] == "validation"]
+        self.assertEqual(summary["validations"], 1)
+        self.assertEqual(len(validation_records), 1)
+        record = validation_records[0]
+        self.assertEqual(record["model"], "HCT1G08_OUTN_50")
+        self.assertEqual(len(record["waveforms"]), 4)
+        self.assertIn("simulate", record["stages"])
+        self.assertLess(record["max_relative_error"], 0.1)
+        self.assertEqual(record["warnings"], [])
+
+    def test_validate_item_skipped(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        # The rising edge is synthesised from the [Ramp], there are no rising fixtures to simulate
+        record = batch.validate_item(ibis_data.replace(vt_rising=()), "hash", ["Typical"])
+
+        self.assertEqual(record["record"], "validation")
+        self.assertEqual(record["waveforms"], [])
+        self.assertIsNone(record["max_relative_error"])
+        self.assertEqual(len(record["warnings"]), 1)
+        self.assertTrue(record["warnings"][0].startswith("validation skipped"))
+
+    def test_convert_item_nested_profiler(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        report_file = io.StringIO()
+        report = batch.ReportWriter(report_file)
+
+        # The records of the per-item profiler are passed on to the enclosing profiler
+        with tempfile.TemporaryDirectory() as directory, instrument.Profiler() as profiler:
+            output_filepath = os.path.join(directory, 'model.sub')
+            report.write(batch.convert_item(ibis_data, "hash", "Output", "Generic", "Typical", output_filepath))
+        report.close()
+
+        self.assertEqual(profiler.summary()["conversion"]["count"], 1)
+        record = json.loads(report_file.getvalue())
+        self.assertEqual(record["input_hash"], "hash")
+        self.assertEqual(record["subcircuit_type"], "Generic")
+        self.assertEqual(record["warnings"], [])
+        self.assertEqual(record["iv_fits"], [])
+
+    def test_convert_item_fit_iv(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        with tempfile.TemporaryDirectory() as directory:
+            output_filepath = os.path.join(directory, 'model.sub')
+            record = batch.convert_item(ibis_data, "hash", "Output", "LTSpice", "Typical", output_filepath,
+                                        fit_tolerance=0.01)
+
+        # The model has no clamps, the pullup and pulldown are fitted
+        self.assertEqual(record["status"], "ok")
+        self.assertEqual(len(record["iv_fits"]), 2)
+        for iv_fit in record["iv_fits"]:
+            self.assertLessEqual(iv_fit["max_error"], 0.01)
+            self.assertLess(iv_fit["segments"], iv_fit["table"])
+
+    def test_convert_item_k_points_ramp(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        # Without the rising waveforms the rising edge is synthesised from the [Ramp] and is not compressed
+        ibis_data = ibis_data.replace(vt_rising=())
+        with tempfile.TemporaryDirectory() as directory, instrument.Profiler() as profiler:
+            output_filepath = os.path.join(directory, 'model.sub')
+            record = batch.convert_item(ibis_data, "hash", "Output", "LTSpice", "Typical", output_filepath)
+
+        self.assertEqual(record["status"], "ok")
+        rising, falling = record["k_points"]
+        self.assertEqual((rising["waveform_type"], rising["source"]), ("Rising", "ramp"))
+        self.assertEqual(rising["before"], pybis2spice._RAMP_POINTS)
+        self.assertEqual(rising["after"], pybis2spice._RAMP_POINTS)
+
+        compress_records = [stage for stage in profiler.records if stage.name == "compress"]
+        self.assertEqual(len(compress_records), 1)
+        self.assertEqual((falling["waveform_type"], falling["source"]), ("Falling", "waveforms"))
+        self.assertEqual(falling["before"], compress_records[0].sizes["k_param"][0])
+        self.assertEqual(falling["after"], compress_records[0].sizes["k_comp"][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
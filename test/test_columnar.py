@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from pybis2spice import columnar
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+
+
+class TestColumnar(unittest.TestCase):
+
+    def assert_data_models_equal(self, stored_data, ibis_data):
+        self.assertIsInstance(stored_data, pybis2spice.DataModel)
+        self.assertEqual(stored_data.model_type, ibis_data.model_type)
+        self.assertEqual(stored_data.file_name, ibis_data.file_name)
+        for name in ["r_pkg", "l_pkg", "c_pkg", "c_comp", "v_range", "temp_range", "pullup_ref", "pulldown_ref",
+                     "pwr_clamp_ref", "gnd_clamp_ref"]:
+            self.assertEqual(str(getattr(stored_data, name)), str(getattr(ibis_data, name)), name)
+        for name in ["iv_pullup", "iv_pulldown", "iv_pwr_clamp", "iv_gnd_clamp"]:
+            stored_table = getattr(stored_data, name)
+            if getattr(ibis_data, name) is None:
+                self.assertIsNone(stored_table)
+            else:
+                np.testing.assert_array_equal(stored_table, getattr(ibis_data, name))
+                self.assertFalse(stored_table.flags.writeable)
+                self.assertEqual(stored_table.ctypes.data % 64, 0)
+        for name in ["vt_rising", "vt_falling"]:
+            self.assertEqual(len(getattr(stored_data, name)), len(getattr(ibis_data, name)))
+            for stored_waveform, waveform in zip(getattr(stored_data, name), getattr(ibis_data, name)):
+                np.testing.assert_array_equal(stored_waveform.data, waveform.data)
+                np.testing.assert_array_equal(stored_waveform.v_fix, waveform.v_fix)
+                self.assertEqual(stored_waveform.r_fix, waveform.r_fix)
+                self.assertIsInstance(stored_waveform.data, np.memmap)
+
+    def test_round_trip(self):
+        for ibis_filepath in ['ibis/hct1g08.ibs', 'ibis/sample1.ibs', 'ibis/bushold.ibs']:
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+            with tempfile.TemporaryDirectory() as directory:
+                filepath = columnar.export_ibis_file(ibis_filepath, os.path.join(directory, 'model.ibsc'))
+                store = columnar.ColumnarFile(filepath)
+
+                self.assertEqual(pybis2spice.list_components(store), list(ibis.component_names))
+                for model_name in pybis2spice.list_models(store):
+                    component_name = store.find_component_for_model(model_name)
+                    ibis_data = pybis2spice.DataModel(ibis, model_name, component_name)
+                    self.assert_data_models_equal(store.get_data_model(model_name, component_name), ibis_data)
+                del store
+
+    def test_identical_netlist(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, 'hct1g08.ibsc')
+            self.assertEqual(columnar.export_ibis(ibis, filepath), [])
+            stored_data = columnar.ColumnarFile(filepath).get_data_model('HCT1G08_OUTN_50', '74HCT1G08_GW')
+            self.assertEqual(stored_data.ramp.dv_dt_r[0], (1.88, 5.2612e-10))
+
+            netlists = []
+            for n, data in enumerate([ibis_data, stored_data]):
+                output_filepath = os.path.join(directory, f'{n}.sub')
+                self.assertEqual(subcircuit.generate_spice_model("Output", "LTSpice", data, "Typical",
+                                                                 output_filepath), 0)
+                with open(output_filepath) as file:
+                    netlists.append(file.read())
+            self.assertEqual(netlists[0], netlists[1])
+
+            with self.assertRaises(AttributeError):
+                stored_data.iv_pulldown = None
+            with self.assertRaises(pybis2spice.ModelLoadError):
+                columnar.ColumnarFile(filepath).get_data_model('NOT_A_MODEL', '74HCT1G08_GW')
+
+    def test_format_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, 'bad.ibsc')
+            with open(filepath, 'wb') as file:
+                file.write(b"[IBIS Ver] 5.0\n" * 4)
+            with self.assertRaises(columnar.ColumnarFormatError):
+                columnar.ColumnarFile(filepath)
+
+            ibis = pybis2spice.get_ibis_model_ecdtools('ibis/bushold.ibs')
+            columnar.export_ibis(ibis, filepath)
+            with open(filepath, 'r+b') as file:
+                file.seek(8)
+                file.write((columnar.FORMAT_VERSION + 1).to_bytes(4, "little"))
+            with self.assertRaises(columnar.ColumnarFormatError):
+                columnar.ColumnarFile(filepath)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import concurrent.futures
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+
+
+class TestConcurrency(unittest.TestCase):
+
+    def test_parallel_conversions_deterministic(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        items = [(subcircuit_type, corner) for subcircuit_type in ["LTSpice", "Generic"]
+                 for corner in ["WeakSlow", "Typical", "FastStrong"]]
+
+        def convert(directory, n, subcircuit_type, corner):
+            output_filepath = os.path.join(directory, f'{n}-{subcircuit_type}-{corner}.sub')
+            ret = subcircuit.generate_spice_model("Output", subcircuit_type, ibis_data, corner, output_filepath)
+            self.assertEqual(ret, 0)
+            with open(output_filepath) as file:
+                return (subcircuit_type, corner), file.read()
+
+        with tempfile.TemporaryDirectory() as directory:
+            expected = dict(convert(directory, "serial", subcircuit_type, corner) for subcircuit_type, corner in items)
+
+            # The same DataModel is shared by all the threads
+            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [executor.submit(convert, directory, n, subcircuit_type, corner)
+                           for n in range(8) for subcircuit_type, corner in items]
+                results = [future.result() for future in futures]
+
+        self.assertEqual(len(results), 8 * len(items))
+        for key, netlist in results:
+            self.assertEqual(netlist, expected[key])
+
+    def test_parallel_data_models(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/sample1.ibs')
+        model_names = pybis2spice.list_models(ibis)
+        component_name = pybis2spice.list_components(ibis)[0]
+
+        def build(model_name):
+            try:
+                ibis_data = pybis2spice.DataModel(ibis, model_name, component_name)
+            except pybis2spice.ModelLoadError:
+                return model_name, None
+            return model_name, ibis_data.iv_pulldown
+
+        expected = dict(build(model_name) for model_name in model_names)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(build, model_names * 4))
+
+        for model_name, iv_pulldown in results:
+            if expected[model_name] is None:
+                self.assertIsNone(iv_pulldown)
+            else:
+                np.testing.assert_array_equal(iv_pulldown, expected[model_name])
+
+
+class TestDataModelErrors(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        cls.ibis_data = pybis2spice.DataModel(cls.ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+
+    def test_model_load_error(self):
+        with self.assertRaises(pybis2spice.ModelLoadError):
+            pybis2spice.DataModel(self.ibis, 'NOT_A_MODEL', '74HCT1G08_GW')
+        with self.assertRaises(pybis2spice.ModelLoadError):
+            pybis2spice.DataModel(None, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+
+    def test_waveform_type_error(self):
+        with self.assertRaises(pybis2spice.WaveformTypeError):
+            pybis2spice.solve_k_params_output(self.ibis_data, corner=1, waveform_type="rising")
+        with self.assertRaises(ValueError):
+            pybis2spice.solve_k_params_output_open_drain(self.ibis_data, corner=1, waveform_type="Both")
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.ibis_data.c_comp = None
+        with self.assertRaises(AttributeError):
+            del self.ibis_data.iv_pullup
+        with self.assertRaises(AttributeError):
+            self.ibis_data.vt_rising[0].r_fix = 1.0
+        with self.assertRaises(ValueError):
+            self.ibis_data.iv_pullup[0, 1] = 0.0
+        with self.assertRaises(ValueError):
+            self.ibis_data.vt_rising[0].data[0, 1] = 0.0
+
+    def test_replace(self):
+        c_comp = np.asarray([1e-12, 1e-12, 1e-12])
+        ibis_data = self.ibis_data.replace(c_comp=c_comp, iv_pullup=None)
+        np.testing.assert_array_equal(ibis_data.c_comp, c_comp)
+        self.assertIsNone(ibis_data.iv_pullup)
+        self.assertFalse(ibis_data.c_comp.flags.writeable)
+        self.assertTrue(c_comp.flags.writeable)
+
+        # The original DataModel is unchanged
+        self.assertIsNotNone(self.ibis_data.iv_pullup)
+        self.assertIs(ibis_data.iv_pulldown, self.ibis_data.iv_pulldown)
+        with self.assertRaises(AttributeError):
+            ibis_data.c_comp = c_comp
+        with self.assertRaises(AttributeError):
+            self.ibis_data.replace(not_an_attribute=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from pybis2spice import generator
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+
+
+class TestGenerator(unittest.TestCase):
+
+    def test_scaled_sizes(self):
+        sizes = generator.scaled_sizes(10)
+        self.assertEqual(sizes["iv_points"], generator.DEFAULT_SIZES["iv_points"] * 10)
+        self.assertEqual(sizes["waveform_points"], generator.DEFAULT_SIZES["waveform_points"] * 10)
+        self.assertEqual(sizes["models"], generator.DEFAULT_SIZES["models"])
+
+        sizes = generator.scaled_sizes(100, "models")
+        self.assertEqual(sizes["models"], generator.DEFAULT_SIZES["models"] * 100)
+        self.assertEqual(sizes["iv_points"], generator.DEFAULT_SIZES["iv_points"])
+
+    def test_generate_ibis_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ibis_filepath = os.path.join(directory, 'synthetic.ibs')
+            model_names = generator.generate_ibis_file(ibis_filepath, components=3, pins=12, models=5,
+                                                       iv_points=40, waveform_points=60)
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+
+            self.assertEqual(len(pybis2spice.list_components(ibis)), 3)
+            self.assertEqual(pybis2spice.list_models(ibis), model_names)
+            self.assertEqual(len(ibis.components[0].pins), 12)
+
+            for model_name, model_type in zip(model_names, generator.MODEL_TYPES):
+                ibis_data = pybis2spice.DataModel(ibis, model_name, 'SYN_COMPONENT_0')
+                self.assertEqual(ibis_data.model_type, model_type)
+                self.assertEqual(np.shape(ibis_data.iv_gnd_clamp), (40, 4))
+                if model_type == "Input":
+                    self.assertEqual(ibis_data.vt_rising, ())
+                    continue
+
+                self.assertEqual(np.shape(ibis_data.iv_pulldown), (40, 4))
+                self.assertEqual(np.shape(ibis_data.vt_rising[0].data), (60, 4))
+                self.assertEqual(np.shape(ibis_data.vt_falling[0].data), (60, 4))
+
+                io_type = "Output"
+                output_filepath = os.path.join(directory, 'model.sub')
+                for corner in ["Typical", "WeakSlow", "FastStrong"]:
+                    ret = subcircuit.generate_spice_model(io_type, "LTSpice", ibis_data, corner, output_filepath)
+                    self.assertEqual(ret, 0)
+                ret = subcircuit.generate_spice_model(io_type, "Generic", ibis_data, "Typical", output_filepath,
+                                                      max_points=30)
+                self.assertEqual(ret, 0)
+
+            # The waveforms should switch the push-pull buffer fully between its pulldown and pullup states
+            ibis_data = pybis2spice.DataModel(ibis, 'SYN_MODEL_1', 'SYN_COMPONENT_0')
+            k_param = pybis2spice.solve_k_params_output(ibis_data, corner=1, waveform_type="Rising")
+            np.testing.assert_allclose(k_param[0, 1:], [0, 1], atol=0.01)
+            np.testing.assert_allclose(k_param[-1, 1:], [1, 0], atol=0.01)
+
+    def test_edge_trimming(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        (kr, kf) = subcircuit.solve_output_k_params(ibis_data, 1)
+        (kr_full, kf_full) = subcircuit.solve_output_k_params(ibis_data, 1, edge_tolerance=None)
+        self.assertLess(len(kr), len(kr_full))
+        self.assertLess(subcircuit.get_minimum_period(kr, kf), 0.6 * subcircuit.get_minimum_period(kr_full, kf_full))
+        np.testing.assert_allclose(kr[-1, 1:], kr_full[-1, 1:], atol=0.01)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output_filepath = os.path.join(directory, 'model.sub')
+            self.assertEqual(subcircuit.generate_spice_model("Output", "Generic", ibis_data, "Typical",
+                                                             output_filepath), 0)
+            with open(output_filepath) as file:
+                self.assertIn(f'* Minimum Oscillation Period (s): {subcircuit.get_minimum_period(kr, kf):.4g}',
+                              file.read())
+
+    def test_na_pattern(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ibis_filepath = os.path.join(directory, 'synthetic.ibs')
+            generator.generate_ibis_file(ibis_filepath, models=1, iv_points=20, waveform_points=20,
+                                         na_pattern="columns")
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+            ibis_data = pybis2spice.DataModel(ibis, 'SYN_MODEL_0', 'SYN_COMPONENT_0', condition_tables=False)
+            self.assertTrue(np.all(np.isnan(ibis_data.iv_pullup[:, 2:])))
+            self.assertFalse(np.any(np.isnan(ibis_data.iv_pullup[:, :2])))
+
+            # The conditioned tables fill the NA corners from typical
+            ibis_data = pybis2spice.DataModel(ibis, 'SYN_MODEL_0', 'SYN_COMPONENT_0')
+            np.testing.assert_equal(ibis_data.iv_pullup[:, 2], ibis_data.iv_pullup[:, 1])
+            self.assertIn("iv_pullup: 20 NA min currents filled from typical", ibis_data.iv_warnings)
+
+            generator.generate_ibis_file(ibis_filepath, models=1, iv_points=50, waveform_points=20,
+                                         na_pattern="random", na_fraction=0.5, seed=1)
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+            ibis_data = pybis2spice.DataModel(ibis, 'SYN_MODEL_0', 'SYN_COMPONENT_0', condition_tables=False)
+            na_count = np.sum(np.isnan(ibis_data.iv_pullup[:, 2:]))
+            self.assertTrue(0 < na_count < 100)
+
+    def test_ramp_only(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ibis_filepath = os.path.join(directory, 'synthetic.ibs')
+            generator.generate_ibis_file(ibis_filepath, models=1, iv_points=20, waveform_points=20, waveforms=False)
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+            ibis_data = pybis2spice.DataModel(ibis, 'SYN_MODEL_0', 'SYN_COMPONENT_0')
+            self.assertEqual(ibis_data.vt_rising, ())
+            self.assertIsNotNone(ibis_data.ramp)
+
+            # The output model is synthesised from the ramp with a few PWL points
+            k_param = subcircuit.solve_edge_k_params(ibis_data, 1, "Rising")
+            self.assertEqual(np.shape(k_param), (pybis2spice._RAMP_POINTS, 3))
+            output_filepath = os.path.join(directory, 'model.sub')
+            for subcircuit_type in ["LTSpice", "Generic"]:
+                ret = subcircuit.generate_spice_model("Output", subcircuit_type, ibis_data, "Typical", output_filepath)
+                self.assertEqual(ret, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+from pybis2spice import instrument
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+
+
+class TestInstrument(unittest.TestCase):
+
+    def test_stage_disabled(self):
+        # Without an active profiler, the shared do-nothing stage should be returned
+        self.assertIsNone(instrument.get_active_profiler())
+        with instrument.stage("parse") as record:
+            record.add_size("table", np.zeros([10, 4]))
+        self.assertIs(instrument.stage("compress"), instrument.stage("netlist"))
+
+    def test_profiler_records(self):
+        with instrument.Profiler() as profiler:
+            with instrument.stage("outer", model="test") as record:
+                record.add_size("table", np.zeros([10, 4]))
+                record.add_size("count", 3)
+                with instrument.stage("inner"):
+                    pass
+        self.assertIsNone(instrument.get_active_profiler())
+
+        # Stages are recorded in the order they finish
+        self.assertEqual([record.name for record in profiler.records], ["inner", "outer"])
+        self.assertEqual(profiler.records[0].parent, "outer")
+        self.assertEqual(profiler.records[1].labels, {"model": "test"})
+        self.assertEqual(profiler.records[1].sizes, {"table": [10, 4], "count": 3})
+        self.assertGreaterEqual(profiler.records[1].wall_time, profiler.records[0].wall_time)
+        self.assertEqual(profiler.summary()["outer"]["count"], 1)
+
+    def test_profiler_callback(self):
+        names = []
+        with instrument.Profiler(callback=lambda record: names.append(record.name)):
+            with instrument.stage("compress"):
+                pass
+        self.assertEqual(names, ["compress"])
+
+    def test_profile_conversion(self):
+        with instrument.Profiler() as profiler:
+            ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+            ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+            with tempfile.TemporaryDirectory() as directory:
+                output_filepath = os.path.join(directory, 'model.sub')
+                ret = subcircuit.generate_spice_model("Output", "LTSpice", ibis_data, "Typical", output_filepath)
+                output_size = os.path.getsize(output_filepath)
+
+                json_filepath = os.path.join(directory, 'profile.json')
+                profiler.dump_json(json_filepath)
+                with open(json_filepath) as file:
+                    profile = json.load(file)
+
+        self.assertEqual(ret, 0)
+        summary = profiler.summary()
+        self.assertEqual(summary["parse"]["count"], 1)
+        self.assertEqual(summary["data_model"]["count"], 1)
+        self.assertEqual(summary["solve_k_params"]["count"], 2)  # Rising and Falling
+        self.assertEqual(summary["compress"]["count"], 2)
+        self.assertEqual(summary["netlist"]["count"], 1)
+        self.assertEqual(summary["conversion"]["count"], 1)
+
+        netlist_record = [record for record in profiler.records if record.name == "netlist"][0]
+        self.assertEqual(netlist_record.parent, "conversion")
+        self.assertEqual(netlist_record.sizes["output_bytes"], output_size)
+
+        self.assertEqual(len(profile["records"]), len(profiler.records))
+        self.assertEqual(set(profile["summary"]), set(summary))
+
+
+class TestMemoryProfile(unittest.TestCase):
+    """
+    Memory ceilings for the conversion pipeline. The ceilings are about twice the measured peaks,
+    a failure means that a change has considerably increased the memory used by a stage
+    """
+
+    def profile_file(self, ibis_filepath, subcircuit_type="LTSpice"):
+        with instrument.Profiler(trace_memory=True, top_allocations=0) as profiler:
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+            component_name = ibis.component_names[0]
+            with tempfile.TemporaryDirectory() as directory:
+                output_filepath = os.path.join(directory, 'model.sub')
+                for model_name in pybis2spice.list_models(ibis):
+                    ibis_data = pybis2spice.DataModel(ibis, model_name, component_name)
+                    for corner in ["Typical", "WeakSlow", "FastStrong"]:
+                        subcircuit.generate_spice_model("Output", subcircuit_type, ibis_data, corner,
+                                                        output_filepath)
+        self.assertFalse(tracemalloc.is_tracing())
+        return profiler.summary()
+
+    def assert_ceilings(self, summary, ceilings):
+        for stage_name, ceiling in ceilings.items():
+            self.assertIn("memory_peak", summary[stage_name])
+            self.assertLess(summary[stage_name]["memory_peak"], ceiling, f"{stage_name} memory ceiling exceeded")
+
+    def test_nested_peak(self):
+        with instrument.Profiler(trace_memory=True, top_allocations=5) as profiler:
+            with instrument.stage("outer"):
+                with instrument.stage("inner"):
+                    data = np.ones(1000000)
+                    del data
+                kept = np.ones(100000)
+
+        inner_record, outer_record = profiler.records
+        # The 8MB array is freed within the inner stage, but still counts towards the peak of the outer stage
+        self.assertGreaterEqual(inner_record.memory_peak, 8000000)
+        self.assertLess(inner_record.memory_delta, 100000)
+        self.assertGreaterEqual(outer_record.memory_peak, inner_record.memory_peak)
+        self.assertGreaterEqual(outer_record.memory_delta, 800000)
+        self.assertGreaterEqual(outer_record.top_allocations[0]["size_diff"], 800000)
+        self.assertFalse(any("instrument.py" in allocation["site"] for allocation in outer_record.top_allocations))
+        self.assertIn("outer", profiler.memory_report())
+        del kept
+
+    def test_memory_ceiling_hct1g08(self):
+        summary = self.profile_file('ibis/hct1g08.ibs')
+        self.assert_ceilings(summary, {"parse": 5e6, "data_model": 1e5, "solve_k_params": 3e6, "compress": 1e5,
+                                       "netlist": 3e5, "conversion": 3e6})
+
+    def test_memory_ceiling_sample1(self):
+        summary = self.profile_file('ibis/sample1.ibs', "Generic")
+        self.assert_ceilings(summary, {"parse": 30e6, "data_model": 1e5, "solve_k_params": 3e6, "compress": 1e5,
+                                       "netlist": 3e5, "conversion": 3e6})
+
+    def test_memory_ceiling_bushold(self):
+        summary = self.profile_file('ibis/bushold.ibs')
+        self.assert_ceilings(summary, {"parse": 5e5, "data_model": 1e5})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from pybis2spice import plot
+
+
+class TestPlot(unittest.TestCase):
+
+    def setUp(self):
+        # A noisy waveform with a single sample spike that must survive the decimation
+        rng = np.random.default_rng(0)
+        self.x = np.linspace(0, 1e-6, 100001)
+        self.y = np.tanh((self.x - 0.5e-6) * 2e7) + rng.normal(0, 0.01, len(self.x))
+        self.y[12345] = 5.0
+
+    def tearDown(self):
+        plt.close("all")
+
+    def test_decimate_min_max(self):
+        x_dec, y_dec = plot.decimate_min_max(self.x, self.y, 2000)
+        self.assertLessEqual(len(x_dec), 2002)
+        self.assertEqual(x_dec[0], self.x[0])
+        self.assertEqual(x_dec[-1], self.x[-1])
+        self.assertTrue(np.all(np.diff(x_dec) > 0))
+
+        # The envelope is preserved
+        self.assertEqual(np.max(y_dec), np.max(self.y))
+        self.assertEqual(np.min(y_dec), np.min(self.y))
+        self.assertIn(self.x[12345], x_dec)
+
+        # Short series are returned unchanged
+        x_short, y_short = plot.decimate_min_max(self.x[:100], self.y[:100], 2000)
+        np.testing.assert_array_equal(y_short, self.y[:100])
+
+    def test_decimate_visible_range(self):
+        x_min, x_max = self.x[40000], self.x[40500]
+        x_dec, y_dec = plot.decimate_min_max(self.x, self.y, 2000, x_min, x_max)
+        # All the visible samples are kept, plus one either side of the range
+        np.testing.assert_array_equal(x_dec, self.x[39999:40502])
+
+    def test_plot_single_decimated(self):
+        data = np.column_stack((self.x, self.y, self.y * 0.9, self.y * 1.1))
+        fig = plot.plot_single(data, data_labels=['Typ', 'Min', 'Max'], xlabel='Time (s)', ylabel='Voltage (V)',
+                               title='test', marker=".")
+        ax = fig.axes[0]
+        lines = ax.get_lines()
+        self.assertEqual(len(lines), 3)
+        self.assertLessEqual(len(lines[0].get_xdata()), 2002)
+        self.assertEqual(lines[0].get_label(), 'Typ')
+        self.assertEqual(np.max(lines[0].get_ydata()), 5.0)
+
+        # Zooming in re-decimates the lines to the visible range with full detail
+        ax.set_xlim(self.x[40000], self.x[40500])
+        np.testing.assert_array_equal(lines[0].get_xdata(), self.x[39999:40502])
+
+        fig = plot.plot_single(data, data_labels=['Typ', 'Min', 'Max'], xlabel='Time (s)', ylabel='Voltage (V)',
+                               title='test', max_points=None)
+        self.assertEqual(len(fig.axes[0].get_lines()[0].get_xdata()), len(self.x))
+
+
+if __name__ == '__main__':
+    unittest.main()
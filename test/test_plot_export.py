@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from pybis2spice import plot_export
+from pybis2spice import pybis2spice
+
+
+class TestPlotExport(unittest.TestCase):
+
+    def test_export_plots(self):
+        with tempfile.TemporaryDirectory() as directory:
+            results = plot_export.export_plots('ibis/hct1g08.ibs', directory, formats=("png", "svg"), processes=2)
+
+            self.assertTrue(os.path.isfile(os.path.join(directory, "index.html")))
+            results = {result["model"]: result for result in results}
+            self.assertIn("HCT1G08_OUTN_50", results)
+
+            result = results["HCT1G08_OUTN_50"]
+            self.assertEqual(result["errors"], [])
+            plot_names = [plot_result["name"] for plot_result in result["plots"]]
+            for plot_name in ["pullup", "pulldown", "rising_waveforms", "falling_waveforms", "pullup_resistance",
+                              "pulldown_resistance", "k_params"]:
+                self.assertIn(plot_name, plot_names)
+
+            for plot_result in result["plots"]:
+                self.assertEqual(plot_result["files"], [f"{plot_result['name']}.png", f"{plot_result['name']}.svg"])
+                for filename in plot_result["files"]:
+                    self.assertGreater(os.path.getsize(os.path.join(result["directory"], filename)), 0)
+
+            with open(os.path.join(result["directory"], "index.html")) as file:
+                index = file.read()
+            self.assertIn("k_params.png", index)
+
+    def test_k_params_single_waveform(self):
+        import matplotlib.pyplot as plt
+
+        # The model has a single waveform per edge, its k-parameters are synthesised from the [Ramp]
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/sample1.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'BUSB6AU_HIGH_SPEED', 'WXY123')
+        plots = {plot_name: draw for plot_name, title, draw in plot_export.get_plots(ibis_data)}
+        self.assertIn("k_params", plots)
+
+        fig = plt.figure()
+        try:
+            plots["k_params"](fig)
+            self.assertEqual(len(fig.axes), 2)
+        finally:
+            plt.close(fig)
+
+    def test_unsupported_format(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                plot_export.export_plots('ibis/hct1g08.ibs', directory, formats=("jpg",))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -111,6 +111,48 @@ class TestPybis2Spice(unittest.TestCase):
                                  [0.0, 0.0, np.nan, np.nan],
                                  [5.0, 0.0, np.nan, np.nan]])
 
+    def test_condition_iv_table(self):
+        nan = np.nan
+        iv_table = np.asarray([[-1, -0.01, nan, -0.02], [0, nan, nan, nan], [1, 0.01, nan, nan], [1, 0.03, nan, nan],
+                               [2, 1e6, nan, nan], [nan, 1, 1, 1]])
+        (iv_conditioned, messages) = pybis2spice.condition_iv_table(iv_table, "iv_pulldown", max_conductance=10)
+        np.testing.assert_allclose(iv_conditioned, [[-1, -0.01, -0.01, -0.02], [0, 0, 0, -0.01], [1, 0.02, 0.02, 0.01],
+                                                    [2, 10.02, 10.02, 10.01]])
+        self.assertEqual(messages, ["iv_pulldown: 1 rows without a voltage removed",
+                                    "iv_pulldown: 1 NA typical currents interpolated",
+                                    "iv_pulldown: 5 NA min currents filled from typical",
+                                    "iv_pulldown: 4 NA max currents interpolated",
+                                    "iv_pulldown: 1 duplicate voltages averaged",
+                                    "iv_pulldown: 3 currents up to 1e+06 A clipped to 100 A",
+                                    "iv_pulldown: 3 slopes limited to 10 S"])
+
+        # A clean table is unchanged
+        (iv_conditioned, messages) = pybis2spice.condition_iv_table(iv_conditioned, "iv_pulldown", max_conductance=10)
+        self.assertEqual(messages, [])
+
+        self.assertEqual(pybis2spice.condition_iv_table(None), (None, []))
+        (iv_conditioned, messages) = pybis2spice.condition_iv_table(np.asarray([[0, nan, 1, 1], [1, nan, 2, 2]]))
+        self.assertIsNone(iv_conditioned)
+        self.assertEqual(len(messages), 1)
+
+    def test_condition_iv_table_staggered(self):
+        # The typical, min and max currents are given at different voltages
+        nan = np.nan
+        iv_table = np.asarray([[0.0, 0.0, nan, nan], [0.5, nan, 0.4, nan], [1.0, 1.0, nan, 1.2], [1.5, nan, 1.2, nan],
+                               [2.0, 2.0, nan, nan], [2.5, nan, nan, 3.0], [3.0, 3.0, nan, nan]])
+        (iv_conditioned, messages) = pybis2spice.condition_iv_table(iv_table, "iv_pullup")
+        # Each corner is interpolated from its own currents and follows the typical current beyond them
+        np.testing.assert_allclose(iv_conditioned[:, 2], [-0.1, 0.4, 0.8, 1.2, 1.7, 2.2, 2.7])
+        np.testing.assert_allclose(iv_conditioned[:, 3], [0.2, 0.7, 1.2, 1.8, 2.4, 3.0, 3.5])
+        self.assertEqual(messages, ["iv_pullup: 3 NA typical currents interpolated",
+                                    "iv_pullup: 5 NA min currents interpolated",
+                                    "iv_pullup: 5 NA max currents interpolated"])
+
+        # The corners of bird57ex are staggered, they stay monotonic
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/bird57ex.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'BIRD57ex', 'BIRD57ex')
+        self.assertTrue(np.all(np.diff(ibis_data.iv_pullup[:, 1:], axis=0) <= 0))
+
     def test_adjust_device_data(self):
         device = np.asarray([[0, 10, 10, 10], [1, 10, 10, 10], [2, 10, 10, 10]])
         clamp = np.asarray([[0, 0, 0, 0], [1, 0, 0, 0], [2, 0, 0, 0]])
@@ -176,8 +218,137 @@ class TestPybis2Spice(unittest.TestCase):
         pass
 
     def test_solve_k_params_output(self):
-        # TODO test_solve_k_params_output
-        pass
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        k_param, residuals, condition = pybis2spice.solve_k_params_least_squares(ibis_data, 1, "Rising")
+        np.testing.assert_equal(pybis2spice.solve_k_params_output(ibis_data, 1, "Rising"), k_param)
+        self.assertEqual(np.shape(residuals), (np.shape(k_param)[0], 2))
+        self.assertLess(np.max(np.absolute(residuals)), 1e-12)  # 2 waveforms are solved exactly
+        self.assertTrue(np.all(condition >= 1))
+
+        # A repeated waveform adds a consistent equation, which does not change the solution
+        vt_rising = ibis_data.vt_rising + (ibis_data.vt_rising[0],)
+        k_param3, residuals3, condition3 = pybis2spice.solve_k_params_least_squares(
+            ibis_data.replace(vt_rising=vt_rising), 1, "Rising")
+        np.testing.assert_allclose(k_param3, k_param, atol=1e-9)
+        self.assertEqual(np.shape(residuals3)[1], 3)
+
+        with self.assertRaises(ValueError):
+            pybis2spice.solve_k_params_output(ibis_data.replace(vt_rising=vt_rising[:1]), 1, "Rising")
+
+    def test_build_adaptive_time_grid(self):
+        # A ramp from 4 to 6 within a window of 0 to 10 has all its curvature at the corners of the ramp
+        time = np.linspace(0, 10, 1001)
+        voltage = np.clip(time - 4, 0, 2)
+        grid = pybis2spice.build_adaptive_time_grid(time, [voltage], max_points=50)
+        self.assertEqual(len(grid), 50)
+        self.assertEqual((grid[0], grid[-1]), (0, 10))
+        near_corners = np.sum((np.absolute(grid - 4) < 0.5) | (np.absolute(grid - 6) < 0.5))
+        self.assertGreater(near_corners, 30)
+
+        # With no curvature or k-parameter changes the grid is uniform
+        np.testing.assert_allclose(pybis2spice.build_adaptive_time_grid(time, [np.ones_like(time)], max_points=11),
+                                   np.linspace(0, 10, 11))
+
+    def test_solve_k_params_adaptive_grid(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        for waveform_type in ["Rising", "Falling"]:
+            k_param = pybis2spice.solve_k_params_output(ibis_data, 1, waveform_type)
+            k_adaptive = pybis2spice.solve_k_params_output(ibis_data, 1, waveform_type, max_points=40)
+            self.assertEqual(np.shape(k_adaptive), (40, 3))
+            for column in [1, 2]:
+                k_interpolated = np.interp(k_param[:, 0], k_adaptive[:, 0], k_adaptive[:, column])
+                np.testing.assert_allclose(k_interpolated, k_param[:, column], atol=0.03)
+
+    def test_trim_k_param(self):
+        # Ku rises from 0 to 1 between 2 and 4 while Kd falls from 1 to 0 between 3 and 5
+        time = np.linspace(0, 10, 101)
+        k_param = np.column_stack((time, np.clip((time - 2) / 2, 0, 1), np.clip((5 - time) / 2, 0, 1)))
+        self.assertEqual(pybis2spice.find_edge_window(k_param), (20, 50))
+
+        k_trim = pybis2spice.trim_k_param(k_param)
+        np.testing.assert_equal(k_trim, k_param[20:51])
+
+        # The end points are set to the settled values, so samples within the tolerance are trimmed
+        k_param[60:, 1] = 1 - 0.004
+        k_param[-1, 1] = 1
+        k_trim = pybis2spice.trim_k_param(k_param)
+        self.assertEqual(k_trim[-1, 0], 5)
+        np.testing.assert_equal(k_trim[-1, 1:], [1, 0])
+        self.assertEqual(len(pybis2spice.trim_k_param(k_param, settling_tolerance=0.001)), len(k_param) - 20)
+
+        # A flat waveform is not trimmed
+        k_flat = np.column_stack((time, np.ones_like(time)))
+        np.testing.assert_equal(pybis2spice.trim_k_param(k_flat), k_flat)
+
+    def test_solve_k_params_ramp(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        np.testing.assert_allclose(pybis2spice.extract_ramp_param(ibis_data.ramp, "Rising"),
+                                   [[1.88, 5.2612e-10], [1.0207, 1.6255e-9], [2.7029, 1.8002e-10]])
+        self.assertIsNone(pybis2spice.extract_ramp_param(None, "Rising"))
+
+        # The output is driven between the rails into the 50 ohm ramp load
+        vcc = pybis2spice.get_reference(ibis_data.pullup_ref, ibis_data.v_range, 1)
+        v_high = pybis2spice.solve_dc_voltage(ibis_data, 1, 1.0, 0.0, 0.0, 50.0)
+        v_low = pybis2spice.solve_dc_voltage(ibis_data, 1, 0.0, 1.0, vcc, 50.0)
+        self.assertTrue(0.5 * vcc < v_high < vcc)
+        self.assertTrue(0 < v_low < 0.5 * vcc)
+
+        for waveform_type, k_start, k_end in [("Rising", [0, 1], [1, 0]), ("Falling", [1, 0], [0, 1])]:
+            k_param = pybis2spice.solve_k_params_ramp(ibis_data, 1, waveform_type)
+            self.assertEqual(np.shape(k_param), (pybis2spice._RAMP_POINTS, 3))
+            np.testing.assert_equal(k_param[0, 1:], k_start)
+            np.testing.assert_equal(k_param[-1, 1:], k_end)
+            np.testing.assert_allclose(k_param[:, 1] + k_param[:, 2], 1)
+            self.assertTrue(np.all(np.diff(k_param[:, 0]) > 0))
+
+    def test_fit_iv_curve(self):
+        # A diode clamp spanning 13 orders of magnitude of current
+        voltage = np.linspace(-1, 0.8, 161)
+        current = 1e-15 * (np.exp(voltage / 0.026) - 1) + voltage / 1e3
+        fit = pybis2spice.fit_iv_curve(voltage, current, tolerance=0.01)
+        self.assertLessEqual(fit.max_error, 0.01)
+        self.assertLess(len(fit.voltage), len(voltage) / 2)
+        error = np.absolute(fit.evaluate(voltage) - current) / (np.absolute(current) + fit.i_scale)
+        self.assertLessEqual(np.max(error), fit.max_error + 1e-12)
+
+        # The end currents are held outside the table
+        np.testing.assert_allclose(fit.evaluate([-5, 5]), current[[0, -1]])
+
+        # The error is reported when the tolerance cannot be met
+        fit = pybis2spice.fit_iv_curve(voltage, current, tolerance=1e-9, max_segments=4)
+        self.assertEqual(len(fit.voltage), 5)
+        self.assertGreater(fit.max_error, 1e-9)
+
+    def test_fit_iv_curve_clamps(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/bushold.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'TOP_MODEL_BUS_HOLD', 'BUS-HOLD-SAMPLE')
+        v_range = ibis_data.v_range[0]
+        pwr_clamp = np.flip(ibis_data.iv_pwr_clamp, axis=0)
+        # The clamps reach 100 A outside the rails and are off between them, as in the subcircuit current sources
+        for voltage, current in [(v_range - pwr_clamp[:, 0], pwr_clamp[:, 1]),
+                                 (ibis_data.iv_gnd_clamp[:, 0], ibis_data.iv_gnd_clamp[:, 1])]:
+            fit = pybis2spice.fit_iv_curve(voltage, current, tolerance=0.01)
+            self.assertLessEqual(fit.max_error, 0.01)
+            v_rail = np.linspace(0, v_range, 1001)
+            in_rail_error = np.absolute(fit.evaluate(v_rail) - np.interp(v_rail, voltage, current))
+            self.assertLess(np.max(in_rail_error), 1e-7)
+
+    def test_solve_least_squares(self):
+        a = np.asarray([[[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]],
+                        [[1.0, 1.0], [2.0, 2.0], [0.0, 0.0]]])  # The second sample is singular
+        b = np.asarray([[1.0, 4.0, 3.0], [2.0, 4.0, 0.0]])
+        x, residuals, condition = pybis2spice.solve_least_squares(a, b)
+        np.testing.assert_allclose(x, [[1.0, 2.0], [1.0, 1.0]])
+        np.testing.assert_allclose(residuals, 0, atol=1e-12)
+        self.assertEqual(condition[1], np.inf)
+
+        # The regularization shrinks the solution towards zero
+        x_reg, residuals_reg, condition_reg = pybis2spice.solve_least_squares(a, b, regularization=0.5)
+        self.assertTrue(np.all(np.linalg.norm(x_reg, axis=1) < np.linalg.norm(x, axis=1)))
+        self.assertTrue(np.all(np.linalg.norm(residuals_reg, axis=1) > 0))
 
     def test_differentiate(self):
         np.testing.assert_equal(pybis2spice.differentiate([0, 1, 2, 3], [0, 1, 2, 3]), [1, 1, 1, 1])
@@ -190,6 +361,9 @@ class TestPybis2Spice(unittest.TestCase):
 
         np.testing.assert_equal(pybis2spice.compress_param(k_param), k_compressed)
 
+        # Open drain k-parameters have a single column
+        np.testing.assert_equal(pybis2spice.compress_param(k_param[:, :2]), k_compressed[:, :2])
+
         #np.testing.assert_equal(pybis2spice.compress_param([4, 4, 3, 2, 1, 0, 0]), [4, 3, 2, 1, 0])
         #np.testing.assert_equal(pybis2spice.compress_param([4, 4, 3, 2, 1, 0, 0], threshold=1.5), [4, 4, 3, 2, 1, 0, 0])
         #np.testing.assert_equal(pybis2spice.compress_param([4.6, 4, 3, 2, 1, 0.6, 0.2], threshold=0.5), [4, 3, 2, 1, 0.6, 0.2])
@@ -0,0 +1,103 @@
+import unittest
+
+import numpy as np
+from pybis2spice import pybis2spice
+from pybis2spice import simulate
+from pybis2spice import subcircuit
+
+
+class TestSimulate(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        cls.ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+
+    def test_table_batch(self):
+        tables = [(np.asarray([-1.0, 0.0, 2.0]), np.asarray([-0.1, 0.0, 0.4])),
+                  (np.asarray([0.0, 5.0]), np.asarray([1.0, -1.0]))]
+        table_batch = simulate._TableBatch(tables)
+        for v in [-3.0, -0.5, 0.0, 1.0, 2.0, 4.9, 7.0]:
+            value, slope = table_batch.evaluate(np.asarray([v, v]))
+            for n, (x, y) in enumerate(tables):
+                self.assertAlmostEqual(value[n], np.interp(v, x, y))
+        value, slope = table_batch.evaluate(np.asarray([1.0, 7.0]))
+        np.testing.assert_allclose(slope, [0.2, 0.0])
+
+    def test_validate_model(self):
+        records = simulate.validate_model(self.ibis_data, include_package=False)
+        self.assertEqual(len(records), 12)  # 2 rising and 2 falling waveforms for each of the 3 corners
+        self.assertEqual([record["corner"] for record in records[:4]], ["Typical"] * 4)
+        self.assertEqual([record["waveform_type"] for record in records[:4]],
+                         ["Rising", "Rising", "Falling", "Falling"])
+        for record in records:
+            self.assertLess(record["relative_max_error"], 0.1)
+            self.assertLessEqual(record["rms_error"], record["max_error"])
+
+        # The package adds some ringing and delay to the fixture waveforms, but they should still be close
+        for record in simulate.validate_model(self.ibis_data, corners=["Typical"], include_package=True):
+            self.assertLess(record["relative_max_error"], 0.1)
+
+    def test_dc_levels(self):
+        # The waveforms start and end at the levels of the ibis waveforms
+        for simulated in simulate.simulate_fixtures(self.ibis_data, corners=["Typical"], steps=500):
+            ibis_voltage = simulated.waveform.data[:, 1]
+            self.assertAlmostEqual(simulated.voltage[0], ibis_voltage[0], delta=0.05)
+            self.assertAlmostEqual(simulated.voltage[-1], ibis_voltage[-1], delta=0.05)
+
+    def test_sweep_loads(self):
+        r_loads = [50, np.inf]
+        c_loads = [0, 10e-12, 50e-12]
+        sweep = simulate.sweep_loads(self.ibis_data, r_loads, c_loads, corners=["Typical", "FastStrong"], steps=500)
+        for name in simulate.SWEEP_METRICS:
+            self.assertEqual(np.shape(sweep.metrics[name]), (2, 2, 2, 3))
+        self.assertEqual(np.shape(sweep.voltage), (2, 2, 2, 3, 501))
+        self.assertEqual(len(sweep.to_records()), 24)
+
+        # A larger load capacitance slows down every edge
+        self.assertTrue(np.all(np.diff(sweep.metrics["transition_time"], axis=3) > 0))
+        self.assertTrue(np.all(np.diff(sweep.metrics["delay"], axis=3) > 0))
+        self.assertFalse(np.any(np.isnan(sweep.metrics["settling_time"])))
+        # The fast corner is faster than the typical corner
+        self.assertTrue(np.all(sweep.metrics["transition_time"][1] < sweep.metrics["transition_time"][0]))
+
+    def test_edge_metrics(self):
+        time = np.linspace(0, 10, 1001)[np.newaxis, :].repeat(3, axis=0)
+        voltage = np.clip(time / 5, 0, 1) * np.asarray([[2.0], [-2.0], [0.0]])
+        voltage[0, 600:] += 0.2 * np.exp(-(time[0, 600:] - 6))  # Overshoot that settles
+        metrics = simulate.get_edge_metrics(time, voltage, voltage[:, 0], np.asarray([2.0, -2.0, 0.0]))
+        self.assertAlmostEqual(metrics["transition_time"][1], 4.0)
+        self.assertAlmostEqual(metrics["delay"][1], 2.5)
+        self.assertAlmostEqual(metrics["overshoot"][0], 0.1)
+        self.assertAlmostEqual(metrics["settling_time"][0], 6 + np.log(0.2 / 0.04), delta=0.02)
+        self.assertAlmostEqual(metrics["settling_time"][1], 4.9)
+        # No swing
+        for name in simulate.SWEEP_METRICS:
+            self.assertTrue(np.isnan(metrics[name][2]))
+
+    def test_ramp_model(self):
+        # The edges synthesised from the ramp reproduce the ramp 20% to 80% time into the ramp load
+        ibis_data = self.ibis_data.replace(vt_rising=(), vt_falling=())
+        vcc = pybis2spice.get_reference(ibis_data.pullup_ref, ibis_data.v_range, 1)
+        for waveform_type, v_term in [("Rising", 0.0), ("Falling", vcc)]:
+            k_time, ku, kd = simulate.get_k_params(ibis_data, "Typical", waveform_type)
+            item = {"ibis_data": ibis_data, "corner": "Typical", "k_time": k_time, "ku": ku, "kd": kd,
+                    "r_load": 50.0, "v_term": v_term, "c_load": 0.0, "t_end": 4 * k_time[-1]}
+            time, voltage = simulate._Circuit([item], include_package=False).transient(2000)
+            y = (voltage - voltage[:, :1]) / (voltage[:, -1:] - voltage[:, :1])
+            t_20_80 = subcircuit.find_crossing_times(time, y, 0.8) - subcircuit.find_crossing_times(time, y, 0.2)
+            dv, dt = pybis2spice.extract_ramp_param(ibis_data.ramp, waveform_type)[0]
+            self.assertAlmostEqual(t_20_80[0], dt, delta=0.1 * dt)
+            self.assertAlmostEqual(abs(voltage[0, -1] - voltage[0, 0]) * 0.6, dv, delta=0.1 * dv)
+
+    def test_unsupported_model(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_IN_50', '74HCT1G08_GW')
+        self.assertFalse(simulate.can_simulate(ibis_data))
+        self.assertEqual(simulate.validate_model(ibis_data), [])
+        with self.assertRaises(ValueError):
+            simulate.sweep_loads(ibis_data, [50], [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from pybis2spice import generator
+from pybis2spice import pybis2spice
+from pybis2spice import subcircuit
+
+
+class TestSubcircuit(unittest.TestCase):
+
+    def test_find_crossing_times(self):
+        time = np.asarray([0.0, 1.0, 2.0, 3.0])
+        values = np.asarray([[0.0, 0.2, 0.8, 1.0],
+                             [1.0, 0.6, 0.2, 0.0],
+                             [0.0, 0.1, 0.2, 0.3]])
+        np.testing.assert_allclose(subcircuit.find_crossing_times(time, values, level=0.5)[:2], [1.5, 1.25])
+        self.assertTrue(np.isnan(subcircuit.find_crossing_times(time, values, level=0.5)[2]))
+
+        # A level per waveform, and a crossing that ends exactly on a sample
+        np.testing.assert_allclose(subcircuit.find_crossing_times(time, values, level=[0.8, 0.2, 0.3]), [2, 2, 3])
+
+    def test_crossover_offsets(self):
+        # Ku and Kd cross at 1.5, between the samples
+        k_param = np.asarray([[0.0, 0.0, 1.0], [1.0, 0.2, 0.8], [2.0, 0.8, 0.2], [4.0, 1.0, 0.0]])
+        (offset_neg, offset_pos) = subcircuit.determine_crossover_offsets(k_param)
+        self.assertAlmostEqual(offset_neg, 1.5)
+        self.assertAlmostEqual(offset_pos, 2.5)
+
+        # The open drain crossover is halfway through the transition of Kd, not the first sample
+        k_param_od = np.asarray([[1.0, 1.0], [2.0, 0.75], [3.0, 0.25], [4.0, 0.0]])
+        (offset_neg, offset_pos) = subcircuit.determine_crossover_offsets(k_param_od)
+        self.assertAlmostEqual(offset_neg, 1.5)
+        self.assertAlmostEqual(offset_pos, 1.5)
+
+        # Waveforms of different lengths are found together
+        np.testing.assert_allclose(subcircuit.determine_crossover_times([k_param, k_param[:3]]), [1.5, 1.5])
+
+    def test_threshold_times(self):
+        k_param = np.asarray([[0.0, 0.0, 1.0], [1.0, 0.2, 0.8], [2.0, 0.8, 0.2], [4.0, 1.0, 0.0]])
+        thresholds = subcircuit.determine_threshold_times([k_param], levels=[0.1, 0.5, 0.9])
+        self.assertEqual(np.shape(thresholds), (1, 2, 3))
+        np.testing.assert_allclose(thresholds[0, 0], [0.5, 1.5, 3.0])
+        np.testing.assert_allclose(thresholds[0, 1], [0.5, 1.5, 3.0])
+
+    def test_get_edge_timing(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        records = subcircuit.get_edge_timing(ibis_data, corners=["Typical", "FastStrong"])
+        self.assertEqual([(record["corner"], record["waveform_type"]) for record in records],
+                         [("Typical", "Rising"), ("Typical", "Falling"),
+                          ("FastStrong", "Rising"), ("FastStrong", "Falling")])
+
+        (kr, kf) = subcircuit.solve_output_k_params(ibis_data, 1)
+        self.assertEqual((records[0]["offset_neg"], records[0]["offset_pos"]),
+                         subcircuit.determine_crossover_offsets(kr))
+        for record in records:
+            self.assertTrue(record["ku"][0] < record["ku"][1] < record["ku"][2])
+            self.assertTrue(record["kd"][0] < record["kd"][1] < record["kd"][2])
+        # The fast corner switches sooner
+        self.assertLess(records[2]["crossover"], records[0]["crossover"])
+
+    def test_get_timestep_hints(self):
+        kr = np.asarray([[0.0, 0.0, 1.0], [1.0, 0.2, 0.8], [2.0, 0.8, 0.2], [4.0, 1.0, 0.0]])
+        kf = np.asarray([[0.0, 1.0, 0.0], [0.5, 0.0, 1.0]])
+        hints = subcircuit.get_timestep_hints(kr, kf, steps_per_edge=20)
+        self.assertAlmostEqual(hints["min_edge_duration"], 0.4)
+        self.assertAlmostEqual(hints["min_breakpoint_spacing"], 0.5)
+        self.assertAlmostEqual(hints["max_timestep"], 0.02)
+        self.assertEqual(hints["param_name"], "TMAX")
+
+        # Flat k-parameters fall back to the waveform duration, and there are no hints without a duration
+        k_flat = np.asarray([[1.0, 1.0, 0.0], [3.0, 1.0, 0.0]])
+        self.assertAlmostEqual(subcircuit.get_timestep_hints(k_flat, k_flat)["min_edge_duration"], 2.0)
+        self.assertIsNone(subcircuit.get_timestep_hints(k_flat[:1], k_flat[:1]))
+
+    def test_timestep_header(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        hints = subcircuit.get_model_timestep_hints(ibis_data, "FastStrong")
+        self.assertEqual(hints["param_name"], "TMAX_HCT1G08_OUTN_50_FastStrong")
+        self.assertLess(hints["max_timestep"], hints["min_edge_duration"])
+        slow_hints = subcircuit.get_model_timestep_hints(ibis_data, "WeakSlow")
+        self.assertLess(hints["min_edge_duration"], slow_hints["min_edge_duration"])
+
+        with tempfile.TemporaryDirectory() as directory:
+            output_filepath = os.path.join(directory, 'model.sub')
+            for subcircuit_type in ["LTSpice", "Generic"]:
+                self.assertEqual(subcircuit.generate_spice_model("Output", subcircuit_type, ibis_data, "FastStrong",
+                                                                 output_filepath), 0)
+                with open(output_filepath) as file:
+                    netlist = file.read()
+                self.assertIn(f'* Recommended Maximum Timestep (s): {hints["max_timestep"]:.4g}', netlist)
+                self.assertIn(f'.param TMAX_HCT1G08_OUTN_50_FastStrong={hints["max_timestep"]:.4g}\n', netlist)
+                self.assertLess(netlist.index(".param TMAX_"), netlist.index(".SUBCKT"))
+
+    def test_open_drain_trimming(self):
+        with tempfile.TemporaryDirectory() as directory:
+            ibis_filepath = os.path.join(directory, 'synthetic.ibs')
+            model_name = generator.generate_ibis_file(ibis_filepath, models=1, model_types=["Open_drain"])[0]
+            ibis = pybis2spice.get_ibis_model_ecdtools(ibis_filepath)
+            ibis_data = pybis2spice.DataModel(ibis, model_name, pybis2spice.list_components(ibis)[0])
+
+            # The trimmed edges keep the switching samples of Kd
+            (kr, kf) = subcircuit.solve_output_k_params(ibis_data, 1)
+            (kr_full, kf_full) = subcircuit.solve_output_k_params(ibis_data, 1, edge_tolerance=None)
+            for k_param, k_param_full in [(kr, kr_full), (kf, kf_full)]:
+                self.assertEqual(np.shape(k_param)[1], 2)
+                self.assertGreater(len(k_param), 2)
+                self.assertLess(len(k_param), len(k_param_full))
+                self.assertGreater(abs(k_param[-1, 1] - k_param[0, 1]), 0.9)
+            self.assertTrue(all(offset > 0 for offset in subcircuit.determine_crossover_offsets(kr)))
+            self.assertIsNotNone(subcircuit.get_timestep_hints(kr, kf))
+
+            # Both netlists switch Kd through every trimmed sample
+            output_filepath = os.path.join(directory, 'model.sub')
+            self.assertEqual(subcircuit.generate_spice_model("Output", "LTSpice", ibis_data, "Typical",
+                                                             output_filepath), 0)
+            with open(output_filepath) as file:
+                netlist = file.read()
+            self.assertIn(f'V40 K_D_RISE 0 PWL({subcircuit.create_edge_waveform_pwl(kr[:, 0], kr[:, 1])})', netlist)
+
+            self.assertEqual(subcircuit.generate_spice_model("Output", "Generic", ibis_data, "Typical",
+                                                             output_filepath), 0)
+            with open(output_filepath) as file:
+                netlist = file.read()
+            k_d_osc_str = subcircuit.create_osc_waveform_pwl(kr[:, 0], kr[:, 1], kf[:, 0], kf[:, 1])
+            self.assertIn(f'V6 Kd 0 PWL({k_d_osc_str})', netlist)
+
+    def test_define_iv_current(self):
+        voltage = np.linspace(-1, 0.8, 161)
+        current = 1e-15 * (np.exp(voltage / 0.026) - 1) + voltage / 1e3
+        (expression, comment) = subcircuit.define_iv_current("B2", voltage, current)
+        self.assertTrue(expression.startswith("table(V(DIE), "))
+        self.assertEqual(comment, "")
+
+        (expression, comment) = subcircuit.define_iv_current("B2", voltage, current, fit_tolerance=0.01)
+        self.assertIn("sinh(", expression)
+        self.assertTrue(comment.startswith("* B2: fitted with"))
+
+        # The expression matches the fit, with the if() functions evaluated as conditional expressions
+        fit = pybis2spice.fit_iv_curve(voltage, current, tolerance=0.01)
+        for v in [-2.0, -0.5, 0.0, 0.7, 0.95, 2.0]:
+            value = eval(expression.replace("V(DIE)", "v").replace("if(", "_if("),
+                         {"_if": lambda condition, a, b: a if condition else b, "sinh": np.sinh, "v": v})
+            self.assertAlmostEqual(value, fit.evaluate(v), delta=1e-9 * np.max(np.absolute(current)))
+
+        # The table is kept if the tolerance cannot be met
+        (expression, comment) = subcircuit.define_iv_current("B2", voltage, current, fit_tolerance=1e-12)
+        self.assertTrue(expression.startswith("table(V(DIE), "))
+        self.assertIn("the table is used", comment)
+
+    def test_fitted_model(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/hct1g08.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'HCT1G08_OUTN_50', '74HCT1G08_GW')
+        with tempfile.TemporaryDirectory() as directory:
+            output_filepath = os.path.join(directory, 'model.sub')
+            for subcircuit_type in ["LTSpice", "Generic"]:
+                ret = subcircuit.generate_spice_model("Output", subcircuit_type, ibis_data, "Typical", output_filepath,
+                                                      fit_tolerance=subcircuit.FIT_TOLERANCE)
+                self.assertEqual(ret, 0)
+                with open(output_filepath) as file:
+                    netlist = file.read()
+                self.assertNotIn("table(", netlist)
+                self.assertEqual(netlist.count("sinh("), 2)
+
+    def test_conditioning_warnings(self):
+        ibis = pybis2spice.get_ibis_model_ecdtools('ibis/bushold.ibs')
+        ibis_data = pybis2spice.DataModel(ibis, 'TOP_MODEL_BUS_HOLD', 'BUS-HOLD-SAMPLE')
+        self.assertLessEqual(np.max(np.absolute(ibis_data.iv_gnd_clamp[:, 1:])), 100)
+        with tempfile.TemporaryDirectory() as directory:
+            output_filepath = os.path.join(directory, 'model.sub')
+            self.assertEqual(subcircuit.generate_spice_model("Input", "Generic", ibis_data, "WeakSlow",
+                                                             output_filepath), 0)
+            with open(output_filepath) as file:
+                netlist = file.read()
+        self.assertIn("* WARNING: iv_gnd_clamp: 22 NA min currents filled from typical\n", netlist)
+        self.assertIn("* WARNING: iv_gnd_clamp: 33 currents up to 6.16e+17 A clipped to 100 A\n", netlist)
+        self.assertNotIn("nan", netlist)
+
+
+if __name__ == '__main__':
+    unittest.main()